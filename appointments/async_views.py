@@ -0,0 +1,133 @@
+"""
+Versiones asíncronas de las lecturas más frecuentes.
+
+DRF 3.14 no tiene vistas asíncronas, así que ``AsyncAPIView`` reúne lo
+mínimo: autenticación JWT (``CachedJWTAuthentication.aauthenticate``),
+errores con el formato de DRF y respuestas con ``JSONRenderer``. Las
+consultas usan el ORM asíncrono de Django, de modo que bajo ASGI un mismo
+worker atiende otras peticiones mientras espera a la base de datos. Las
+respuestas son las mismas que las de las vistas síncronas equivalentes.
+
+- ``GET /api/async/availability/`` -> ``GET /api/availability/``
+- ``GET /api/async/appointments/upcoming/`` -> ``GET /api/appointments/upcoming/``
+- ``GET /api/async/appointments/today/`` -> ``GET /api/appointments/today/``
+- ``GET /api/async/services/`` -> ``GET /api/services/``
+"""
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, NotFound, MethodNotAllowed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .authentication import CachedJWTAuthentication
+from .availability import acached_availability, date_range
+from .cache import response_cache
+from .models import Service, ResourceVersion
+from .pagination import AsyncPageNumberPagination, KeysetPagination
+from .serializers import AppointmentSerializer, ServiceSerializer
+from .views import (
+    availability_params, availability_barbers, availability_payload,
+    visible_appointments, active_appointments, visible_services,
+    catalog_validators, add_validators, response_cache_key
+)
+
+
+class AsyncAPIView(View):
+    """
+    Vista asíncrona autenticada que devuelve JSON como DRF
+    """
+    authentication = CachedJWTAuthentication()
+    renderer = JSONRenderer()
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request)
+        try:
+            handler = getattr(self, request.method.lower(), None)
+            if handler is None or request.method.lower() not in self.http_method_names:
+                raise MethodNotAllowed(request.method)
+            authenticated = await self.authentication.aauthenticate(request)
+            if authenticated is None:
+                raise NotAuthenticated()
+            request.user, request.auth = authenticated
+            return await handler(request, *args, **kwargs)
+        except APIException as exc:
+            return self.handle_exception(request, exc)
+
+    def handle_exception(self, request, exc):
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = self.render(data, status=exc.status_code)
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            response.status_code = status.HTTP_401_UNAUTHORIZED
+            response['WWW-Authenticate'] = self.authentication.authenticate_header(request)
+        return response
+
+    def render(self, data, status=status.HTTP_200_OK):
+        return HttpResponse(
+            self.renderer.render(data), status=status, content_type=self.renderer.media_type
+        )
+
+
+class AsyncAvailabilityView(AsyncAPIView):
+
+    async def get(self, request):
+        """
+        Horarios libres de varios barberos en un rango de fechas (mismos
+        parámetros que ``availability``)
+        """
+        params, error = availability_params(request.query_params)
+        if error:
+            return self.render({"detail": error}, status=status.HTTP_400_BAD_REQUEST)
+        start_date, end_date, service_id, barber_ids = params
+
+        service = await Service.objects.filter(id=service_id, is_active=True).afirst()
+        if service is None:
+            raise NotFound()
+        barbers = [barber async for barber in availability_barbers(barber_ids)]
+        dates = date_range(start_date, end_date)
+        free = await acached_availability([barber.id for barber in barbers], dates, service.duration)
+        return self.render(availability_payload(service, start_date, end_date, barbers, dates, free))
+
+
+class AsyncAppointmentListView(AsyncAPIView):
+    """
+    Citas activas del día o de los próximos 30 días, paginadas por cursor
+    """
+    period = 'upcoming'
+
+    def get_keyset_ordering(self):
+        return ('date', 'start_time', 'id')
+
+    async def get(self, request):
+        paginator = KeysetPagination()
+        appointments = await paginator.apaginate_queryset(
+            active_appointments(visible_appointments(request.user), self.period), request, view=self
+        )
+        serializer = AppointmentSerializer(appointments, many=True, context={'request': request})
+        return self.render(paginator.get_paginated_response(serializer.data).data)
+
+
+class AsyncServiceListView(AsyncAPIView):
+    """
+    Listado de servicios con ETag, Last-Modified y caché de respuestas,
+    como ``ServiceViewSet.list``
+    """
+    version_resources = ('services',)
+
+    async def get(self, request):
+        etag, last_modified = catalog_validators(
+            await ResourceVersion.acurrent(self.version_resources), request.user, self.renderer.format
+        )
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is None:
+            key = response_cache_key('async-service:list', request, etag)
+            data = await response_cache.aget(key)
+            if data is None:
+                paginator = AsyncPageNumberPagination()
+                services = await paginator.apaginate_queryset(visible_services(request.user), request)
+                serializer = ServiceSerializer(services, many=True, context={'request': request})
+                data = paginator.get_paginated_response(serializer.data).data
+                await response_cache.aset(key, data)
+            response = self.render(data)
+        return add_validators(response, etag, last_modified)
@@ -0,0 +1,107 @@
+"""
+Autenticación JWT con caché de usuarios.
+
+``JWTAuthentication`` de simplejwt consulta la fila del usuario en cada
+petición. ``CachedJWTAuthentication`` la toma de ``user_cache`` durante
+``AUTH_USER_CACHE['TIMEOUT']`` segundos. Guardar o eliminar un usuario
+(cambio de rol, de contraseña, desactivación, ``update_user_profile``) lo
+invalida: se descarta la entrada local y se cambia la versión compartida
+del usuario, que cada acierto compara con la de su entrada, así que los
+demás procesos lo releen en la petición siguiente. ``aauthenticate`` hace lo mismo para las
+vistas asíncronas (``appointments.async_views``).
+"""
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import user_cache
+from .timing import measure
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def authenticate(self, request):
+        with measure('auth'):
+            return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        user = self._cached_user(user_cache.get(user_id), validated_token)
+        if user is None:
+            version = user_cache.version(user_id)
+            user = super().get_user(validated_token)
+            self._remember(user_id, user, version)
+        return user
+
+    async def aauthenticate(self, request):
+        """
+        ``authenticate`` para las vistas asíncronas: la versión del usuario
+        se lee con la API asíncrona del caché y, si no está en caché, la
+        fila con el ORM asíncrono
+        """
+        with measure('auth'):
+            header = self.get_header(request)
+            if header is None:
+                return None
+            raw_token = self.get_raw_token(header)
+            if raw_token is None:
+                return None
+            validated_token = self.get_validated_token(raw_token)
+            return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        user = self._cached_user(await user_cache.aget(user_id), validated_token)
+        if user is not None:
+            return user
+        version = await user_cache.aversion(user_id)
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        self._check_password(user, validated_token)
+        self._remember(user_id, user, version)
+        return user
+
+    @staticmethod
+    def _user_id(validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def _cached_user(self, values, validated_token):
+        if values is None:
+            return None
+        # Solo se guardan usuarios activos; la revocación por cambio de
+        # contraseña se verifica igual que en JWTAuthentication
+        model = get_user_model()
+        user = model.from_db(router.db_for_read(model), list(values), list(values.values()))
+        self._check_password(user, validated_token)
+        return user
+
+    @staticmethod
+    def _check_password(user, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+
+    @staticmethod
+    def _remember(user_id, user, version):
+        # La versión se lee antes de la fila: una invalidación entre ambas
+        # lecturas deja la entrada desactualizada y el próximo acierto la
+        # descarta
+        user_cache.set(user_id, {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields
+        }, version)
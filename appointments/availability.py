@@ -0,0 +1,410 @@
+"""
+Motor de disponibilidad en bloque.
+
+Calcula los horarios libres de varios barberos para un rango de fechas a
+partir de arreglos de ocupación con resolución de un minuto, en lugar de
+recorrer slot por slot. Los horarios, las excepciones y las citas activas se
+cargan con una consulta por modelo, sin importar cuántos barberos o días se
+pidan.
+
+Las reglas son las mismas de ``Schedule.get_available_slots``: la grilla
+arranca en la hora de inicio y avanza cada ``interval_minutes``; un slot que
+cae dentro del descanso salta al fin del descanso; una excepción activa
+bloquea el día completo.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .cache import slot_cache
+from .metrics import SLOT_LATENCY
+from .models import Schedule, ScheduleException, Appointment, SlotHold, DayData
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _minute_floor(value):
+    return value.hour * 60 + value.minute
+
+
+def _minute_ceil(value):
+    minutes = value.hour * 60 + value.minute
+    if value.second or value.microsecond:
+        minutes += 1
+    return minutes
+
+
+def _duration_minutes(duration):
+    return int(np.ceil(duration.total_seconds() / 60))
+
+
+def date_range(start_date, end_date):
+    """
+    Lista de fechas entre start_date y end_date (ambas incluidas)
+    """
+    return [
+        start_date + timedelta(days=offset)
+        for offset in range((end_date - start_date).days + 1)
+    ]
+
+
+def slot_grid(schedule, duration_minutes):
+    """
+    Minutos de inicio candidatos de un horario, antes de descontar las citas.
+
+    ``schedule`` es un diccionario con los campos del modelo ``Schedule``.
+    """
+    start = _minute_floor(schedule['start_time'])
+    end = _minute_floor(schedule['end_time'])
+    interval = schedule['interval_minutes']
+    last_start = end - duration_minutes
+    if interval <= 0 or last_start < start:
+        return np.empty(0, dtype=np.int32)
+
+    grid = np.arange(start, last_start + 1, interval, dtype=np.int32)
+    if schedule['break_start_time'] and schedule['break_end_time']:
+        break_start = _minute_floor(schedule['break_start_time'])
+        break_end = _minute_floor(schedule['break_end_time'])
+        first = np.searchsorted(grid, break_start)
+        # Solo hay salto si la grilla cae dentro del descanso
+        if first < len(grid) and grid[first] < break_end:
+            grid = np.concatenate((
+                grid[:first],
+                np.arange(break_end, last_start + 1, interval, dtype=np.int32)
+            ))
+    return grid
+
+
+def _availability_querysets(barber_ids, start_date, end_date):
+    """
+    Consultas de ``load_availability_data``: horarios activos, días
+    bloqueados, citas activas y retenciones vigentes
+    """
+    return (
+        Schedule.objects.filter(
+            barber_id__in=barber_ids,
+            is_active=True
+        ).values(
+            'barber_id', 'day_of_week', 'start_time', 'end_time',
+            'interval_minutes', 'break_start_time', 'break_end_time'
+        ),
+        ScheduleException.objects.filter(
+            barber_id__in=barber_ids,
+            date__range=[start_date, end_date],
+            is_active=True
+        ).values_list('barber_id', 'date'),
+        Appointment.objects.filter(
+            barber_id__in=barber_ids,
+            date__range=[start_date, end_date],
+            status__in=['pending', 'confirmed']
+        ).values_list('barber_id', 'date', 'start_time', 'end_time'),
+        SlotHold.active().filter(
+            barber_id__in=barber_ids,
+            date__range=[start_date, end_date]
+        ).values_list('barber_id', 'date', 'start_time', 'end_time', 'expires_at'),
+    )
+
+
+def _availability_data(schedule_rows, closed, busy, holds):
+    schedules = {(row['barber_id'], row['day_of_week']): row for row in schedule_rows}
+
+    # Vencimiento de la primera retención de cada día: hasta entonces vale el cálculo
+    expires_at = {}
+    for barber_id, day, start, end, hold_expires_at in holds:
+        busy.append((barber_id, day, start, end))
+        expires_at[(barber_id, day)] = min(expires_at.get((barber_id, day), hold_expires_at), hold_expires_at)
+
+    return {'schedules': schedules, 'closed': set(closed), 'busy': busy, 'expires_at': expires_at}
+
+
+def load_availability_data(barber_ids, start_date, end_date):
+    """
+    Carga en bloque los horarios activos, los días bloqueados por
+    excepciones y los rangos ocupados por citas activas y retenciones
+    vigentes de los barberos en el rango.
+    """
+    return _availability_data(*(
+        list(queryset) for queryset in _availability_querysets(barber_ids, start_date, end_date)
+    ))
+
+
+async def aload_availability_data(barber_ids, start_date, end_date):
+    """
+    ``load_availability_data`` con el ORM asíncrono
+    """
+    return _availability_data(*[
+        [row async for row in queryset]
+        for queryset in _availability_querysets(barber_ids, start_date, end_date)
+    ])
+
+
+def compute_availability(barber_ids, dates, duration, data):
+    """
+    Calcula los minutos de inicio libres para cada barbero y fecha.
+
+    Devuelve ``{barber_id: {fecha: np.ndarray}}``. Cada par barbero-día es
+    una fila de una matriz de ocupación; las citas se marcan con una suma
+    acumulada de diferencias y cada slot candidato se evalúa con una resta
+    de prefijos sobre su ventana de ``duration`` minutos.
+    """
+    duration_minutes = _duration_minutes(duration)
+    rows = {}
+    for barber_id in barber_ids:
+        for day in dates:
+            if (barber_id, day.weekday()) in data['schedules'] and (barber_id, day) not in data['closed']:
+                rows[(barber_id, day)] = len(rows)
+
+    result = {barber_id: {day: np.empty(0, dtype=np.int32) for day in dates} for barber_id in barber_ids}
+    if not rows:
+        return result
+
+    # Matriz de ocupación: diferencias por minuto -> minutos ocupados
+    diff = np.zeros((len(rows), MINUTES_PER_DAY + 1), dtype=np.int32)
+    marks = [
+        (rows[(barber_id, day)], _minute_floor(start), _minute_ceil(end))
+        for barber_id, day, start, end in data['busy']
+        if (barber_id, day) in rows and end > start
+    ]
+    if marks:
+        row_idx, starts, ends = np.array(marks, dtype=np.int32).T
+        np.add.at(diff, (row_idx, starts), 1)
+        np.add.at(diff, (row_idx, np.minimum(ends, MINUTES_PER_DAY)), -1)
+    occupied = np.cumsum(diff, axis=1) > 0
+    prefix = np.zeros((len(rows), MINUTES_PER_DAY + 1), dtype=np.int32)
+    np.cumsum(occupied[:, :MINUTES_PER_DAY], axis=1, out=prefix[:, 1:])
+
+    # Agrupar las filas por horario: todas comparten la misma grilla
+    by_schedule = {}
+    for (barber_id, day), row in rows.items():
+        by_schedule.setdefault((barber_id, day.weekday()), []).append((day, row))
+
+    for key, day_rows in by_schedule.items():
+        grid = slot_grid(data['schedules'][key], duration_minutes)
+        if not len(grid):
+            continue
+        row_idx = np.array([row for _, row in day_rows])[:, None]
+        taken = prefix[row_idx, grid + duration_minutes] - prefix[row_idx, grid]
+        free = taken == 0
+        for (day, _), mask in zip(day_rows, free):
+            result[key[0]][day] = grid[mask]
+
+    return result
+
+
+def format_minutes(minutes):
+    """
+    Convierte minutos desde la medianoche a cadenas 'HH:MM'
+    """
+    return [f"{minute // 60:02d}:{minute % 60:02d}" for minute in minutes.tolist()]
+
+
+class DaySlotData:
+    """
+    Excepciones, citas activas y retenciones vigentes de un día para varios
+    barberos.
+
+    Se cargan en bloque (una consulta por modelo) la primera vez que algún
+    horario las necesita, de modo que una página con todos sus slots en
+    caché no consulta nada.
+    """
+
+    def __init__(self, barber_ids, date):
+        self.barber_ids = set(barber_ids)
+        self.date = date
+        self._closed = None
+        self._busy = None
+        self._expires_at = None
+
+    def for_barber(self, barber_id):
+        """
+        ``DayData`` del barbero para ``Schedule.get_available_slots``
+        """
+        if self._busy is None:
+            self._load()
+        if barber_id in self._closed:
+            return DayData(True, [], None)
+        return DayData(False, self._busy.get(barber_id, []), self._expires_at.get(barber_id))
+
+    def _load(self):
+        self._closed = set(ScheduleException.objects.filter(
+            barber_id__in=self.barber_ids,
+            date=self.date,
+            is_active=True
+        ).values_list('barber_id', flat=True))
+
+        self._busy = {}
+        for barber_id, start, end in Appointment.objects.filter(
+            barber_id__in=self.barber_ids,
+            date=self.date,
+            status__in=['pending', 'confirmed']
+        ).values_list('barber_id', 'start_time', 'end_time'):
+            self._busy.setdefault(barber_id, []).append((start, end))
+
+        self._expires_at = {}
+        for barber_id, start, end, expires_at in SlotHold.active().filter(
+            barber_id__in=self.barber_ids,
+            date=self.date
+        ).values_list('barber_id', 'start_time', 'end_time', 'expires_at'):
+            self._busy.setdefault(barber_id, []).append((start, end))
+            self._expires_at[barber_id] = min(self._expires_at.get(barber_id, expires_at), expires_at)
+
+
+def cache_key(barber_id, date, duration):
+    return (barber_id, date, int(duration.total_seconds()))
+
+
+def _timeout_until(expires_at):
+    """
+    Segundos de vida de una entrada calculada con una retención que vence en
+    ``expires_at``; None si no hay retenciones
+    """
+    if expires_at is None:
+        return None
+    return max((expires_at - timezone.now()).total_seconds(), 0)
+
+
+def cached_schedule_slots(schedule, date, duration, day_data=None):
+    """
+    Slots libres ('HH:MM') de un horario, leyendo a través del caché.
+
+    Solo se cachea el caso canónico: el horario activo del día de la semana
+    de la fecha. Cualquier otra combinación se calcula directamente. Si se
+    pasa un ``DaySlotData`` que cubra al barbero, los fallos se calculan con
+    esos datos compartidos en lugar de consultar por horario.
+    """
+    def compute():
+        if day_data is not None and day_data.date == date and schedule.barber_id in day_data.barber_ids:
+            preloaded = day_data.for_barber(schedule.barber_id)
+        else:
+            preloaded = schedule.load_day_data(date)
+        slots = schedule.get_available_slots(date, duration, day_data=preloaded)
+        return [slot.strftime('%H:%M') for slot in slots], preloaded.expires_at
+
+    if not schedule.is_active or schedule.day_of_week != date.weekday():
+        return compute()[0]
+
+    key = cache_key(schedule.barber_id, date, duration)
+    slots = slot_cache.get(key)
+    if slots is None:
+        slots, expires_at = compute()
+        slots = tuple(slots)
+        slot_cache.set(key, slots, timeout=_timeout_until(expires_at))
+    return list(slots)
+
+
+def _cached_slots(barber_ids, dates, duration):
+    """
+    Slots en caché por barbero y fecha, y los pares barbero-día que faltan
+    """
+    result = {barber_id: {} for barber_id in barber_ids}
+    missing = []
+    for barber_id in barber_ids:
+        for day in dates:
+            slots = slot_cache.get(cache_key(barber_id, day, duration))
+            if slots is None:
+                missing.append((barber_id, day))
+            else:
+                result[barber_id][day] = list(slots)
+    return result, missing
+
+
+def _missing_range(missing):
+    missing_barbers = sorted({barber_id for barber_id, _ in missing})
+    missing_dates = sorted({day for _, day in missing})
+    return missing_barbers, missing_dates
+
+
+def _fill_missing(result, missing, duration, data):
+    """
+    Calcula con el motor en bloque los pares que faltan y los guarda
+    """
+    missing_barbers, missing_dates = _missing_range(missing)
+    with SLOT_LATENCY.labels(engine='numpy').time():
+        free = compute_availability(missing_barbers, missing_dates, duration, data)
+    for barber_id, day in missing:
+        slots = tuple(format_minutes(free[barber_id][day]))
+        slot_cache.set(
+            cache_key(barber_id, day, duration), slots,
+            timeout=_timeout_until(data['expires_at'].get((barber_id, day)))
+        )
+        result[barber_id][day] = list(slots)
+    return result
+
+
+def cached_availability(barber_ids, dates, duration):
+    """
+    Slots libres ('HH:MM') por barbero y fecha, leyendo a través del caché.
+
+    Los pares barbero-día que no están en caché se calculan juntos con el
+    motor en bloque y se guardan.
+    """
+    result, missing = _cached_slots(barber_ids, dates, duration)
+    if missing:
+        missing_barbers, missing_dates = _missing_range(missing)
+        data = load_availability_data(missing_barbers, missing_dates[0], missing_dates[-1])
+        _fill_missing(result, missing, duration, data)
+    return result
+
+
+async def acached_availability(barber_ids, dates, duration):
+    """
+    ``cached_availability`` con el ORM asíncrono; el caché y el cálculo no
+    hacen E/S y se ejecutan en el mismo hilo
+    """
+    result, missing = _cached_slots(barber_ids, dates, duration)
+    if missing:
+        missing_barbers, missing_dates = _missing_range(missing)
+        data = await aload_availability_data(missing_barbers, missing_dates[0], missing_dates[-1])
+        _fill_missing(result, missing, duration, data)
+    return result
+
+
+class BarberAgenda:
+    """
+    Horarios, excepciones, citas activas y retenciones vigentes de un
+    barbero en un rango de fechas, cargados en bloque (una consulta por
+    modelo) para validar muchas reservas en memoria.
+
+    Las retenciones de ``client`` no cuentan como ocupadas. ``add`` registra
+    las reservas aceptadas para que las siguientes se validen contra ellas.
+    """
+
+    def __init__(self, barber_id, start_date, end_date, client_id=None):
+        self.schedules = {
+            schedule.day_of_week: schedule
+            for schedule in Schedule.objects.filter(barber_id=barber_id, is_active=True)
+        }
+        self.closed = set(ScheduleException.objects.filter(
+            barber_id=barber_id,
+            date__range=[start_date, end_date],
+            is_active=True
+        ).values_list('date', flat=True))
+
+        self.busy = {}
+        for day, start, end in Appointment.objects.filter(
+            barber_id=barber_id,
+            date__range=[start_date, end_date],
+            status__in=['pending', 'confirmed']
+        ).values_list('date', 'start_time', 'end_time'):
+            self.add(day, start, end)
+        for day, start, end in SlotHold.active().filter(
+            barber_id=barber_id,
+            date__range=[start_date, end_date]
+        ).exclude(client_id=client_id).values_list('date', 'start_time', 'end_time'):
+            self.add(day, start, end)
+
+    def schedule_for(self, date):
+        return self.schedules.get(date.weekday())
+
+    def is_closed(self, date):
+        return date in self.closed
+
+    def has_overlap(self, date, start_time, end_time):
+        return any(
+            start < end_time and end > start_time
+            for start, end in self.busy.get(date, ())
+        )
+
+    def add(self, date, start_time, end_time):
+        self.busy.setdefault(date, []).append((start_time, end_time))
@@ -0,0 +1,243 @@
+"""
+Micro-benchmarks del núcleo de agenda: cálculo de slots, validación de
+reservas, serialización de listados y cambios de estado.
+
+Cada caso se mide llamándolo ``iterations`` veces (después de
+``warmup`` llamadas de calentamiento) con el recolector de basura apagado,
+y se informa la mediana, el mínimo, el p95 y las consultas SQL por
+llamada. Los resultados se guardan como JSON y se comparan con una corrida
+anterior: una mediana que empeora más que el umbral, o más consultas por
+llamada, cuentan como regresión. Ver ``manage.py benchmark``.
+"""
+import gc
+import platform
+import statistics
+import time as clock
+from datetime import date, time, timedelta
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import timing
+from .models import User, Service, Schedule, Appointment
+from .serializers import AppointmentSerializer, ServiceSerializer
+from .signals import add_to_daily_stats
+
+SLOT_DENSITIES = (0, 50, 100)
+DEFAULT_ROWS = (10, 100, 1000)
+
+
+class BenchmarkData:
+    """
+    Datos sintéticos: un barbero con horario de 9 a 19 todos los días
+    (20 slots de 30 minutos), días con 0/50/100 % de ocupación, ``rows``
+    servicios y ``rows`` citas
+    """
+
+    def __init__(self, rows):
+        prefix = f'bench{clock.time_ns()}'
+        password = make_password(None)
+        self.admin = User.objects.create(username=f'{prefix}_admin', password=password, role='admin', is_staff=True)
+        self.barber = User.objects.create(username=f'{prefix}_barber', password=password, role='barber')
+        self.client = User.objects.create(username=f'{prefix}_client', password=password, role='client')
+        Service.objects.bulk_create([
+            Service(
+                name=f'{prefix} servicio {index}', description='Servicio de prueba',
+                price='20000.00', duration=timedelta(minutes=30)
+            ) for index in range(rows)
+        ], batch_size=1000)
+        self.services = list(Service.objects.filter(name__startswith=prefix).order_by('id'))
+        self.service = self.services[0]
+        Schedule.objects.bulk_create([
+            Schedule(barber=self.barber, day_of_week=day, start_time=time(9, 0), end_time=time(19, 0))
+            for day in range(7)
+        ])
+        self.schedule = Schedule.objects.get(barber=self.barber, day_of_week=0)
+
+        # Los días de ocupación caen en lunes (el horario de self.schedule);
+        # las citas del listado se reparten en los días siguientes
+        first = date.today() + timedelta(days=1)
+        first += timedelta(days=-first.weekday() % 7)
+        self.density_days = {density: first + timedelta(weeks=index) for index, density in enumerate(SLOT_DENSITIES)}
+        appointments = []
+        for density, day in self.density_days.items():
+            appointments += self.day_appointments(day, 20 * density // 100)
+        day = first + timedelta(weeks=len(SLOT_DENSITIES))
+        while len(appointments) < len(SLOT_DENSITIES) * 20 + rows:
+            day += timedelta(days=1)
+            appointments += self.day_appointments(day, 20)
+        Appointment.objects.bulk_create(appointments, batch_size=1000)
+        add_to_daily_stats(appointments)
+        self.appointments = list(
+            Appointment.objects.filter(barber=self.barber).select_related('client', 'barber', 'service')
+            .order_by('date', 'start_time')[:rows]
+        )
+
+    def day_appointments(self, day, count):
+        """
+        ``count`` citas pendientes repartidas en los slots del día
+        """
+        slots = [(9 * 60 + 30 * index) for index in range(20)]
+        step = 20 / count if count else 0
+        return [
+            Appointment(
+                client=self.client, barber=self.barber, service=self.service,
+                price=self.service.price, duration=self.service.duration, date=day,
+                start_time=time(*divmod(start, 60)), end_time=time(*divmod(start + 30, 60)), status='pending'
+            ) for start in (slots[int(index * step)] for index in range(count))
+        ]
+
+    def request(self, user):
+        request = Request(APIRequestFactory().get('/'))
+        request.user = user
+        return request
+
+
+def slot_cases(data):
+    for density, day in data.density_days.items():
+        yield f'slots.get_available_slots[density={density}]', (
+            lambda day=day: data.schedule.get_available_slots(day, timedelta(minutes=30))
+        ), None
+
+
+def validate_cases(data):
+    context = {'request': data.request(data.client)}
+    free_day, busy_day = data.density_days[0], data.density_days[100]
+
+    def validate(day):
+        serializer = AppointmentSerializer(context=dict(context))
+        try:
+            serializer.validate({
+                'barber': data.barber, 'service': data.service, 'date': day, 'start_time': time(10, 0),
+            })
+        except serializers.ValidationError:
+            pass
+
+    yield 'booking.validate[free]', (lambda: validate(free_day)), None
+    yield 'booking.validate[conflict]', (lambda: validate(busy_day)), None
+
+
+def render_cases(data, rows):
+    context = {'request': data.request(data.admin)}
+    for count in rows:
+        services = data.services[:count]
+        appointments = data.appointments[:count]
+        yield f'render.services[rows={count}]', (
+            lambda services=services: ServiceSerializer(services, many=True, context=context).data
+        ), None
+        yield f'render.appointments[rows={count}]', (
+            lambda appointments=appointments: AppointmentSerializer(appointments, many=True, context=context).data
+        ), None
+
+
+def change_status_cases(data):
+    from .views import AppointmentViewSet
+
+    view = AppointmentViewSet.as_view({'patch': 'change_status'})
+    appointment_id = data.appointments[-1].pk
+    factory = APIRequestFactory()
+
+    def reset():
+        appointment = Appointment.objects.get(pk=appointment_id)
+        appointment.status = 'pending'
+        appointment.save(update_fields=['status'])
+
+    def change_status():
+        request = factory.patch('/', {'status': 'confirmed'}, format='json')
+        force_authenticate(request, user=data.admin)
+        response = view(request, pk=appointment_id)
+        if response.status_code != 200:
+            raise RuntimeError(f'change_status respondió {response.status_code}: {response.data}')
+
+    yield 'status.change_status', change_status, reset
+
+
+def build_cases(data, rows=DEFAULT_ROWS):
+    """
+    (nombre, función medida, preparación previa a cada llamada o None)
+    """
+    yield from slot_cases(data)
+    yield from validate_cases(data)
+    yield from render_cases(data, rows)
+    yield from change_status_cases(data)
+
+
+def measure(func, setup=None, iterations=30, warmup=3):
+    """
+    Estadísticas en milisegundos de ``iterations`` llamadas a ``func``
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    if setup:
+        setup()
+    timings, token = timing.start()
+    try:
+        func()
+    finally:
+        timing.finish(token)
+
+    samples = []
+    gc.collect()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            if setup:
+                setup()
+            started = clock.perf_counter()
+            func()
+            samples.append((clock.perf_counter() - started) * 1000)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'median_ms': round(statistics.median(samples), 4),
+        'min_ms': round(samples[0], 4),
+        'mean_ms': round(statistics.mean(samples), 4),
+        'p95_ms': round(samples[max(int(len(samples) * 0.95) - 1, 0)], 4),
+        'stdev_ms': round(statistics.stdev(samples), 4) if len(samples) > 1 else 0.0,
+        'queries': timings.queries,
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+        'processor': platform.processor() or None,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Filas (nombre, mediana base, mediana actual, cambio relativo, consultas
+    base, consultas actuales, estado) de los casos presentes en ambas corridas.
+    El estado es ``'regresión'``, ``'mejora'`` o ``''``
+    """
+    rows = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        change = (current['median_ms'] - previous['median_ms']) / previous['median_ms'] if previous['median_ms'] else 0.0
+        if change > threshold or current['queries'] > previous['queries']:
+            state = 'regresión'
+        elif change < -threshold or current['queries'] < previous['queries']:
+            state = 'mejora'
+        else:
+            state = ''
+        rows.append((
+            name, previous['median_ms'], current['median_ms'], change,
+            previous['queries'], current['queries'], state
+        ))
+    return rows
@@ -0,0 +1,297 @@
+"""
+Caché en memoria de los slots disponibles.
+
+Las entradas se guardan por (barbero, fecha, duración en segundos) con
+desalojo LRU y expiración por tiempo. Las señales de ``Appointment``,
+``Schedule`` y ``ScheduleException`` invalidan solo los días afectados
+(ver ``appointments.signals``).
+
+El caché vive en cada proceso: la invalidación por señales es inmediata en
+el proceso que escribe y los demás procesos ven el cambio al expirar la
+entrada (``AVAILABILITY_CACHE['TIMEOUT']``). La validación de la cita sigue
+siendo la fuente de verdad al reservar.
+
+``UserCache`` conserva por unos segundos los usuarios autenticados por JWT
+(ver ``appointments.authentication``). A diferencia de los slots, cada
+acierto se valida contra una versión por usuario guardada en un caché de
+Django compartido (``CACHES['auth']``), para que una desactivación o un
+cambio de rol se apliquen de inmediato en todos los procesos.
+
+``ResponseCache`` guarda las respuestas del catálogo en el caché de Django
+``CACHES['responses']``. Sus claves incluyen las versiones de
+``ResourceVersion``, así que un cambio invalida las entradas en todos los
+workers aunque el backend sea local a cada proceso.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class SlotCache:
+    """
+    Caché LRU con TTL e índice por barbero y fecha para invalidar en bloque
+    """
+
+    def __init__(self, max_entries=10000, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._index = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, timeout=None):
+        """
+        Guarda la entrada; ``timeout`` solo puede acortar la expiración
+        configurada (p. ej. hasta que venza una retención de horario)
+        """
+        barber_id, date = key[0], key[1]
+        if timeout is None or timeout > self.timeout:
+            timeout = self.timeout
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            self._index.setdefault(barber_id, {}).setdefault(date, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, barber_id, date=None):
+        """
+        Elimina las entradas de un barbero para una fecha, o todas si
+        no se indica la fecha
+        """
+        with self._lock:
+            dates = self._index.get(barber_id)
+            if not dates:
+                return
+            targets = [date] if date is not None else list(dates)
+            for day in targets:
+                for key in list(dates.get(day, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'timeout': self.timeout,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        barber_id, date = key[0], key[1]
+        dates = self._index.get(barber_id)
+        if dates is None:
+            return
+        keys = dates.get(date)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del dates[date]
+        if not dates:
+            del self._index[barber_id]
+
+
+slot_cache = SlotCache(**{
+    key.lower(): value
+    for key, value in getattr(settings, 'AVAILABILITY_CACHE', {}).items()
+})
+
+
+class UserCache:
+    """
+    Valores de las filas de usuario por ID, con TTL corto y desalojo LRU.
+    Se guardan los valores y no la instancia para que cada petición
+    reciba un objeto propio.
+
+    Con ``version_cache`` (un alias de ``CACHES``) cada entrada recuerda la
+    versión compartida del usuario al leerlo de la base de datos y cada
+    acierto la compara con la actual: ``invalidate`` la cambia, así que una
+    escritura en un worker descarta la copia de todos los demás.
+    """
+
+    def __init__(self, max_entries=5000, timeout=30, version_cache=None):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.version_cache = version_cache
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _version_key(self, user_id):
+        return f'user-version:{user_id}'
+
+    def version(self, user_id):
+        """
+        Versión compartida del usuario (``None`` si no se cambió nunca o
+        no hay ``version_cache``). Hay que leerla antes de cargar la fila
+        que se guarda con ``set``.
+        """
+        if self.version_cache is None:
+            return None
+        return caches[self.version_cache].get(self._version_key(user_id))
+
+    async def aversion(self, user_id):
+        """
+        ``version`` con la API asíncrona del caché, para no bloquear el
+        bucle de eventos con la lectura del backend
+        """
+        if self.version_cache is None:
+            return None
+        return await caches[self.version_cache].aget(self._version_key(user_id))
+
+    def get(self, user_id):
+        return self._lookup(user_id, self.version(user_id))
+
+    async def aget(self, user_id):
+        return self._lookup(user_id, await self.aversion(user_id))
+
+    def _lookup(self, user_id, version):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] <= now or entry[2] != version:
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, user_id, values, version=None):
+        with self._lock:
+            self._entries[user_id] = (values, time.monotonic() + self.timeout, version)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+        if self.version_cache is not None:
+            # Un valor nuevo y no un contador: si el backend desalojó la
+            # clave, volver a 1 podría coincidir con una versión guardada
+            caches[self.version_cache].set(self._version_key(user_id), uuid.uuid4().hex, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'timeout': self.timeout,
+                'version_cache': self.version_cache,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations,
+            }
+
+
+user_cache = UserCache(**{
+    key.lower(): value
+    for key, value in getattr(settings, 'AUTH_USER_CACHE', {}).items()
+})
+
+
+class ResponseCache:
+    """
+    Datos serializados de respuestas sobre un alias de ``CACHES``, con
+    contadores de aciertos y fallos del proceso
+    """
+
+    def __init__(self, alias='responses'):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    async def aget(self, key):
+        value = await self.backend.aget(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    async def aset(self, key, value):
+        await self.backend.aset(key, value)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        backend = self.backend
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': f'{type(backend).__module__}.{type(backend).__name__}',
+                'timeout': backend.default_timeout,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+response_cache = ResponseCache()
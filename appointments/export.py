@@ -0,0 +1,91 @@
+"""
+Exportación de citas en CSV o NDJSON.
+
+Las filas se leen por lotes con paginación por llave (fecha, hora, id) y
+con los nombres relacionados resueltos en la misma consulta, así que la
+memoria usada no depende del número de citas exportadas. Se usa llave en
+lugar de un cursor del servidor porque MySQLdb carga en memoria el
+resultado completo de cada consulta.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Trim
+
+from .pagination import keyset_filter
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORT_COLUMNS = (
+    'id', 'client', 'client_name', 'barber', 'barber_name',
+    'service', 'service_name', 'service_price',
+    'date', 'start_time', 'end_time', 'status', 'notes', 'created_at'
+)
+
+EXPORT_ORDERING = ('date', 'start_time', 'id')
+
+
+def _full_name(prefix):
+    return Trim(Concat(f'{prefix}__first_name', Value(' '), f'{prefix}__last_name'))
+
+
+def iter_export_rows(queryset, batch_size=2000):
+    """
+    Recorre las citas en orden cronológico, un lote por consulta
+    """
+    queryset = queryset.annotate(
+        client_name=_full_name('client'),
+        barber_name=_full_name('barber'),
+        service_name=F('service__name'),
+        service_price=F('price'),
+    ).order_by(*EXPORT_ORDERING).values_list(*EXPORT_COLUMNS)
+
+    date_index, time_index, id_index = (EXPORT_COLUMNS.index(field) for field in EXPORT_ORDERING)
+    position = None
+    while True:
+        batch = queryset
+        if position is not None:
+            batch = batch.filter(keyset_filter(EXPORT_ORDERING, position))
+        rows = list(batch[:batch_size])
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+        position = (last[date_index], last[time_index], last[id_index])
+
+
+class _Echo:
+    """
+    Búfer mínimo para que ``csv.writer`` devuelva cada línea en lugar de
+    acumularlas
+    """
+
+    def write(self, value):
+        return value
+
+
+def _format(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow([_format(value) for value in row])
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+STREAMERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+}
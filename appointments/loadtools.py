@@ -0,0 +1,181 @@
+"""
+Generador de carga HTTP para medir endpoints de un servidor en marcha.
+
+Reparte las peticiones entre varios hilos, cada uno con su conexión
+keep-alive, y mide la latencia de cada respuesta completa. Sirve para
+comparar despliegues (p. ej. WSGI con gunicorn frente a ASGI con uvicorn)
+con la misma cantidad de workers; el cliente consume CPU, así que conviene
+ejecutarlo en otra máquina o con núcleos libres.
+
+``Session`` y ``Recorder`` sirven para escenarios con varios pasos (iniciar
+sesión, consultar, reservar) que registran la latencia por endpoint.
+"""
+import http.client
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+
+def _connection(parts, timeout):
+    cls = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    return cls(parts.hostname, parts.port, timeout=timeout)
+
+
+def run_load(url, headers=None, concurrency=16, requests=1000, timeout=30):
+    """
+    Hace ``requests`` GET a ``url`` con ``concurrency`` clientes simultáneos
+    y devuelve el rendimiento y los percentiles de latencia (ms)
+    """
+    parts = urlsplit(url)
+    target = parts.path + (f'?{parts.query}' if parts.query else '')
+    headers = dict(headers or {})
+    latencies = []
+    statuses = {}
+    errors = []
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def take():
+        with lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def worker():
+        connection = _connection(parts, timeout)
+        own = []
+        while take():
+            started = time.perf_counter()
+            try:
+                connection.request('GET', target, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                code = response.status
+            except (OSError, http.client.HTTPException) as exc:
+                connection.close()
+                connection = _connection(parts, timeout)
+                with lock:
+                    errors.append(str(exc))
+                continue
+            own.append((time.perf_counter() - started) * 1000)
+            with lock:
+                statuses[code] = statuses.get(code, 0) + 1
+        connection.close()
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, statuses, errors, elapsed, concurrency)
+
+
+def summarize(latencies, statuses, errors, elapsed, concurrency):
+    values = np.array(latencies) if latencies else np.zeros(1)
+    ok = sum(count for code, count in statuses.items() if code < 400)
+    p50, p90, p95, p99 = np.percentile(values, [50, 90, 95, 99])
+    return {
+        'requests': len(latencies) + len(errors),
+        'concurrency': concurrency,
+        'ok': ok,
+        'errors': len(errors) + sum(count for code, count in statuses.items() if code >= 400),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'seconds': round(elapsed, 3),
+        'rps': round(ok / elapsed, 1) if elapsed else None,
+        'p50_ms': round(float(p50), 2),
+        'p90_ms': round(float(p90), 2),
+        'p95_ms': round(float(p95), 2),
+        'p99_ms': round(float(p99), 2),
+        'max_ms': round(float(values.max()), 2),
+    }
+
+
+class Recorder:
+    """
+    Latencias, códigos de respuesta y eventos (p. ej. conflictos) por
+    endpoint, compartidos por todos los hilos de un escenario
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(dict)
+        self.errors = defaultdict(list)
+        self.events = Counter()
+
+    def add(self, endpoint, latency_ms, code=None, error=None):
+        with self.lock:
+            if error is not None:
+                self.errors[endpoint].append(error)
+                return
+            self.latencies[endpoint].append(latency_ms)
+            self.statuses[endpoint][code] = self.statuses[endpoint].get(code, 0) + 1
+
+    def count(self, event, amount=1):
+        with self.lock:
+            self.events[event] += amount
+
+    def summary(self, elapsed, concurrency):
+        with self.lock:
+            endpoints = sorted(self.latencies.keys() | self.errors.keys())
+            return {
+                endpoint: summarize(
+                    self.latencies[endpoint], self.statuses[endpoint], self.errors[endpoint], elapsed, concurrency
+                )
+                for endpoint in endpoints
+            }
+
+
+class Session:
+    """
+    Cliente JSON con conexión keep-alive propia (uno por hilo). Cada
+    petición se registra en ``recorder`` con el nombre de endpoint indicado
+    """
+
+    def __init__(self, base_url, recorder, timeout=30):
+        self.parts = urlsplit(base_url)
+        self.prefix = self.parts.path.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+        self.token = None
+        self.connection = _connection(self.parts, timeout)
+
+    def request(self, endpoint, method, path, data=None, params=None):
+        """
+        Devuelve (código, cuerpo decodificado) o (None, None) si falló la conexión
+        """
+        target = self.prefix + path + (f'?{urlencode(params)}' if params else '')
+        headers = {'Accept': 'application/json'}
+        body = None
+        if data is not None:
+            body = json.dumps(data)
+            headers['Content-Type'] = 'application/json'
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, target, body=body, headers=headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException) as exc:
+            self.connection.close()
+            self.connection = _connection(self.parts, self.timeout)
+            self.recorder.add(endpoint, None, error=str(exc))
+            return None, None
+        self.recorder.add(endpoint, (time.perf_counter() - started) * 1000, response.status)
+        try:
+            return response.status, json.loads(content) if content else None
+        except ValueError:
+            return response.status, None
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,132 @@
+"""
+Micro-benchmarks del núcleo de agenda (ver ``appointments.benchmarks``).
+
+Los datos se crean dentro de una transacción que se revierte al terminar.
+No necesita MySQL: con el perfil ``barbershop.settings_benchmark`` corre
+sobre SQLite en memoria y aplica las migraciones al iniciar.
+
+    DJANGO_SETTINGS_MODULE=barbershop.settings_benchmark python manage.py benchmark --save base.json
+    DJANGO_SETTINGS_MODULE=barbershop.settings_benchmark python manage.py benchmark --baseline base.json
+
+Con ``--fail-on-regression`` el comando termina con error si algún caso
+empeora más que ``--threshold`` o hace más consultas que en la base.
+"""
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+
+from appointments.benchmarks import DEFAULT_ROWS, BenchmarkData, build_cases, compare, environment, measure
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Mide el cálculo de slots, la validación de reservas, la serialización y change_status'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30, help='Llamadas medidas por caso')
+        parser.add_argument('--warmup', type=int, default=3, help='Llamadas previas sin medir')
+        parser.add_argument(
+            '--rows', default=','.join(map(str, DEFAULT_ROWS)), help='Tamaños de los listados serializados'
+        )
+        parser.add_argument('--filter', default='', help='Solo los casos cuyo nombre contiene este texto')
+        parser.add_argument('--save', help='Guardar los resultados en este archivo JSON')
+        parser.add_argument('--baseline', help='Comparar con los resultados guardados en este archivo')
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Aumento relativo de la mediana que cuenta como regresión (0.25 = 25 %%)'
+        )
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            rows = sorted({int(value) for value in options['rows'].split(',') if value})
+        except ValueError:
+            raise CommandError('--rows debe ser una lista de enteros separados por coma')
+        if not rows or options['iterations'] < 1:
+            raise CommandError('Se necesita al menos un tamaño de listado y una iteración')
+        baseline = self.load_baseline(options['baseline'])
+        self.migrate()
+
+        results = {}
+        try:
+            with transaction.atomic():
+                data = BenchmarkData(rows[-1])
+                for name, func, setup in build_cases(data, rows):
+                    if options['filter'] not in name:
+                        continue
+                    results[name] = stats = measure(func, setup, options['iterations'], options['warmup'])
+                    self.stdout.write(
+                        f"{name:<42} mediana {stats['median_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms  "
+                        f"{stats['queries']:>3} consultas"
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options['save']:
+            with open(options['save'], 'w') as output:
+                json.dump({
+                    'created_at': timezone.now().isoformat(),
+                    'environment': environment(),
+                    'iterations': options['iterations'],
+                    'benchmarks': results,
+                }, output, indent=2)
+
+        if baseline is not None:
+            self.report(
+                compare(results, baseline['benchmarks'], options['threshold']),
+                baseline, options['fail_on_regression']
+            )
+
+    def load_baseline(self, path):
+        if not path:
+            return None
+        try:
+            with open(path) as source:
+                baseline = json.load(source)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'No se pudo leer la base {path}: {exc}')
+        if 'benchmarks' not in baseline:
+            raise CommandError(f'{path} no es un resultado de benchmark')
+        return baseline
+
+    def migrate(self):
+        """
+        Aplica las migraciones si la base está en memoria; si no, exige
+        que estén aplicadas
+        """
+        executor = MigrationExecutor(connection)
+        if not executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            return
+        if not (connection.vendor == 'sqlite' and connection.is_in_memory_db()):
+            raise CommandError('Hay migraciones pendientes: ejecutar manage.py migrate')
+        call_command('migrate', database=DEFAULT_DB_ALIAS, verbosity=0, interactive=False)
+
+    def report(self, rows, baseline, fail_on_regression):
+        if baseline.get('environment') != environment():
+            self.stdout.write(self.style.WARNING(
+                'AVISO: la base se midió en otro entorno; comparar con cautela'
+            ))
+        regressions = 0
+        self.stdout.write(self.style.MIGRATE_HEADING('\nComparación con la base'))
+        for name, base_ms, current_ms, change, base_queries, queries, state in rows:
+            line = (
+                f'{name:<42} {base_ms:>9.3f} -> {current_ms:>9.3f} ms ({change:+.1%})  '
+                f'consultas {base_queries} -> {queries}  {state}'
+            )
+            if state == 'regresión':
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line))
+            elif state == 'mejora':
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(line)
+        if regressions and fail_on_regression:
+            raise CommandError(f'{regressions} regresiones respecto de la base')
@@ -0,0 +1,105 @@
+"""
+Compara las vistas síncronas servidas por WSGI con las asíncronas servidas
+por ASGI: peticiones por segundo y latencias p50/p90/p99 por endpoint.
+
+Los dos servidores deben estar en marcha con el mismo número de workers y
+la misma base de datos, por ejemplo:
+
+    gunicorn barbershop.wsgi:application --workers 4 --bind 127.0.0.1:8000
+    uvicorn barbershop.asgi:application --workers 4 --port 8001
+    python manage.py compare_stacks --username admin --concurrency 64
+
+Con ``--sync-paths`` ambos servidores reciben las rutas síncronas, lo que
+permite comparar, p. ej., el servidor de desarrollo con el perfil de
+producción:
+
+    python manage.py compare_stacks --username admin --sync-paths --labels dev,prod \
+        --wsgi-url http://127.0.0.1:8000 --asgi-url http://127.0.0.1:8001
+
+El token de acceso se genera localmente para el usuario indicado, así que
+los dos servidores deben usar la misma ``SECRET_KEY`` que el comando.
+"""
+import json
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from appointments.loadtools import run_load
+from appointments.models import User, Service
+
+# Endpoint -> (ruta síncrona, ruta asíncrona)
+ENDPOINTS = {
+    'availability': ('/api/availability/', '/api/async/availability/'),
+    'upcoming': ('/api/appointments/upcoming/', '/api/async/appointments/upcoming/'),
+    'today': ('/api/appointments/today/', '/api/async/appointments/today/'),
+    'services': ('/api/services/', '/api/async/services/'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Compara rendimiento y latencia de las vistas síncronas (WSGI) y asíncronas (ASGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001')
+        parser.add_argument('--username', required=True, help='Usuario con el que se autentican las peticiones')
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=2000, help='Peticiones por endpoint y servidor')
+        parser.add_argument('--days', type=int, default=7, help='Días consultados en availability')
+        parser.add_argument('--json', dest='json_path', help='Guardar los resultados en este archivo')
+        parser.add_argument(
+            '--sync-paths', action='store_true',
+            help='Usar las rutas síncronas también en el segundo servidor'
+        )
+        parser.add_argument('--labels', default='wsgi,asgi', help='Nombres de los dos servidores en el resultado')
+
+    def handle(self, *args, **options):
+        names = [name for name in options['endpoints'].split(',') if name]
+        unknown = set(names) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Endpoints desconocidos: {', '.join(sorted(unknown))}")
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No existe el usuario {options['username']}")
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}', 'Accept': 'application/json'}
+        query = self.queries(options['days'])
+        labels = options['labels'].split(',')
+        if len(labels) != 2:
+            raise CommandError('--labels necesita dos nombres separados por coma')
+
+        results = []
+        for name in names:
+            for stack, base, path in (
+                (labels[0], options['wsgi_url'], ENDPOINTS[name][0]),
+                (labels[1], options['asgi_url'], ENDPOINTS[name][0 if options['sync_paths'] else 1]),
+            ):
+                url = base.rstrip('/') + path + (f'?{query[name]}' if query.get(name) else '')
+                stats = run_load(url, headers, options['concurrency'], options['requests'])
+                results.append({'endpoint': name, 'stack': stack, **stats})
+                self.stdout.write(
+                    f"{name:<13} {stack:<5} {stats['rps'] or 0:>9.1f} req/s  "
+                    f"p50 {stats['p50_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms  "
+                    f"errores {stats['errors']}"
+                )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+    def queries(self, days):
+        service = Service.objects.filter(is_active=True).order_by('id').first()
+        if service is None:
+            raise CommandError('Se necesita al menos un servicio activo')
+        today = timezone.localdate()
+        return {
+            'availability': urlencode({
+                'service': service.id,
+                'start_date': today.isoformat(),
+                'end_date': (today + timedelta(days=days - 1)).isoformat(),
+            }),
+        }
@@ -0,0 +1,109 @@
+"""
+Muestra el plan de ejecución (EXPLAIN) y los tiempos de las consultas más
+usadas al reservar y listar citas, sobre un conjunto de datos sintético.
+
+Los datos se crean dentro de una transacción que se revierte al terminar,
+salvo que se use --keep.
+
+    python manage.py explain_booking_queries --barbers 20 --days 365
+"""
+import random
+import statistics
+import time as clock
+from datetime import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from appointments.models import ScheduleException, Appointment
+from appointments.pagination import KeysetPagination
+from appointments.seeding import ShopSeeder
+from appointments.views import active_appointments
+
+# Indicadores de recorrido completo u ordenamiento extra en MySQL y SQLite
+PLAN_WARNINGS = ('type: ALL', "'type': 'ALL'", 'Using filesort', 'SCAN appointments', 'USE TEMP B-TREE')
+
+
+# Primera página de los listados de citas: mismo orden y tamaño (una fila
+# más para saber si hay otra página) que AppointmentViewSet
+CHRONOLOGICAL = ('date', 'start_time', 'id')
+RECENT_FIRST = ('-date', '-start_time', '-id')
+PAGE = KeysetPagination.page_size + 1
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Crea datos sintéticos y muestra EXPLAIN y tiempos de las consultas de reservas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--barbers', type=int, default=20)
+        parser.add_argument('--clients', type=int, default=500)
+        parser.add_argument('--days', type=int, default=365, help='Días de historial de citas')
+        parser.add_argument('--repeat', type=int, default=50, help='Repeticiones por consulta')
+        parser.add_argument('--keep', action='store_true', help='Conservar los datos creados')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['barbers'], options['clients'], options['days'])
+                self.report(options['repeat'])
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write('Datos sintéticos descartados')
+
+    def seed(self, n_barbers, n_clients, n_days):
+        seeder = ShopSeeder(
+            barbers=n_barbers, clients=n_clients, days_back=n_days, days_ahead=30,
+            prefix=f'explain{random.randrange(10 ** 6)}'
+        ).run()
+        self.barbers, self.clients = seeder.barbers, seeder.clients
+        self.today = timezone.localdate()
+        self.stdout.write(
+            f"{seeder.counts['appointments']} citas, {seeder.counts['exceptions']} excepciones y "
+            f"{seeder.counts['users']} usuarios creados en {seeder.seconds:.1f}s"
+        )
+
+    def queries(self):
+        barber = random.choice(self.barbers)
+        client = random.choice(self.clients)
+        active = ['pending', 'confirmed']
+        by_barber = Appointment.objects.filter(barber=barber)
+        return {
+            'Superposición al reservar': Appointment.objects.filter(
+                barber=barber, date=self.today, status__in=active,
+                start_time__lt=time(11, 0), end_time__gt=time(10, 0)
+            ).order_by().values('id')[:1],
+            'Excepción del día': ScheduleException.objects.filter(
+                barber=barber, date=self.today, is_active=True
+            ).order_by().values('id')[:1],
+            'Citas de hoy (barbero)': active_appointments(by_barber, 'today').order_by(*CHRONOLOGICAL)[:PAGE],
+            'Próximas citas (barbero)': active_appointments(by_barber, 'upcoming').order_by(*CHRONOLOGICAL)[:PAGE],
+            'Citas de hoy (admin)': active_appointments(Appointment.objects.all(), 'today').order_by(
+                *CHRONOLOGICAL
+            )[:PAGE],
+            'Historial del cliente': Appointment.objects.filter(client=client).order_by(*RECENT_FIRST)[:PAGE],
+            'Historial del barbero': by_barber.order_by(*RECENT_FIRST)[:PAGE],
+        }
+
+    def report(self, repeat):
+        for name, queryset in self.queries().items():
+            plan = queryset.explain()
+            timings = []
+            for _ in range(repeat):
+                started = clock.perf_counter()
+                list(queryset.all())
+                timings.append((clock.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{name}'))
+            self.stdout.write(plan)
+            self.stdout.write(
+                f'media {statistics.mean(timings):.2f} ms, '
+                f'p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms ({connection.vendor})'
+            )
+            if any(marker in plan for marker in PLAN_WARNINGS):
+                self.stdout.write(self.style.WARNING('AVISO: recorrido completo u ordenamiento sin índice'))
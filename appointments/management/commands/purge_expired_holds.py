@@ -0,0 +1,38 @@
+"""
+Elimina las retenciones de horario vencidas.
+
+Las retenciones vencidas ya no ocupan el horario (se filtran por
+``expires_at``); este comando solo mantiene la tabla pequeña y puede
+ejecutarse periódicamente, por ejemplo desde cron.
+
+    python manage.py purge_expired_holds
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from appointments.models import SlotHold
+
+
+class Command(BaseCommand):
+    help = 'Elimina por lotes las retenciones de horario vencidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--grace', type=int, default=60,
+            help='Segundos que se conservan las retenciones después de vencer'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        deleted = 0
+        while True:
+            ids = list(SlotHold.objects.filter(
+                expires_at__lte=cutoff
+            ).values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += SlotHold.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(f'{deleted} retenciones vencidas eliminadas')
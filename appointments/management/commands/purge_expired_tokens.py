@@ -0,0 +1,45 @@
+"""
+Elimina los refresh tokens vencidos de la lista negra.
+
+Cada refresh agrega una fila a ``OutstandingToken`` y otra a
+``BlacklistedToken``; una vez vencido el token ninguna de las dos hace
+falta, porque simplejwt rechaza el token por su ``exp``. A diferencia de
+``flushexpiredtokens`` de simplejwt, borra por lotes para no cargar todas
+las filas en memoria ni bloquear la tabla completa. Puede ejecutarse
+periódicamente, por ejemplo desde cron:
+
+    python manage.py purge_expired_tokens
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Elimina por lotes los refresh tokens vencidos y sus entradas en la lista negra'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--grace', type=int, default=0,
+            help='Segundos que se conservan los tokens después de vencer'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        blacklisted = outstanding = 0
+        while True:
+            ids = list(OutstandingToken.objects.filter(
+                expires_at__lte=cutoff
+            ).order_by('id').values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            # La eliminación en cascada incluye las entradas de la lista negra
+            _, deleted = OutstandingToken.objects.filter(id__in=ids).delete()
+            outstanding += deleted.get(OutstandingToken._meta.label, 0)
+            blacklisted += deleted.get(BlacklistedToken._meta.label, 0)
+        self.stdout.write(
+            f'{outstanding} tokens vencidos eliminados ({blacklisted} en lista negra)'
+        )
@@ -0,0 +1,58 @@
+"""
+Recalcula el resumen diario ``DailyBarberStats`` a partir de las citas.
+
+El resumen se mantiene por señales; las escrituras que no las envían
+(``QuerySet.update``, cargas de datos, cambios de precio de un servicio)
+pueden dejarlo desfasado. El comando recalcula el rango por tramos cortos
+para no mantener transacciones largas e informa cuántos días no
+coincidían.
+
+    python manage.py rebuild_daily_stats --start-date 2024-01-01 --end-date 2024-12-31
+    python manage.py rebuild_daily_stats --dry-run
+"""
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from appointments.models import Appointment, DailyBarberStats
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {value}. Use YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o verifica el resumen diario por barbero desde las citas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=_date, help='Por defecto, la primera cita')
+        parser.add_argument('--end-date', type=_date, help='Por defecto, la última cita')
+        parser.add_argument('--barber', type=int, action='append', dest='barbers', help='Puede repetirse')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Días por transacción')
+        parser.add_argument('--dry-run', action='store_true', help='Solo contar los días desfasados')
+
+    def handle(self, *args, **options):
+        bounds = Appointment.objects.aggregate(first=Min('date'), last=Max('date'))
+        start_date = options['start_date'] or bounds['first']
+        end_date = options['end_date'] or bounds['last']
+        if start_date is None or end_date is None:
+            self.stdout.write('No hay citas para resumir')
+            return
+        if end_date < start_date:
+            raise CommandError('La fecha final debe ser posterior a la fecha inicial')
+
+        mismatched = 0
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(chunk_start + timedelta(days=options['chunk_days'] - 1), end_date)
+            mismatched += DailyBarberStats.rebuild(
+                chunk_start, chunk_end, options['barbers'], dry_run=options['dry_run']
+            )
+            chunk_start = chunk_end + timedelta(days=1)
+
+        action = 'por corregir' if options['dry_run'] else 'corregidos'
+        self.stdout.write(f'{start_date} a {end_date}: {mismatched} días desfasados {action}')
@@ -0,0 +1,57 @@
+"""
+Carga datos sintéticos de la barbería (ver ``appointments.seeding``):
+barberos, clientes, servicios, horarios, excepciones y años de citas sin
+superposición, con una mezcla de estados realista.
+
+    python manage.py seed_shop --barbers 50 --clients 5000 --days-back 730
+
+Todos los usuarios creados comparten la contraseña ``--password``. Los
+nombres de usuario llevan el prefijo ``--prefix`` (``seed_barber0``,
+``seed_client0``...), que no debe estar en uso.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.models import User
+from appointments.seeding import ShopSeeder
+
+
+class Command(BaseCommand):
+    help = 'Crea barberos, clientes, servicios, horarios, excepciones y citas sintéticas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--barbers', type=int, default=20)
+        parser.add_argument('--clients', type=int, default=2000)
+        parser.add_argument('--days-back', type=int, default=730, help='Días de historial de citas')
+        parser.add_argument('--days-ahead', type=int, default=30, help='Días de citas futuras')
+        parser.add_argument('--occupancy', type=float, default=0.7, help='Fracción de slots reservados (0 a 1)')
+        parser.add_argument(
+            '--exception-rate', type=float, default=0.03, help='Probabilidad de que un barbero no trabaje un día'
+        )
+        parser.add_argument('--password', default='barbershop2024', help='Contraseña de todos los usuarios')
+        parser.add_argument('--prefix', default='seed', help='Prefijo de los nombres de usuario')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, help='Semilla para repetir exactamente los mismos datos')
+
+    def handle(self, *args, **options):
+        if options['barbers'] < 1 or options['clients'] < 1:
+            raise CommandError('Se necesita al menos un barbero y un cliente')
+        if not 0 <= options['occupancy'] <= 1 or not 0 <= options['exception_rate'] <= 1:
+            raise CommandError('--occupancy y --exception-rate deben estar entre 0 y 1')
+        if User.objects.filter(username__startswith=f"{options['prefix']}_").exists():
+            raise CommandError(f"Ya existen usuarios con el prefijo {options['prefix']}_; usar otro --prefix")
+
+        seeder = ShopSeeder(
+            barbers=options['barbers'], clients=options['clients'],
+            days_back=options['days_back'], days_ahead=options['days_ahead'],
+            occupancy=options['occupancy'], exception_rate=options['exception_rate'],
+            password=options['password'], prefix=options['prefix'],
+            batch_size=options['batch_size'], seed=options['seed'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        ).run()
+
+        counts = seeder.counts
+        self.stdout.write(self.style.SUCCESS(
+            f"{counts['appointments']} citas, {counts['exceptions']} excepciones, "
+            f"{counts['users']} usuarios, {counts['schedules']} horarios y "
+            f"{counts['services']} servicios nuevos creados en {seeder.seconds:.1f}s"
+        ))
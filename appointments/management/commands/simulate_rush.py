@@ -0,0 +1,300 @@
+"""
+Simula la hora pico de un sábado contra un servidor en marcha: muchos
+clientes inician sesión (``auth/login/``), consultan la disponibilidad,
+retienen un horario y compiten por reservarlo (``POST /api/appointments/``)
+mientras los barberos confirman sus citas pendientes (``change_status``).
+
+Usa los usuarios creados por ``seed_shop`` (``<prefix>_client*`` y
+``<prefix>_barber*``, con la misma contraseña) y debe correr con la misma
+base de datos que el servidor, que sirve tanto MySQL como SQLite:
+
+    python manage.py seed_shop --barbers 10 --clients 500
+    python manage.py runserver 127.0.0.1:8000
+    python manage.py simulate_rush --clients 200 --barbers 5 --json rush.json
+
+Informa rendimiento y latencias p50/p95/p99 por endpoint, tasas de error y
+de conflicto, y verifica al final que no haya citas activas superpuestas.
+"""
+import json
+import random
+import threading
+import time as clock
+from collections import Counter
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from appointments.loadtools import Recorder, Session
+from appointments.models import User, Service, Appointment
+
+OVERLAP_MESSAGE = 'Ya existe una cita en este horario'
+
+
+def next_saturday():
+    day = timezone.localdate() + timedelta(days=1)
+    return day + timedelta(days=(5 - day.weekday()) % 7)
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {value}. Use YYYY-MM-DD')
+
+
+def double_bookings(barber_ids, day):
+    """
+    Pares de citas activas del mismo barbero que se superponen en el día
+    """
+    pairs = []
+    appointments = Appointment.objects.filter(
+        barber_id__in=barber_ids, date=day, status__in=['pending', 'confirmed']
+    ).order_by('barber_id', 'start_time').values_list('id', 'barber_id', 'start_time', 'end_time')
+    previous = None
+    for appointment in appointments:
+        if previous and previous[1] == appointment[1] and appointment[2] < previous[3]:
+            pairs.append((previous[0], appointment[0]))
+        if not previous or previous[1] != appointment[1] or appointment[3] > previous[3]:
+            previous = appointment
+    return pairs
+
+
+def conflict(data):
+    return OVERLAP_MESSAGE in json.dumps(data, ensure_ascii=False)
+
+
+class Command(BaseCommand):
+    help = 'Simula la hora pico: inicios de sesión, disponibilidad, retenciones, reservas y cambios de estado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api')
+        parser.add_argument('--clients', type=int, default=100, help='Clientes simultáneos')
+        parser.add_argument('--barbers', type=int, default=5, help='Barberos que reciben reservas y las confirman')
+        parser.add_argument('--prefix', default='seed', help='Prefijo de los usuarios de seed_shop')
+        parser.add_argument('--password', default='barbershop2024')
+        parser.add_argument('--date', type=_date, help='Día a reservar (por defecto el próximo sábado)')
+        parser.add_argument('--service', type=int, help='ID del servicio (por defecto el primero activo)')
+        parser.add_argument('--attempts', type=int, default=3, help='Intentos de reserva por cliente')
+        parser.add_argument('--hold-rate', type=float, default=0.5, help='Fracción de reservas con retención previa')
+        parser.add_argument(
+            '--hot-slots', type=int, default=5,
+            help='Cada cliente elige entre los primeros N horarios libres (más bajo = más competencia)'
+        )
+        parser.add_argument(
+            '--ramp-up', type=float, default=5,
+            help='Segundos en los que se reparten las llegadas de los clientes (0 = todos a la vez)'
+        )
+        parser.add_argument('--barber-interval', type=float, default=0.5, help='Segundos entre revisiones del barbero')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--json', dest='json_path', help='Guardar los resultados en este archivo')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options['seed'])
+        self.day = options['date'] or next_saturday()
+        self.service = self.pick_service(options['service'])
+        self.barbers = list(User.objects.filter(
+            username__startswith=f"{options['prefix']}_barber", role='barber', is_active=True,
+            schedules__day_of_week=self.day.weekday(), schedules__is_active=True,
+        ).order_by('id').values_list('id', 'username')[:options['barbers']])
+        clients = list(User.objects.filter(
+            username__startswith=f"{options['prefix']}_client", role='client', is_active=True
+        ).order_by('id').values_list('username', flat=True)[:options['clients']])
+        if not self.barbers or len(clients) < options['clients']:
+            raise CommandError(
+                f"Se necesitan {options['clients']} clientes y al menos un barbero con horario el "
+                f"{self.day} con el prefijo {options['prefix']}_ (ver seed_shop)"
+            )
+
+        self.recorder = Recorder()
+        self.clients_done = threading.Event()
+        barber_threads = [
+            threading.Thread(target=self.barber, args=(username,)) for _, username in self.barbers
+        ]
+        client_threads = [
+            threading.Thread(
+                target=self.client,
+                args=(username, self.random.random(), options['ramp_up'] * index / len(clients))
+            ) for index, username in enumerate(clients)
+        ]
+        self.stdout.write(
+            f"{len(clients)} clientes y {len(self.barbers)} barberos el {self.day} "
+            f"(servicio {self.service.id}) contra {options['url']}"
+        )
+        started = clock.perf_counter()
+        for thread in barber_threads + client_threads:
+            thread.start()
+        for thread in client_threads:
+            thread.join()
+        self.clients_done.set()
+        for thread in barber_threads:
+            thread.join()
+        elapsed = clock.perf_counter() - started
+
+        results = self.results(elapsed, len(clients) + len(self.barbers))
+        self.report(results)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as output:
+                json.dump(results, output, indent=2, default=str)
+        if results['double_bookings']:
+            raise CommandError(f"{len(results['double_bookings'])} reservas dobles detectadas")
+
+    def pick_service(self, service_id):
+        services = Service.objects.filter(is_active=True).order_by('id')
+        if service_id:
+            services = services.filter(id=service_id)
+        service = services.first()
+        if service is None:
+            raise CommandError('No hay un servicio activo')
+        return service
+
+    def login(self, session, username):
+        status, data = session.request('login', 'POST', '/auth/login/', {
+            'username': username, 'password': self.options['password'],
+        })
+        if status != 200:
+            self.recorder.count('login_failed')
+            return None
+        session.token = data['access']
+        return data['user']['id']
+
+    def client(self, username, seed, delay):
+        rng = random.Random(seed)
+        clock.sleep(delay)
+        session = Session(self.options['url'], self.recorder, self.options['timeout'])
+        try:
+            user_id = self.login(session, username)
+            if user_id is None:
+                return
+            for _ in range(self.options['attempts']):
+                if self.book(session, rng, user_id):
+                    return
+            self.recorder.count('gave_up')
+        finally:
+            session.close()
+
+    def book(self, session, rng, user_id):
+        """
+        Un intento: consultar, (retener) y reservar. True si quedó reservada
+        o si no queda disponibilidad
+        """
+        day = self.day.isoformat()
+        status, data = session.request('availability', 'GET', '/availability/', params={
+            'service': self.service.id, 'start_date': day, 'end_date': day,
+            'barbers': ','.join(str(barber_id) for barber_id, _ in self.barbers),
+        })
+        if status != 200:
+            return False
+        free = sorted(
+            (start, entry['barber']) for entry in data['barbers'] for start in entry['days'].get(day, [])
+        )
+        if not free:
+            self.recorder.count('sold_out')
+            return True
+        start, barber_id = rng.choice(free[:self.options['hot_slots']])
+        booking = {
+            'client': user_id, 'barber': barber_id, 'service': self.service.id,
+            'date': day, 'start_time': start,
+        }
+
+        if rng.random() < self.options['hold_rate']:
+            status, data = session.request('hold', 'POST', '/appointments/hold/', {
+                'barber': barber_id, 'service': self.service.id, 'date': day, 'start_time': start,
+            })
+            if status != 201:
+                self.recorder.count('hold_conflict' if status == 400 and conflict(data) else 'hold_rejected')
+                return False
+            booking['hold'] = data['id']
+
+        status, data = session.request('book', 'POST', '/appointments/', booking)
+        if status == 201:
+            self.recorder.count('booked')
+            return True
+        self.recorder.count('book_conflict' if status == 400 and conflict(data) else 'book_rejected')
+        return False
+
+    def barber(self, username):
+        session = Session(self.options['url'], self.recorder, self.options['timeout'])
+        try:
+            if self.login(session, username) is None:
+                return
+            while True:
+                finished = self.clients_done.is_set()
+                for appointment_id in self.pending_on_day(session):
+                    status, _ = session.request(
+                        'change_status', 'PATCH', f'/appointments/{appointment_id}/change_status/',
+                        {'status': 'confirmed'}
+                    )
+                    self.recorder.count('confirmed' if status == 200 else 'confirm_failed')
+                # Una última pasada después de que terminan los clientes
+                if finished:
+                    return
+                self.clients_done.wait(self.options['barber_interval'])
+        finally:
+            session.close()
+
+    def pending_on_day(self, session):
+        """
+        IDs de las citas pendientes del barbero en el día simulado. Las
+        próximas citas vienen en orden cronológico: se avanza de página
+        hasta pasar el día
+        """
+        day = self.day.isoformat()
+        params = {'page_size': 100}
+        while True:
+            status, data = session.request('upcoming', 'GET', '/appointments/upcoming/', params=params)
+            if status != 200:
+                return
+            for appointment in data['results']:
+                if appointment['date'] > day:
+                    return
+                if appointment['date'] == day and appointment['status'] == 'pending':
+                    yield appointment['id']
+            if not data.get('next'):
+                return
+            params = dict(parse_qsl(urlsplit(data['next']).query))
+
+    def results(self, elapsed, concurrency):
+        endpoints = self.recorder.summary(elapsed, concurrency)
+        events = dict(self.recorder.events)
+        conflicts = {'hold': events.get('hold_conflict', 0), 'book': events.get('book_conflict', 0)}
+        for name, stats in endpoints.items():
+            stats['conflicts'] = conflicts.get(name, 0)
+            stats['conflict_rate'] = round(stats['conflicts'] / stats['requests'], 4) if stats['requests'] else 0
+            failures = stats['errors'] - stats['conflicts']
+            stats['error_rate'] = round(failures / stats['requests'], 4) if stats['requests'] else 0
+            stats['network_errors'] = dict(Counter(self.recorder.errors[name]))
+        total = sum(stats['requests'] for stats in endpoints.values())
+        return {
+            'date': self.day.isoformat(),
+            'url': self.options['url'],
+            'clients': self.options['clients'],
+            'barbers': len(self.barbers),
+            'seconds': round(elapsed, 3),
+            'throughput_rps': round(total / elapsed, 1) if elapsed else None,
+            'bookings_per_second': round(events.get('booked', 0) / elapsed, 2) if elapsed else None,
+            'events': events,
+            'endpoints': endpoints,
+            'double_bookings': double_bookings([barber_id for barber_id, _ in self.barbers], self.day),
+        }
+
+    def report(self, results):
+        for name, stats in results['endpoints'].items():
+            self.stdout.write(
+                f"{name:<14} {stats['requests']:>6} pet.  {stats['rps'] or 0:>8.1f} req/s  "
+                f"p50 {stats['p50_ms']:>8.2f}  p95 {stats['p95_ms']:>8.2f}  p99 {stats['p99_ms']:>8.2f} ms  "
+                f"errores {stats['error_rate']:.1%}  conflictos {stats['conflict_rate']:.1%}"
+            )
+        events = results['events']
+        self.stdout.write(
+            f"\n{results['throughput_rps']} req/s en {results['seconds']}s; "
+            f"{events.get('booked', 0)} reservas ({results['bookings_per_second']}/s), "
+            f"{events.get('confirmed', 0)} confirmadas, {events.get('gave_up', 0)} clientes sin reservar"
+        )
+        if results['double_bookings']:
+            self.stdout.write(self.style.ERROR(f"Reservas dobles: {results['double_bookings']}"))
+        else:
+            self.stdout.write(self.style.SUCCESS('Sin reservas dobles'))
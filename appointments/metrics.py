@@ -0,0 +1,383 @@
+"""
+Métricas en formato de texto de Prometheus (``GET /api/metrics``).
+
+Cada hilo acumula sus valores en un diccionario propio, así que registrar
+una observación no toma ningún bloqueo; solo se bloquea la primera vez que
+un hilo usa una serie y al leer. Al leer se suman los hilos vivos y los
+valores de los hilos terminados, que se pliegan en un acumulado.
+
+La lectura no detiene a los hilos que escriben: un scrape puede ver una
+observación de histograma a medio registrar (el bucket ya incrementado y
+la suma o la cantidad todavía no). La diferencia es de esa única
+observación y desaparece en el scrape siguiente; las claves nuevas sí se
+agregan con el bloqueo, así que la copia de cada diccionario es segura.
+
+Con varios procesos (workers de gunicorn) cada uno guarda su acumulado en
+``METRICS['MULTIPROCESS_DIR']`` cada ``METRICS['FLUSH_INTERVAL']``
+segundos (``<pid>.json``) y el endpoint suma los archivos de todos. Al
+salir, cada worker suma su acumulado a ``archive.json`` y borra su archivo
+(``Registry.retire``, desde ``worker_exit`` en ``gunicorn.conf.py``): los
+contadores no retroceden y los workers reciclados por ``max_requests`` no
+dejan un archivo cada uno. Los de workers terminados a la fuerza sí quedan;
+``on_starting`` vacía el directorio al arrancar el servicio.
+"""
+import abc
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS_DEFAULTS = {
+    'MULTIPROCESS_DIR': None,
+    'FLUSH_INTERVAL': 5,
+    'TOKEN': None,
+}
+
+
+def metrics_config():
+    return {**METRICS_DEFAULTS, **getattr(settings, 'METRICS', {})}
+
+
+class Registry:
+    """
+    Métricas registradas y sus valores por hilo. Los valores se guardan por
+    (métrica, etiquetas): un número en los contadores y una lista
+    [conteos por bucket..., suma, cantidad] en los histogramas.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = {}
+        self._flusher_pid = None
+        # Un solo escritor de <pid>.json por proceso: el hilo de escritura
+        # periódica y los scrapes comparten el archivo temporal
+        self._flush_lock = threading.Lock()
+        self._archived_pid = None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            self._start_flusher()
+        return shard
+
+    def add_series(self, shard, key, initial):
+        # Agregar claves cambia el tamaño del diccionario: se hace con el
+        # bloqueo para que la lectura pueda copiarlo
+        with self._lock:
+            return shard.setdefault(key, initial)
+
+    def collect(self):
+        """
+        Valores de este proceso sumando todos los hilos
+        """
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    self._merge(self._retired, shard)
+            self._shards = alive
+            values = {}
+            self._merge(values, self._retired)
+            for _, shard in alive:
+                self._merge(values, shard)
+        return values
+
+    def collect_all(self):
+        """
+        Valores de todos los procesos si hay directorio compartido
+        """
+        directory = metrics_config()['MULTIPROCESS_DIR']
+        if not directory:
+            return self.collect()
+        self.flush()
+        merged = {}
+        # Compartido con retire: no se lee un worker a medio archivar
+        with self._directory_lock(directory, exclusive=False):
+            for name in os.listdir(directory):
+                if name.endswith('.json'):
+                    self._merge(merged, self._read(os.path.join(directory, name)))
+        return merged
+
+    def flush(self):
+        """
+        Escribe el acumulado de este proceso en ``<pid>.json``
+        """
+        directory = metrics_config()['MULTIPROCESS_DIR']
+        if not directory:
+            return
+        with self._flush_lock:
+            if self._archived_pid == os.getpid():
+                return
+            os.makedirs(directory, exist_ok=True)
+            self._write(os.path.join(directory, f'{os.getpid()}.json'), self.collect())
+
+    def retire(self):
+        """
+        Suma el acumulado final de este proceso a ``archive.json`` y borra
+        su ``<pid>.json``. Después ``flush`` ya no escribe en este proceso.
+        """
+        directory = metrics_config()['MULTIPROCESS_DIR']
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        with self._flush_lock, self._directory_lock(directory, exclusive=True):
+            if self._archived_pid == os.getpid():
+                return
+            self._archived_pid = os.getpid()
+            archive = os.path.join(directory, 'archive.json')
+            values = self._read(archive)
+            self._merge(values, self.collect())
+            self._write(archive, values)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(directory, f'{os.getpid()}.json'))
+
+    def clear(self):
+        with self._lock:
+            for _, shard in self._shards:
+                shard.clear()
+            self._retired.clear()
+
+    def _start_flusher(self):
+        config = metrics_config()
+        if not config['MULTIPROCESS_DIR'] or self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(config['FLUSH_INTERVAL'])
+                self.flush()
+
+        threading.Thread(target=run, name='metrics-flush', daemon=True).start()
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _directory_lock(directory, exclusive):
+        import fcntl  # Solo en Unix, como gunicorn
+
+        with open(os.path.join(directory, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as source:
+                rows = json.load(source)
+        except (OSError, ValueError):
+            return {}
+        return {(metric, tuple(labels)): value for metric, labels, value in rows}
+
+    @staticmethod
+    def _write(path, values):
+        with open(f'{path}.tmp', 'w') as output:
+            json.dump([[metric, list(labels), value] for (metric, labels), value in values.items()], output)
+        os.replace(f'{path}.tmp', path)
+
+    @staticmethod
+    def _merge(target, source):
+        for key, value in list(source.items()):
+            if isinstance(value, list):
+                current = target.get(key)
+                if current is None:
+                    target[key] = list(value)
+                else:
+                    for index, item in enumerate(value):
+                        current[index] += item
+            else:
+                target[key] = target.get(key, 0) + value
+
+
+registry = Registry()
+
+
+class _Timer:
+    __slots__ = ('child', 'started')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.started)
+
+
+class _Child:
+    """
+    Serie de una métrica con valores de etiquetas fijos
+    """
+    __slots__ = ('metric', 'key')
+
+    def __init__(self, metric, key):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount=1):
+        shard = registry.shard()
+        if self.key not in shard:
+            registry.add_series(shard, self.key, 0)
+        shard[self.key] += amount
+
+    def observe(self, value):
+        shard = registry.shard()
+        entry = shard.get(self.key)
+        if entry is None:
+            entry = registry.add_series(shard, self.key, [0] * (len(self.metric.buckets) + 3))
+        entry[bisect.bisect_left(self.metric.buckets, value)] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+    def time(self):
+        return _Timer(self)
+
+
+class Metric(abc.ABC):
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        registry.register(self)
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, _Child(self, (self.name, values)))
+        return child
+
+    @abc.abstractmethod
+    def expose(self, values):
+        """
+        Líneas de exposición de la métrica a partir de sus valores
+        [(etiquetas, valor)]
+        """
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def expose(self, values):
+        for labels, value in values:
+            yield f'{self.name}_total{self._label_text(labels)} {_number(value)}'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def expose(self, values):
+        for labels, entry in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), entry):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _number(bound)
+                yield f'{self.name}_bucket{self._label_text(labels, [("le", le)])} {cumulative}'
+            yield f'{self.name}_sum{self._label_text(labels)} {_number(entry[-2])}'
+            yield f'{self.name}_count{self._label_text(labels)} {entry[-1]}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    """
+    Texto de exposición de Prometheus (formato 0.0.4)
+    """
+    by_metric = {}
+    for (name, labels), value in registry.collect_all().items():
+        by_metric.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, metric in sorted(registry.metrics.items()):
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        lines.extend(metric.expose(sorted(by_metric.get(name, []))))
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_LATENCY = Histogram(
+    'barbershop_request_duration_seconds',
+    'Duración de las peticiones por vista y acción',
+    ('view', 'action', 'method'),
+)
+REQUEST_QUERIES = Histogram(
+    'barbershop_request_db_queries',
+    'Consultas SQL por petición',
+    ('view', 'action'),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+BOOKING_LATENCY = Histogram(
+    'barbershop_booking_duration_seconds',
+    'Validación y creación de citas (AppointmentSerializer)',
+    ('phase',),
+)
+SLOT_LATENCY = Histogram(
+    'barbershop_slot_computation_seconds',
+    'Cálculo de slots disponibles: un horario (engine=schedule) o el motor en bloque de /api/availability/ (engine=numpy)',
+    ('engine',),
+)
+LOGIN_LATENCY = Histogram(
+    'barbershop_login_duration_seconds',
+    'Inicio de sesión (CustomTokenObtainPairView)',
+    ('outcome',),
+)
+BOOKING_CONFLICTS = Counter(
+    'barbershop_booking_conflicts',
+    'Reservas rechazadas por superposición con otra cita o retención',
+    ('stage',),
+)
+STATUS_TRANSITIONS = Counter(
+    'barbershop_appointment_status_transitions',
+    'Cambios de estado de citas (change_status)',
+    ('from_status', 'to_status'),
+)
@@ -0,0 +1,139 @@
+"""
+Métricas de rendimiento por petición.
+
+``PerformanceMiddleware`` mide cada petición: consultas SQL (cantidad y
+tiempo), autenticación, serialización, vista y render. Los tiempos se
+envían en la cabecera ``Server-Timing``, que las herramientas de desarrollo
+del navegador muestran en la pestaña de red. Las peticiones que superan
+``PERFORMANCE_MIDDLEWARE['SLOW_REQUEST_MS']`` se registran en el logger
+``appointments.performance`` como una línea JSON con las sentencias SQL más
+repetidas, que delatan consultas N+1.
+
+La vista se mide desde ``process_view`` hasta que devuelve la respuesta, y
+el render hasta que la respuesta de DRF termina de renderizarse. La
+serialización (``serialize``) y la autenticación (``auth``) están
+incluidas en el tiempo de la vista.
+
+La duración y la cantidad de consultas de cada petición también se
+acumulan en los histogramas de ``appointments.metrics`` por vista y acción
+del viewset.
+"""
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import timing
+from .metrics import REQUEST_LATENCY, REQUEST_QUERIES
+
+logger = logging.getLogger('appointments.performance')
+
+PERFORMANCE_DEFAULTS = {
+    'SLOW_REQUEST_MS': 500,
+    'TOP_QUERIES': 5,
+    'HEADER': True,
+}
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = {**PERFORMANCE_DEFAULTS, **getattr(settings, 'PERFORMANCE_MIDDLEWARE', {})}
+        self.slow_request_ms = config['SLOW_REQUEST_MS']
+        self.top_queries = config['TOP_QUERIES']
+        self.header = config['HEADER']
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings, token = timing.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            timing.finish(token)
+        return self.report(request, response, timings)
+
+    async def __acall__(self, request):
+        timings, token = timing.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timing.finish(token)
+        return self.report(request, response, timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = timing.current()
+        if timings is not None:
+            timings.mark('view')
+            timings.view = self.view_labels(request, view_func)
+
+    @staticmethod
+    def view_labels(request, view_func):
+        """
+        Nombre de la vista (clase del viewset o APIView) y acción: la del
+        router en los viewsets o el método HTTP en el resto
+        """
+        cls = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        method = request.method.lower()
+        actions = getattr(view_func, 'actions', None) or {}
+        return (cls or view_func).__name__, actions.get(method, method)
+
+    def process_template_response(self, request, response):
+        # Las respuestas de DRF se renderizan después de este punto
+        timings = timing.current()
+        if timings is not None:
+            timings.mark('view_done')
+            response.add_post_render_callback(lambda rendered: timings.mark('render_done'))
+        return response
+
+    def metrics(self, timings):
+        """
+        Duraciones en milisegundos, en el orden de ``Server-Timing``
+        """
+        finished = time.perf_counter()
+        marks = timings.marks
+        view_started = marks.get('view')
+        view_done = marks.get('view_done', finished)
+        metrics = {
+            'sql': timings.sql_time,
+            'auth': timings.durations.get('auth', 0.0),
+            'serialize': timings.durations.get('serialize', 0.0),
+        }
+        if view_started is not None:
+            metrics['view'] = view_done - view_started
+            if 'render_done' in marks:
+                metrics['render'] = marks['render_done'] - view_done
+        metrics['total'] = finished - timings.started
+        return {name: round(seconds * 1000, 2) for name, seconds in metrics.items()}
+
+    def report(self, request, response, timings):
+        metrics = self.metrics(timings)
+        view, action = timings.view or ('unmatched', '')
+        REQUEST_LATENCY.labels(view, action, request.method).observe(metrics['total'] / 1000)
+        REQUEST_QUERIES.labels(view, action).observe(timings.queries)
+        if self.header:
+            response['Server-Timing'] = ', '.join(
+                f'{name};dur={value}' + (f';desc="{timings.queries} queries"' if name == 'sql' else '')
+                for name, value in metrics.items()
+            )
+        if metrics['total'] >= self.slow_request_ms:
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': timings.queries,
+                **{f'{name}_ms': value for name, value in metrics.items()},
+                'repeated_queries': [
+                    {'sql': sql, 'count': count} for sql, count in timings.repeated(self.top_queries)
+                ],
+            }, ensure_ascii=False))
+        return response
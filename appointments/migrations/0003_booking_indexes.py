@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_schedule_break_end_time_schedule_break_start_time_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['barber', 'date', 'start_time'], name='appt_barber_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['client', 'date', 'start_time'], name='appt_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['date', 'start_time'], name='appt_date_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleexception',
+            index=models.Index(fields=['barber', 'date', 'is_active'], name='exception_barber_date_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_booking_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarberDayLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='fecha')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('barber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_locks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'bloqueo de agenda',
+                'verbose_name_plural': 'bloqueos de agenda',
+                'constraints': [models.UniqueConstraint(fields=('barber', 'date'), name='unique_barber_day_lock')],
+            },
+        ),
+    ]
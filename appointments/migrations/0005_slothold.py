@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:17
+
+import appointments.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_barberdaylock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='fecha')),
+                ('start_time', models.TimeField(verbose_name='hora de inicio')),
+                ('end_time', models.TimeField(verbose_name='hora de fin')),
+                ('expires_at', models.DateTimeField(verbose_name='vence')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('barber', models.ForeignKey(limit_choices_to={'role': 'barber'}, on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to=settings.AUTH_USER_MODEL)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='client_slot_holds', to=settings.AUTH_USER_MODEL)),
+                ('service', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='slot_holds', to='appointments.service')),
+            ],
+            options={
+                'verbose_name': 'retención de horario',
+                'verbose_name_plural': 'retenciones de horario',
+                'indexes': [models.Index(fields=['barber', 'date', 'expires_at'], name='hold_barber_date_idx'), models.Index(fields=['expires_at'], name='hold_expires_idx')],
+            },
+            bases=(appointments.models.LoadedValuesMixin, models.Model),
+        ),
+    ]
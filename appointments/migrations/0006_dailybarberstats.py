@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_slothold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBarberStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='fecha')),
+                ('bookings', models.PositiveIntegerField(default=0, verbose_name='citas')),
+                ('pending', models.PositiveIntegerField(default=0, verbose_name='pendientes')),
+                ('confirmed', models.PositiveIntegerField(default=0, verbose_name='confirmadas')),
+                ('completions', models.PositiveIntegerField(default=0, verbose_name='completadas')),
+                ('cancellations', models.PositiveIntegerField(default=0, verbose_name='canceladas')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='ingresos')),
+                ('expected_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='ingresos por cobrar')),
+                ('booked_minutes', models.PositiveIntegerField(default=0, verbose_name='minutos reservados')),
+                ('barber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'resumen diario',
+                'verbose_name_plural': 'resúmenes diarios',
+                'indexes': [models.Index(fields=['date'], name='daily_stats_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('barber', 'date'), name='unique_barber_daily_stats')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_dailybarberstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='recurso')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='actualizado')),
+            ],
+            options={
+                'verbose_name': 'versión de recurso',
+                'verbose_name_plural': 'versiones de recursos',
+            },
+        ),
+    ]
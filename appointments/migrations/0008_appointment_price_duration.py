@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-17 09:12
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_service_values(apps, schema_editor):
+    """
+    Las citas existentes toman el precio y la duración actuales de su servicio
+    """
+    Appointment = apps.get_model('appointments', 'Appointment')
+    Service = apps.get_model('appointments', 'Service')
+    service = Service.objects.filter(pk=OuterRef('service_id'))
+    Appointment.objects.update(
+        price=Subquery(service.values('price')[:1]),
+        duration=Subquery(service.values('duration')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0007_resourceversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='price',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True, verbose_name='precio'),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='duration',
+            field=models.DurationField(null=True, verbose_name='duración'),
+        ),
+        migrations.RunPython(copy_service_values, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='appointment',
+            name='price',
+            field=models.DecimalField(decimal_places=2, max_digits=10, verbose_name='precio'),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='duration',
+            field=models.DurationField(verbose_name='duración'),
+        ),
+    ]
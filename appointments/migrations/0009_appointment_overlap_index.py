@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0008_appointment_price_duration'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_barber_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['barber', 'date', 'start_time', 'end_time', 'status'], name='appt_barber_date_idx'),
+        ),
+    ]
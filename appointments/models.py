@@ -1,10 +1,40 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from collections import namedtuple
 from datetime import timedelta
+from decimal import Decimal
+from .metrics import SLOT_LATENCY
 
-class User(AbstractUser):
+# Datos de un barbero en un día para calcular slots: si una excepción lo
+# bloquea, los rangos ocupados (citas activas y retenciones vigentes) y el
+# vencimiento de la primera retención, a partir del cual el cálculo cambia
+DayData = namedtuple('DayData', ['closed', 'busy', 'expires_at'])
+
+class LoadedValuesMixin:
+    """
+    Conserva los valores leídos de la base de datos para que las señales
+    puedan comparar el estado anterior con el nuevo al guardar
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+class User(LoadedValuesMixin, AbstractUser):
     """
     Modelo personalizado de Usuario que extiende del modelo base de Django
     """
@@ -54,7 +84,7 @@ class Service(models.Model):
     def __str__(self):
         return f"{self.name} - ${self.price}"
 
-class Schedule(models.Model):
+class Schedule(LoadedValuesMixin, models.Model):
     """
     Modelo para los horarios de los barberos
     """
@@ -104,50 +134,80 @@ class Schedule(models.Model):
     def __str__(self):
         return f"{self.barber.get_full_name()} - {self.get_day_of_week_display()}"
 
-    def get_available_slots(self, date, duration=timedelta(minutes=30)):
+    def get_available_slots(self, date, duration=timedelta(minutes=30), day_data=None):
         """
         Obtiene los slots disponibles para un día específico
-        teniendo en cuenta las citas existentes y excepciones
+        teniendo en cuenta las citas existentes y excepciones.
+
+        Las excepciones y las citas activas del día se cargan una sola vez;
+        la grilla de slots se recorre en memoria. ``day_data`` permite pasar
+        esos datos ya cargados como un ``DayData``.
         """
         from datetime import datetime, timedelta
-        slots = []
-        current_time = datetime.combine(date, self.start_time)
-        end_datetime = datetime.combine(date, self.end_time)
 
-        while current_time + duration <= end_datetime:
-            # Verificar si el horario está en el periodo de descanso
+        with SLOT_LATENCY.labels(engine='schedule').time():
+            if day_data is None:
+                day_data = self.load_day_data(date)
+            closed, busy = day_data.closed, day_data.busy
+
+            # Una excepción activa bloquea el día completo
+            if closed:
+                return []
+
+            slots = []
+            current_time = datetime.combine(date, self.start_time)
+            end_datetime = datetime.combine(date, self.end_time)
+
             if self.break_start_time and self.break_end_time:
                 break_start = datetime.combine(date, self.break_start_time)
                 break_end = datetime.combine(date, self.break_end_time)
-                if current_time >= break_start and current_time < break_end:
+            else:
+                break_start = break_end = None
+
+            while current_time + duration <= end_datetime:
+                # Verificar si el horario está en el periodo de descanso
+                if break_start and current_time >= break_start and current_time < break_end:
                     current_time = break_end
                     continue
 
-            # Verificar si hay una excepción para esta fecha
-            if ScheduleException.objects.filter(
-                barber=self.barber,
-                date=date,
-                is_active=True
-            ).exists():
-                break
+                # Verificar si hay citas que se superponen
+                slot_start = current_time.time()
+                slot_end = (current_time + duration).time()
+                if not any(start < slot_end and end > slot_start for start, end in busy):
+                    slots.append(slot_start)
 
-            # Verificar si hay citas que se superponen
-            appointment_exists = Appointment.objects.filter(
-                barber=self.barber,
-                date=date,
-                status__in=['pending', 'confirmed'],
-                start_time__lt=(current_time + duration).time(),
-                end_time__gt=current_time.time()
-            ).exists()
+                current_time += timedelta(minutes=self.interval_minutes)
 
-            if not appointment_exists:
-                slots.append(current_time.time())
+            return slots
 
-            current_time += timedelta(minutes=self.interval_minutes)
+    def load_day_data(self, date):
+        """
+        Carga si el día está bloqueado por una excepción y los rangos
+        ocupados por citas activas y retenciones vigentes
+        """
+        if ScheduleException.objects.filter(
+            barber_id=self.barber_id,
+            date=date,
+            is_active=True
+        ).exists():
+            return DayData(True, [], None)
+
+        busy = list(Appointment.objects.filter(
+            barber_id=self.barber_id,
+            date=date,
+            status__in=['pending', 'confirmed']
+        ).values_list('start_time', 'end_time'))
 
-        return slots
+        expires_at = None
+        for start, end, hold_expires_at in SlotHold.active().filter(
+            barber_id=self.barber_id,
+            date=date
+        ).values_list('start_time', 'end_time', 'expires_at'):
+            busy.append((start, end))
+            expires_at = min(expires_at or hold_expires_at, hold_expires_at)
+        return DayData(False, busy, expires_at)
 
-class ScheduleException(models.Model):
+class ScheduleException(LoadedValuesMixin, models.Model):
     """
     Modelo para manejar excepciones en los horarios (días festivos, vacaciones, etc.)
     """
@@ -182,6 +242,10 @@ class ScheduleException(models.Model):
         verbose_name = _('excepción de horario')
         verbose_name_plural = _('excepciones de horario')
         ordering = ['-date', '-created_at']
+        indexes = [
+            # Verificación de día bloqueado al calcular slots y al reservar
+            models.Index(fields=['barber', 'date', 'is_active'], name='exception_barber_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.barber.get_full_name()} - {self.get_exception_type_display()} - {self.date}"
@@ -191,7 +255,7 @@ class ScheduleException(models.Model):
         if self.start_time and self.end_time and self.start_time >= self.end_time:
             raise ValidationError(_('La hora de inicio debe ser anterior a la hora de fin'))
 
-class Appointment(models.Model):
+class Appointment(LoadedValuesMixin, models.Model):
     """
     Modelo para las citas
     """
@@ -229,6 +293,10 @@ class Appointment(models.Model):
         default='pending'
     )
     notes = models.TextField(_('notas'), blank=True)
+    # Precio y duración del servicio al reservar: el resumen diario y los
+    # reportes usan estos valores aunque el servicio cambie después
+    price = models.DecimalField(_('precio'), max_digits=10, decimal_places=2)
+    duration = models.DurationField(_('duración'))
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -236,6 +304,360 @@ class Appointment(models.Model):
         verbose_name = _('cita')
         verbose_name_plural = _('citas')
         ordering = ['-date', '-start_time']
+        indexes = [
+            # Superposición y slots (barbero, fecha, rango de horas),
+            # citas del día/próximas e historial del barbero. end_time y
+            # status al final cubren el filtro de superposición sin leer la fila
+            models.Index(
+                fields=['barber', 'date', 'start_time', 'end_time', 'status'], name='appt_barber_date_idx'
+            ),
+            # Historial del cliente
+            models.Index(fields=['client', 'date', 'start_time'], name='appt_client_date_idx'),
+            # Citas del día/próximas e historial para administradores
+            models.Index(fields=['date', 'start_time'], name='appt_date_start_idx'),
+        ]
 
     def __str__(self):
         return f"Cita: {self.client.get_full_name()} con {self.barber.get_full_name()} - {self.date}"
+
+    @classmethod
+    def lock(cls, pk, queryset=None):
+        """
+        Relee la cita bloqueando su fila hasta el final de la transacción
+        actual, para que dos cambios simultáneos no resten del resumen
+        diario el mismo estado anterior
+        """
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            raise RuntimeError('Appointment.lock debe llamarse dentro de transaction.atomic()')
+        # En SQLite select_for_update() no tiene efecto: un UPDATE sin
+        # cambios toma antes el bloqueo de escritura (ver BarberDayLock.acquire)
+        if not connection.features.has_select_for_update:
+            cls.objects.filter(pk=pk).update(status=F('status'))
+        # Solo la cita: no las filas del cliente, el barbero y el servicio
+        # que el queryset traiga con select_related
+        of = ('self',) if connection.features.has_select_for_update_of else ()
+        queryset = cls.objects.all() if queryset is None else queryset
+        return queryset.select_for_update(of=of).get(pk=pk)
+
+    def save(self, *args, **kwargs):
+        """
+        Copia el precio y la duración del servicio al crear la cita o al
+        cambiarle el servicio. ``bulk_create`` no pasa por aquí: quien lo use
+        debe asignarlos.
+        """
+        loaded = getattr(self, '_loaded_values', None) or {}
+        if self.price is None or self.duration is None or loaded.get('service_id', self.service_id) != self.service_id:
+            self.price, self.duration = self.service.price, self.service.duration
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'price', 'duration'}
+        super().save(*args, **kwargs)
+
+class SlotHold(LoadedValuesMixin, models.Model):
+    """
+    Retención temporal de un horario mientras el cliente confirma la cita.
+
+    Una retención vigente cuenta como ocupada para los demás clientes. Las
+    vencidas se descartan al filtrar por ``expires_at`` (indexado), por lo
+    que no hace falta borrarlas para liberar el horario.
+    """
+    barber = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        limit_choices_to={'role': 'barber'},
+        related_name='slot_holds'
+    )
+    client = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='client_slot_holds'
+    )
+    service = models.ForeignKey(
+        Service,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='slot_holds'
+    )
+    date = models.DateField(_('fecha'))
+    start_time = models.TimeField(_('hora de inicio'))
+    end_time = models.TimeField(_('hora de fin'))
+    expires_at = models.DateTimeField(_('vence'))
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('retención de horario')
+        verbose_name_plural = _('retenciones de horario')
+        indexes = [
+            # Retenciones vigentes de un barbero en un día
+            models.Index(fields=['barber', 'date', 'expires_at'], name='hold_barber_date_idx'),
+            # Limpieza periódica de retenciones vencidas
+            models.Index(fields=['expires_at'], name='hold_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"Retención: {self.barber_id} - {self.date} {self.start_time}"
+
+    @classmethod
+    def active(cls):
+        """
+        Retenciones que todavía no han vencido
+        """
+        return cls.objects.filter(expires_at__gt=timezone.now())
+
+class BarberDayLock(models.Model):
+    """
+    Fila guardia por barbero y día para serializar las reservas concurrentes.
+
+    Reservar toma el bloqueo exclusivo de la fila (UPDATE) dentro de la
+    transacción que valida e inserta la cita, de modo que dos reservas del
+    mismo barbero y día se ejecutan una detrás de otra mientras que las de
+    barberos distintos siguen en paralelo.
+    """
+    barber = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='day_locks'
+    )
+    date = models.DateField(_('fecha'))
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = _('bloqueo de agenda')
+        verbose_name_plural = _('bloqueos de agenda')
+        constraints = [
+            models.UniqueConstraint(fields=['barber', 'date'], name='unique_barber_day_lock'),
+        ]
+
+    def __str__(self):
+        return f"{self.barber_id} - {self.date}"
+
+    @classmethod
+    def prepare(cls, barber_id, dates):
+        """
+        Crea las filas guardia que falten. Debe llamarse fuera de la
+        transacción de la reserva para no retener bloqueos de la inserción.
+        """
+        cls.objects.bulk_create(
+            [cls(barber_id=barber_id, date=date) for date in set(dates)],
+            ignore_conflicts=True
+        )
+
+    @classmethod
+    def acquire(cls, barber_id, dates):
+        """
+        Bloquea las filas del barbero para las fechas indicadas hasta el
+        final de la transacción actual
+        """
+        dates = set(dates)
+        if not transaction.get_connection().in_atomic_block:
+            raise RuntimeError('BarberDayLock.acquire debe llamarse dentro de transaction.atomic()')
+        # El UPDATE toma el bloqueo de escritura también en SQLite, donde
+        # select_for_update() no tiene efecto
+        locked = cls.objects.filter(barber_id=barber_id, date__in=dates).update(version=F('version') + 1)
+        if locked < len(dates):
+            cls.prepare(barber_id, dates)
+            cls.objects.filter(barber_id=barber_id, date__in=dates).update(version=F('version') + 1)
+
+class DailyBarberStats(models.Model):
+    """
+    Resumen diario por barbero, mantenido de forma incremental al crear,
+    modificar o eliminar citas (ver ``appointments.signals``). Los reportes
+    por barbero o por día leen esta tabla en lugar de agregar las citas.
+    ``rebuild`` la recalcula desde cero para un rango.
+    """
+    barber = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='daily_stats'
+    )
+    date = models.DateField(_('fecha'))
+    bookings = models.PositiveIntegerField(_('citas'), default=0)
+    pending = models.PositiveIntegerField(_('pendientes'), default=0)
+    confirmed = models.PositiveIntegerField(_('confirmadas'), default=0)
+    completions = models.PositiveIntegerField(_('completadas'), default=0)
+    cancellations = models.PositiveIntegerField(_('canceladas'), default=0)
+    revenue = models.DecimalField(_('ingresos'), max_digits=12, decimal_places=2, default=0)
+    expected_revenue = models.DecimalField(
+        _('ingresos por cobrar'), max_digits=12, decimal_places=2, default=0
+    )
+    booked_minutes = models.PositiveIntegerField(_('minutos reservados'), default=0)
+
+    COUNTERS = (
+        'bookings', 'pending', 'confirmed', 'completions', 'cancellations',
+        'revenue', 'expected_revenue', 'booked_minutes'
+    )
+
+    class Meta:
+        verbose_name = _('resumen diario')
+        verbose_name_plural = _('resúmenes diarios')
+        constraints = [
+            models.UniqueConstraint(fields=['barber', 'date'], name='unique_barber_daily_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='daily_stats_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.barber_id} - {self.date}"
+
+    @staticmethod
+    def contribution(status, price, duration, sign=1):
+        """
+        Aporte de una cita a los contadores de su día (``sign=-1`` para
+        restarla)
+        """
+        booked = status != 'cancelled'
+        price = Decimal(price)
+        return {
+            'bookings': sign,
+            'pending': sign * (status == 'pending'),
+            'confirmed': sign * (status == 'confirmed'),
+            'completions': sign * (status == 'completed'),
+            'cancellations': sign * (status == 'cancelled'),
+            'revenue': sign * price if status == 'completed' else 0,
+            'expected_revenue': sign * price if status in ('pending', 'confirmed') else 0,
+            'booked_minutes': sign * int(duration.total_seconds() // 60) if booked else 0,
+        }
+
+    @classmethod
+    def apply(cls, deltas, create=True):
+        """
+        Suma los cambios ``{(barber_id, fecha): {contador: delta}}`` con
+        UPDATE ... SET campo = campo + delta, creando antes las filas que
+        falten (salvo con ``create=False``). Los días con los mismos cambios
+        (p. ej. una reserva masiva) se actualizan en una sola consulta.
+        """
+        changes = {}
+        for key, delta in deltas.items():
+            delta = tuple(sorted((field, value) for field, value in delta.items() if value))
+            if delta:
+                changes.setdefault(delta, []).append(key)
+        if not changes:
+            return
+
+        for delta, keys in changes.items():
+            condition = models.Q()
+            for barber_id, date in keys:
+                condition |= models.Q(barber_id=barber_id, date=date)
+            rows = cls.objects.filter(condition)
+            updates = {field: F(field) + value for field, value in delta}
+            if not create:
+                rows.update(**updates)
+                continue
+            # Caso común (una cita): la fila del día ya existe y basta el UPDATE
+            if len(keys) == 1 and rows.update(**updates):
+                continue
+            cls.objects.bulk_create(
+                [cls(barber_id=barber_id, date=date) for barber_id, date in keys],
+                ignore_conflicts=True
+            )
+            rows.update(**updates)
+
+    @classmethod
+    def aggregate_appointments(cls, queryset):
+        """
+        Contadores por barbero y día calculados directamente sobre las citas
+        """
+        completed = models.Q(status='completed')
+        active = models.Q(status__in=['pending', 'confirmed'])
+        rows = queryset.values('barber_id', 'date').annotate(
+            bookings=models.Count('id'),
+            pending=models.Count('id', filter=models.Q(status='pending')),
+            confirmed=models.Count('id', filter=models.Q(status='confirmed')),
+            completions=models.Count('id', filter=completed),
+            cancellations=models.Count('id', filter=models.Q(status='cancelled')),
+            revenue=models.Sum('price', filter=completed, default=0),
+            expected_revenue=models.Sum('price', filter=active, default=0),
+            duration=models.Sum('duration', filter=~models.Q(status='cancelled')),
+        ).order_by()
+        return [
+            cls(
+                barber_id=row['barber_id'], date=row['date'],
+                booked_minutes=int(row.pop('duration').total_seconds() // 60) if row['duration'] else 0,
+                **{field: row[field] for field in cls.COUNTERS if field != 'booked_minutes'}
+            )
+            for row in rows
+        ]
+
+    @classmethod
+    def rebuild(cls, start_date, end_date, barber_ids=None, dry_run=False):
+        """
+        Recalcula el resumen del rango desde las citas. Devuelve el número
+        de días cuyo resumen guardado no coincidía; con ``dry_run`` solo
+        los cuenta.
+        """
+        appointments = Appointment.objects.filter(date__range=[start_date, end_date])
+        stored = cls.objects.filter(date__range=[start_date, end_date])
+        if barber_ids:
+            appointments = appointments.filter(barber_id__in=barber_ids)
+            stored = stored.filter(barber_id__in=barber_ids)
+
+        def counters(row):
+            return tuple(getattr(row, field) for field in cls.COUNTERS) if row else (0,) * len(cls.COUNTERS)
+
+        with transaction.atomic():
+            current = {(row.barber_id, row.date): row for row in stored.select_for_update()}
+            fresh = {(row.barber_id, row.date): row for row in cls.aggregate_appointments(appointments)}
+            mismatched = sum(
+                1 for key in fresh.keys() | current.keys()
+                if counters(fresh.get(key)) != counters(current.get(key))
+            )
+            if not dry_run:
+                stored.delete()
+                cls.objects.bulk_create(fresh.values())
+        return mismatched
+
+class ResourceVersion(models.Model):
+    """
+    Contador de versión por recurso del catálogo (servicios, barberos,
+    horarios). Cada escritura lo incrementa y los listados lo usan como
+    ETag / Last-Modified para responder 304 sin consultar ni serializar.
+    """
+    name = models.CharField(_('recurso'), max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(_('actualizado'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('versión de recurso')
+        verbose_name_plural = _('versiones de recursos')
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+    @classmethod
+    def bump(cls, *names):
+        """
+        Incrementa la versión de los recursos, creando las filas que falten
+        """
+        now = timezone.now()
+        rows = cls.objects.filter(name__in=names)
+        if rows.update(version=F('version') + 1, updated_at=now) < len(names):
+            cls.objects.bulk_create([cls(name=name) for name in names], ignore_conflicts=True)
+            rows.filter(version=0).update(version=F('version') + 1, updated_at=now)
+
+    @classmethod
+    def current(cls, names):
+        """
+        Versión y fecha de actualización de cada recurso (0 y None si nunca
+        se modificó)
+        """
+        return cls._versions(names, cls.objects.filter(
+            name__in=names
+        ).values_list('name', 'version', 'updated_at'))
+
+    @classmethod
+    async def acurrent(cls, names):
+        """
+        ``current`` con el ORM asíncrono
+        """
+        return cls._versions(names, [
+            row async for row in cls.objects.filter(
+                name__in=names
+            ).values_list('name', 'version', 'updated_at')
+        ])
+
+    @staticmethod
+    def _versions(names, rows):
+        found = {name: (version, updated_at) for name, version, updated_at in rows}
+        return {name: found.get(name, (0, None)) for name in names}
@@ -0,0 +1,212 @@
+"""
+Paginación por cursor (keyset) para los listados de citas y excepciones.
+
+En lugar de ``OFFSET`` y ``COUNT(*)`` cada página filtra a partir de la
+última fila entregada, p. ej. ``(date, start_time, id) > (d, t, i)``, así
+que el costo de la página 5.000 es el mismo que el de la primera y usa los
+índices compuestos por fecha y hora. El cursor es opaco para el cliente.
+
+Ambas paginaciones tienen una variante ``apaginate_queryset`` para las
+vistas asíncronas (``appointments.async_views``).
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def keyset_filter(ordering, position):
+    """
+    Filtro de llave compuesta: filas posteriores a ``position`` en el
+    orden dado
+    """
+    lookup = 'lt' if ordering[0].startswith('-') else 'gt'
+    fields = [field.lstrip('-') for field in ordering]
+    condition = Q()
+    for index, field in enumerate(fields):
+        step = Q(**{f'{field}__{lookup}': position[index]})
+        for previous, value in zip(fields[:index], position[:index]):
+            step &= Q(**{previous: value})
+        condition |= step
+    return condition
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por llave compuesta. La vista puede definir
+    ``get_keyset_ordering()`` para elegir el orden según la acción; todos
+    los campos deben ir en la misma dirección y el último debe ser único.
+    """
+    ordering = ('-date', '-start_time', '-id')
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 10)
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._page(list(self._window(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        ``paginate_queryset`` con el ORM asíncrono
+        """
+        return self._page([row async for row in self._window(queryset, request, view)])
+
+    def _window(self, queryset, request, view):
+        """
+        Consulta de la página: una fila más que el tamaño para saber si
+        hay otra página
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(view)
+        position, reverse = self.decode_cursor(request, queryset.model, ordering)
+        if reverse:
+            ordering = [self._invert(field) for field in ordering]
+
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(ordering, position))
+        self.fields = [field.lstrip('-') for field in ordering]
+        self.position, self.reverse = position, reverse
+        return queryset.order_by(*ordering)[:self.page_size + 1]
+
+    def _page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not self.reverse else self.position is not None
+        self.has_previous = has_more if self.reverse else self.position is not None
+        self.first = rows[0] if rows else None
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_ordering(self, view):
+        if view is not None and hasattr(view, 'get_keyset_ordering'):
+            return list(view.get_keyset_ordering())
+        return list(self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self._link(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first is None:
+            return None
+        return self._link(self.first, reverse=True)
+
+    def encode_cursor(self, row, reverse):
+        payload = {
+            'p': [self._serialize(getattr(row, field)) for field in self.fields],
+            'r': int(reverse),
+        }
+        return base64.urlsafe_b64encode(
+            json.dumps(payload, separators=(',', ':')).encode()
+        ).decode().rstrip('=')
+
+    def decode_cursor(self, request, model, ordering):
+        """
+        Devuelve la posición (valores de la última fila vista) y si se
+        está paginando hacia atrás
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            fields = [model._meta.get_field(field.lstrip('-')) for field in ordering]
+            values = payload['p']
+            if len(values) != len(fields):
+                raise ValueError
+            position = [field.to_python(value) for field, value in zip(fields, values)]
+            return position, bool(payload.get('r'))
+        except (ValueError, TypeError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _link(self, row, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(row, reverse))
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _serialize(value):
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+class _Counted:
+    """
+    Lista de tamaño conocido sin elementos, para calcular con el
+    ``Paginator`` de Django los números de página de un conteo asíncrono
+    """
+
+    def __init__(self, count):
+        self._count = count
+
+    def count(self):
+        return self._count
+
+    def __getitem__(self, index):
+        return []
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """
+    ``PageNumberPagination`` con el conteo y la página leídos con el ORM
+    asíncrono; los enlaces y la respuesta son los mismos
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(_Counted(await queryset.acount()), page_size)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        bottom = (self.page.number - 1) * page_size
+        self.page.object_list = [row async for row in queryset[bottom:bottom + page_size]]
+        self.request = request
+        return list(self.page)
@@ -0,0 +1,189 @@
+"""
+Reportes de ingresos, estados y ocupación de los barberos.
+
+Los reportes por barbero o por día suman el resumen diario
+``DailyBarberStats``; los reportes por servicio, que ese resumen no
+distingue, agregan las citas. En ambos casos los totales se calculan en la
+base de datos y en Python solo se recorren las filas ya agrupadas. La
+ocupación cruza los minutos reservados por barbero y día con los minutos
+de horario laboral, calculados como una matriz barbero x día con NumPy.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Concat, Trim
+
+from .availability import date_range
+from .models import Appointment, Schedule, ScheduleException, DailyBarberStats
+
+REPORT_GROUPS = {
+    'barber': ('barber', Trim(Concat('barber__first_name', Value(' '), 'barber__last_name'))),
+    'service': ('service', F('service__name')),
+    'day': ('date', None),
+}
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _grouped(queryset, group_by, **aggregates):
+    key, label = REPORT_GROUPS[group_by]
+    if label is not None:
+        queryset = queryset.annotate(label=label)
+        rows = queryset.values(key, 'label')
+    else:
+        rows = queryset.values(key)
+    return list(rows.annotate(**aggregates).order_by(key))
+
+
+def _source(start_date, end_date, group_by, barber_id=None):
+    """
+    Filas a agregar: el resumen diario, o las citas si se agrupa por servicio
+    """
+    model = Appointment if group_by == 'service' else DailyBarberStats
+    queryset = model.objects.filter(date__range=[start_date, end_date])
+    if model is DailyBarberStats:
+        queryset = queryset.filter(bookings__gt=0)
+    if barber_id:
+        queryset = queryset.filter(barber_id=barber_id)
+    return queryset
+
+
+def revenue_report(start_date, end_date, group_by, barber_id=None):
+    """
+    Ingresos por barbero, servicio o día: lo cobrado (citas completadas) y
+    lo pendiente por cobrar (citas pendientes o confirmadas)
+    """
+    queryset = _source(start_date, end_date, group_by, barber_id)
+    if group_by == 'service':
+        aggregates = {
+            'revenue': Sum('price', filter=Q(status='completed'), default=Decimal('0')),
+            'expected_revenue': Sum(
+                'price', filter=Q(status__in=['pending', 'confirmed']), default=Decimal('0')
+            ),
+            'completed': Count('id', filter=Q(status='completed')),
+        }
+    else:
+        aggregates = {
+            'revenue': Sum('revenue'),
+            'expected_revenue': Sum('expected_revenue'),
+            'completed': Sum('completions'),
+        }
+    rows = _grouped(queryset, group_by, **aggregates)
+    total = sum((row['revenue'] for row in rows), Decimal('0'))
+    for row in rows:
+        row['share'] = round(float(row['revenue'] / total), 4) if total else None
+    return {
+        'total_revenue': total,
+        'total_expected_revenue': sum((row['expected_revenue'] for row in rows), Decimal('0')),
+        'results': rows,
+    }
+
+
+def status_report(start_date, end_date, group_by, barber_id=None):
+    """
+    Citas por estado y tasas de finalización y cancelación
+    """
+    queryset = _source(start_date, end_date, group_by, barber_id)
+    if group_by == 'service':
+        aggregates = {
+            'total': Count('id'),
+            **{
+                status: Count('id', filter=Q(status=status))
+                for status, _ in Appointment.STATUS_CHOICES
+            },
+        }
+    else:
+        aggregates = {
+            'total': Sum('bookings'),
+            'pending': Sum('pending'),
+            'confirmed': Sum('confirmed'),
+            'completed': Sum('completions'),
+            'cancelled': Sum('cancellations'),
+        }
+    rows = _grouped(queryset, group_by, **aggregates)
+    for row in rows:
+        closed = row['completed'] + row['cancelled']
+        row['completion_rate'] = round(row['completed'] / closed, 4) if closed else None
+        row['cancellation_rate'] = round(row['cancelled'] / row['total'], 4) if row['total'] else None
+    return {'results': rows}
+
+
+def scheduled_minutes(barber_ids, dates):
+    """
+    Minutos de horario laboral por barbero y día (matriz barbero x día):
+    horario activo del día de la semana menos el descanso, y cero en los
+    días bloqueados por una excepción
+    """
+    rows = {barber_id: index for index, barber_id in enumerate(barber_ids)}
+    weekly = np.zeros((len(barber_ids), 7), dtype=np.int64)
+    for schedule in Schedule.objects.filter(barber_id__in=barber_ids, is_active=True).values(
+        'barber_id', 'day_of_week', 'start_time', 'end_time', 'break_start_time', 'break_end_time'
+    ):
+        minutes = _minutes(schedule['end_time']) - _minutes(schedule['start_time'])
+        if schedule['break_start_time'] and schedule['break_end_time']:
+            minutes -= _minutes(schedule['break_end_time']) - _minutes(schedule['break_start_time'])
+        weekly[rows[schedule['barber_id']], schedule['day_of_week']] = max(minutes, 0)
+
+    columns = {day: index for index, day in enumerate(dates)}
+    matrix = weekly[:, [day.weekday() for day in dates]]
+    closed = [
+        (rows[barber_id], columns[day])
+        for barber_id, day in ScheduleException.objects.filter(
+            barber_id__in=barber_ids, date__range=[dates[0], dates[-1]], is_active=True
+        ).values_list('barber_id', 'date').distinct()
+    ]
+    if closed:
+        matrix[tuple(np.array(closed).T)] = 0
+    return matrix
+
+
+def booked_minutes(barber_ids, dates):
+    """
+    Minutos reservados por barbero y día (citas no canceladas) tomados del
+    resumen diario y ubicados en una matriz barbero x día
+    """
+    rows = {barber_id: index for index, barber_id in enumerate(barber_ids)}
+    columns = {day: index for index, day in enumerate(dates)}
+    matrix = np.zeros((len(barber_ids), len(dates)), dtype=np.int64)
+    for barber_id, day, minutes in DailyBarberStats.objects.filter(
+        barber_id__in=barber_ids,
+        date__range=[dates[0], dates[-1]],
+        booked_minutes__gt=0
+    ).values_list('barber_id', 'date', 'booked_minutes'):
+        matrix[rows[barber_id], columns[day]] = minutes
+    return matrix
+
+
+def utilization_report(barbers, start_date, end_date):
+    """
+    Ocupación de la silla: minutos reservados / minutos de horario
+    laboral, por barbero y en total
+    """
+    barber_ids = [barber.id for barber in barbers]
+    dates = date_range(start_date, end_date)
+    if not barber_ids:
+        return {'scheduled_minutes': 0, 'booked_minutes': 0, 'utilization': None, 'results': []}
+
+    scheduled = scheduled_minutes(barber_ids, dates).sum(axis=1)
+    booked = booked_minutes(barber_ids, dates).sum(axis=1)
+    ratio = np.where(scheduled > 0, booked / np.maximum(scheduled, 1), np.nan)
+
+    total_scheduled, total_booked = int(scheduled.sum()), int(booked.sum())
+    return {
+        'scheduled_minutes': total_scheduled,
+        'booked_minutes': total_booked,
+        'utilization': round(total_booked / total_scheduled, 4) if total_scheduled else None,
+        'results': [
+            {
+                'barber': barber.id,
+                'label': barber.get_full_name(),
+                'scheduled_minutes': int(scheduled[index]),
+                'booked_minutes': int(booked[index]),
+                'utilization': None if np.isnan(ratio[index]) else round(float(ratio[index]), 4),
+            }
+            for index, barber in enumerate(barbers)
+        ],
+    }
@@ -0,0 +1,234 @@
+"""
+Generador de datos sintéticos de la barbería: barberos, clientes,
+servicios, horarios semanales, excepciones y citas sin superposición.
+
+Todo se inserta con ``bulk_create`` por lotes y la contraseña compartida se
+hashea una sola vez, así que cargar un millón de citas toma minutos. El
+resumen diario (``DailyBarberStats``) se calcula mientras se generan las
+citas y se inserta junto con ellas, porque ``bulk_create`` no envía las
+señales que lo mantienen.
+
+    ShopSeeder(barbers=50, clients=5000, days_back=730).run()
+"""
+import random
+import time as clock
+from datetime import time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .models import User, Service, Schedule, ScheduleException, Appointment, DailyBarberStats, ResourceVersion
+
+FIRST_NAMES = (
+    'Carlos', 'Juan', 'Andrés', 'Felipe', 'Santiago', 'Mateo', 'Camilo', 'Diego', 'Luis', 'Jorge',
+    'María', 'Laura', 'Camila', 'Valentina', 'Daniela', 'Sofía', 'Natalia', 'Paula', 'Ana', 'Lucía',
+)
+LAST_NAMES = (
+    'Gómez', 'Rodríguez', 'Martínez', 'López', 'García', 'Pérez', 'Ramírez', 'Torres', 'Díaz', 'Vargas',
+    'Moreno', 'Rojas', 'Castro', 'Ortiz', 'Herrera', 'Jiménez', 'Muñoz', 'Suárez', 'Ríos', 'Mejía',
+)
+
+# (nombre, descripción, precio, minutos, peso relativo al elegir)
+SERVICE_CATALOG = (
+    ('Corte clásico', 'Corte con tijera y máquina', '20000.00', 30, 40),
+    ('Arreglo de barba', 'Perfilado y arreglo de barba', '15000.00', 30, 20),
+    ('Corte y barba', 'Corte clásico con arreglo de barba', '30000.00', 60, 25),
+    ('Afeitado tradicional', 'Afeitado con navaja y toalla caliente', '18000.00', 30, 10),
+    ('Corte infantil', 'Corte para menores de 12 años', '15000.00', 30, 5),
+)
+
+# Jornadas (inicio, fin) en horas; todas con descanso de 13 a 14 y de lunes a sábado
+SHIFTS = ((8, 17), (9, 18), (10, 19))
+WORK_DAYS = range(6)
+
+# Estados de las citas ya pasadas y de las de hoy en adelante
+PAST_STATUSES = (('completed', 80), ('cancelled', 15), ('confirmed', 5))
+FUTURE_STATUSES = (('pending', 50), ('confirmed', 45), ('cancelled', 5))
+
+EXCEPTION_TYPES = (('personal', 60), ('vacation', 30), ('holiday', 10))
+
+
+class ShopSeeder:
+    """
+    Crea los datos dentro de una transacción. Después de ``run`` quedan en
+    ``barbers``, ``clients`` y ``services`` los IDs creados (o reutilizados,
+    en el caso de los servicios) y en ``counts`` cuántas filas se crearon
+    de cada tipo.
+    """
+
+    def __init__(self, barbers=20, clients=2000, days_back=730, days_ahead=30, occupancy=0.7,
+                 exception_rate=0.03, password='barbershop2024', prefix='seed', batch_size=5000,
+                 seed=None, log=None):
+        self.n_barbers = barbers
+        self.n_clients = clients
+        self.days_back = days_back
+        self.days_ahead = days_ahead
+        self.occupancy = occupancy
+        self.exception_rate = exception_rate
+        self.password = password
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.log = log or (lambda message: None)
+        self.counts = dict.fromkeys(
+            ('users', 'services', 'schedules', 'exceptions', 'appointments', 'daily_stats'), 0
+        )
+
+    def run(self):
+        started = clock.perf_counter()
+        with transaction.atomic():
+            self.create_users()
+            self.create_services()
+            self.create_schedules()
+            self.create_calendar()
+            # bulk_create no envía las señales que invalidan los ETag del catálogo
+            ResourceVersion.bump('services', 'schedules', 'barbers')
+        self.seconds = clock.perf_counter() - started
+        return self
+
+    def create_users(self):
+        password = make_password(self.password)
+        people = [('barber', index) for index in range(self.n_barbers)]
+        people += [('client', index) for index in range(self.n_clients)]
+        User.objects.bulk_create([
+            User(
+                username=f'{self.prefix}_{role}{index}', password=password, role=role,
+                email=f'{self.prefix}_{role}{index}@example.com',
+                first_name=self.random.choice(FIRST_NAMES), last_name=self.random.choice(LAST_NAMES),
+            ) for role, index in people
+        ], batch_size=self.batch_size)
+        # MySQL no devuelve los IDs de bulk_create
+        self.barbers = list(User.objects.filter(
+            username__startswith=f'{self.prefix}_barber', role='barber'
+        ).order_by('id').values_list('id', flat=True))
+        self.clients = list(User.objects.filter(
+            username__startswith=f'{self.prefix}_client', role='client'
+        ).order_by('id').values_list('id', flat=True))
+        self.counts['users'] = len(people)
+        self.log(f'{len(people)} usuarios creados')
+
+    def create_services(self):
+        """
+        Usa los servicios del catálogo que ya existen (por nombre) y crea
+        los que faltan
+        """
+        existing = {
+            service.name: service
+            for service in Service.objects.filter(name__in=[entry[0] for entry in SERVICE_CATALOG])
+        }
+        missing = [
+            Service(name=name, description=description, price=price, duration=timedelta(minutes=minutes))
+            for name, description, price, minutes, _ in SERVICE_CATALOG if name not in existing
+        ]
+        Service.objects.bulk_create(missing)
+        self.counts['services'] = len(missing)
+        by_name = {
+            service.name: service
+            for service in Service.objects.filter(name__in=[entry[0] for entry in SERVICE_CATALOG])
+        }
+        services = [by_name[entry[0]] for entry in SERVICE_CATALOG]
+        self.services = [service.id for service in services]
+        # (id, minutos, precio, duración) para generar las citas sin consultar;
+        # los servicios existentes conservan su precio y duración
+        self.catalog = [
+            (service.id, int(service.duration.total_seconds() // 60), Decimal(service.price), service.duration)
+            for service in services
+        ]
+        self.weights = [entry[4] for entry in SERVICE_CATALOG]
+        self.shortest = min(self.catalog, key=lambda entry: entry[1])
+
+    def create_schedules(self):
+        self.shifts = {barber_id: self.random.choice(SHIFTS) for barber_id in self.barbers}
+        Schedule.objects.bulk_create([
+            Schedule(
+                barber_id=barber_id, day_of_week=day,
+                start_time=time(start, 0), end_time=time(end, 0),
+                break_start_time=time(13, 0), break_end_time=time(14, 0),
+                interval_minutes=30,
+            )
+            for barber_id, (start, end) in self.shifts.items() for day in WORK_DAYS
+        ], batch_size=self.batch_size)
+        self.counts['schedules'] = len(self.shifts) * len(WORK_DAYS)
+
+    def create_calendar(self):
+        today = timezone.localdate()
+        first_day = today - timedelta(days=self.days_back)
+        exceptions, appointments, stats = [], [], []
+        for offset in range(self.days_back + self.days_ahead + 1):
+            day = first_day + timedelta(days=offset)
+            if day.weekday() not in WORK_DAYS:
+                continue
+            statuses = PAST_STATUSES if day < today else FUTURE_STATUSES
+            for barber_id in self.barbers:
+                if self.random.random() < self.exception_rate:
+                    exceptions.append(ScheduleException(
+                        barber_id=barber_id, date=day,
+                        exception_type=self.weighted(EXCEPTION_TYPES), description='Generada por seed_shop'
+                    ))
+                    continue
+                day_appointments = self.day_appointments(barber_id, day, statuses)
+                if day_appointments:
+                    appointments.extend(day_appointments)
+                    stats.append(self.day_stats(barber_id, day, day_appointments))
+
+            if len(appointments) >= self.batch_size:
+                self.flush(exceptions, appointments, stats)
+                exceptions, appointments, stats = [], [], []
+        self.flush(exceptions, appointments, stats)
+
+    def day_appointments(self, barber_id, day, statuses):
+        """
+        Recorre la jornada en slots de 30 minutos y ocupa cada uno con
+        probabilidad ``occupancy``; los servicios largos ocupan varios
+        slots, así que las citas nunca se superponen
+        """
+        start, end = self.shifts[barber_id]
+        minute, end, break_start, break_end = start * 60, end * 60, 13 * 60, 14 * 60
+        appointments = []
+        while minute + 30 <= end:
+            if break_start <= minute < break_end:
+                minute = break_end
+                continue
+            if self.random.random() >= self.occupancy:
+                minute += 30
+                continue
+            service_id, minutes, price, duration = self.random.choices(self.catalog, self.weights)[0]
+            limit = break_start if minute < break_start else end
+            if minute + minutes > limit:
+                # No cabe antes del descanso o del cierre: el servicio más corto
+                service_id, minutes, price, duration = self.shortest
+                if minute + minutes > limit:
+                    minute += 30
+                    continue
+            appointments.append(Appointment(
+                client_id=self.random.choice(self.clients), barber_id=barber_id, service_id=service_id,
+                price=price, duration=duration,
+                date=day, start_time=time(*divmod(minute, 60)), end_time=time(*divmod(minute + minutes, 60)),
+                status=self.weighted(statuses),
+            ))
+            # Siguiente inicio en la grilla de 30 minutos
+            minute += -(-minutes // 30) * 30
+        return appointments
+
+    def day_stats(self, barber_id, day, appointments):
+        row = DailyBarberStats(barber_id=barber_id, date=day)
+        for appointment in appointments:
+            contribution = DailyBarberStats.contribution(appointment.status, appointment.price, appointment.duration)
+            for field, value in contribution.items():
+                setattr(row, field, getattr(row, field) + value)
+        return row
+
+    def flush(self, exceptions, appointments, stats):
+        ScheduleException.objects.bulk_create(exceptions, batch_size=self.batch_size)
+        Appointment.objects.bulk_create(appointments, batch_size=self.batch_size)
+        DailyBarberStats.objects.bulk_create(stats, batch_size=self.batch_size)
+        self.counts['exceptions'] += len(exceptions)
+        self.counts['appointments'] += len(appointments)
+        self.counts['daily_stats'] += len(stats)
+        if appointments:
+            self.log(f"{self.counts['appointments']} citas hasta {appointments[-1].date}")
+
+    def weighted(self, choices):
+        return self.random.choices([value for value, _ in choices], [weight for _, weight in choices])[0]
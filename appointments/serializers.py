@@ -1,12 +1,35 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from .models import Schedule, Service, ScheduleException, Appointment
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import (
+    Schedule, Service, ScheduleException, Appointment, SlotHold, BarberDayLock, ResourceVersion
+)
+from .availability import cached_schedule_slots, BarberAgenda
+from .signals import invalidate_days, add_to_daily_stats
+from .tokens import RefreshToken
+from .timing import measure
+from .metrics import BOOKING_LATENCY, BOOKING_CONFLICTS
 from datetime import datetime, timedelta
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+class TimedRepresentationMixin:
+    """
+    Suma el tiempo de ``to_representation`` a la métrica ``serialize`` de
+    la petición (ver ``appointments.middleware``)
+    """
+
+    def to_representation(self, instance):
+        with measure('serialize'):
+            return super().to_representation(instance)
+
+class UserSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
     class Meta:
@@ -31,45 +54,48 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         data['user'] = UserSerializer(self.user).data
         return data
 
-class ScheduleSerializer(serializers.ModelSerializer):
-    barber_name = serializers.CharField(source='barber.get_full_name', read_only=True)
-    day_of_week_display = serializers.CharField(source='get_day_of_week_display', read_only=True)
-    available_slots = serializers.SerializerMethodField()
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh con rotación: el token usado pasa a la lista negra y, si ya
+    estaba en ella (reutilizado o revocado en otro proceso aún no
+    sincronizado), el refresh se rechaza
+    """
+    token_class = RefreshToken
 
-    class Meta:
-        model = Schedule
-        fields = (
-            'id', 'barber', 'barber_name', 'day_of_week', 'day_of_week_display',
-            'start_time', 'end_time', 'is_active', 'interval_minutes',
-            'break_start_time', 'break_end_time', 'available_slots'
-        )
-        read_only_fields = ('barber_name', 'day_of_week_display', 'available_slots')
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        data = {'access': str(refresh.access_token)}
 
-    def get_available_slots(self, obj):
-        """
-        Obtiene los slots disponibles para la fecha especificada
-        """
-        date_param = self.context.get('request').query_params.get('date')
-        if not date_param:
-            return None
-        
-        try:
-            date = datetime.strptime(date_param, '%Y-%m-%d').date()
-            duration_param = self.context.get('request').query_params.get('duration', '30')
-            duration = timedelta(minutes=int(duration_param))
-            
-            slots = obj.get_available_slots(date, duration)
-            return [slot.strftime('%H:%M') for slot in slots]
-        except (ValueError, TypeError):
-            return None
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                blacklisted, created = refresh.blacklist()
+                if not created:
+                    raise TokenError('Token is blacklisted')
 
-    def validate(self, data):
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+
+        return data
+
+WEEKLY_SCHEDULE_FIELDS = (
+    'day_of_week', 'start_time', 'end_time', 'is_active', 'interval_minutes',
+    'break_start_time', 'break_end_time'
+)
+
+class ScheduleHoursMixin:
+    """
+    Validaciones del horario laboral comunes al horario individual y a la
+    plantilla semanal
+    """
+
+    def validate_hours(self, data):
         """
         Validar que:
         1. La hora de inicio sea anterior a la hora de fin
-        2. No haya superposición de horarios para el mismo barbero
-        3. El intervalo sea válido
-        4. El periodo de descanso sea válido si se especifica
+        2. El intervalo sea válido
+        3. El periodo de descanso sea válido si se especifica
         """
         # Validar hora inicio < hora fin
         if data.get('start_time') and data.get('end_time'):
@@ -102,6 +128,44 @@ class ScheduleSerializer(serializers.ModelSerializer):
                         "El periodo de descanso debe estar dentro del horario laboral"
                     )
 
+class ScheduleSerializer(TimedRepresentationMixin, ScheduleHoursMixin, serializers.ModelSerializer):
+    barber_name = serializers.CharField(source='barber.get_full_name', read_only=True)
+    day_of_week_display = serializers.CharField(source='get_day_of_week_display', read_only=True)
+    available_slots = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Schedule
+        fields = (
+            'id', 'barber', 'barber_name', 'day_of_week', 'day_of_week_display',
+            'start_time', 'end_time', 'is_active', 'interval_minutes',
+            'break_start_time', 'break_end_time', 'available_slots'
+        )
+        read_only_fields = ('barber_name', 'day_of_week_display', 'available_slots')
+
+    def get_available_slots(self, obj):
+        """
+        Obtiene los slots disponibles para la fecha especificada
+        """
+        date_param = self.context.get('request').query_params.get('date')
+        if not date_param:
+            return None
+        
+        try:
+            date = datetime.strptime(date_param, '%Y-%m-%d').date()
+            duration_param = self.context.get('request').query_params.get('duration', '30')
+            duration = timedelta(minutes=int(duration_param))
+            
+            return cached_schedule_slots(obj, date, duration, self.context.get('day_data'))
+        except (ValueError, TypeError):
+            return None
+
+    def validate(self, data):
+        """
+        Validar el horario laboral y que no haya superposición de
+        horarios para el mismo barbero
+        """
+        self.validate_hours(data)
+
         # Validar superposición solo si tenemos todos los datos necesarios
         if self.instance is None and all(key in data for key in ['barber', 'day_of_week', 'start_time', 'end_time']):
             overlapping = Schedule.objects.filter(
@@ -122,7 +186,99 @@ class ScheduleSerializer(serializers.ModelSerializer):
 
         return data
 
-class ScheduleExceptionSerializer(serializers.ModelSerializer):
+class WeeklyScheduleDaySerializer(TimedRepresentationMixin, ScheduleHoursMixin, serializers.ModelSerializer):
+    """
+    Un día de la plantilla semanal; los campos omitidos toman el valor
+    por defecto del modelo
+    """
+
+    class Meta:
+        model = Schedule
+        fields = WEEKLY_SCHEDULE_FIELDS
+
+    def validate(self, data):
+        for field in WEEKLY_SCHEDULE_FIELDS:
+            if field not in data:
+                data[field] = Schedule._meta.get_field(field).get_default()
+        self.validate_hours(data)
+        return data
+
+class WeeklyScheduleSerializer(serializers.Serializer):
+    """
+    Plantilla semanal aplicada a uno o varios barberos: crea los días
+    nuevos, actualiza los que cambian y, con ``replace``, elimina los días
+    que no vienen en la plantilla
+    """
+    barbers = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    days = WeeklyScheduleDaySerializer(many=True)
+    replace = serializers.BooleanField(
+        default=True,
+        help_text='Eliminar los horarios de los días que no vienen en la plantilla'
+    )
+
+    def validate_barbers(self, value):
+        barber_ids = set(value)
+        found = set(
+            User.objects.filter(role='barber', id__in=barber_ids).values_list('id', flat=True)
+        )
+        missing = sorted(barber_ids - found)
+        if missing:
+            raise serializers.ValidationError(
+                f"Barberos no encontrados: {', '.join(map(str, missing))}"
+            )
+        return sorted(barber_ids)
+
+    def validate_days(self, value):
+        days = [day['day_of_week'] for day in value]
+        if len(days) != len(set(days)):
+            raise serializers.ValidationError("Hay días de la semana repetidos en la plantilla")
+        return value
+
+    def apply(self):
+        """
+        Comparar la plantilla con los horarios existentes y aplicar las
+        altas, cambios y bajas en una sola transacción con operaciones
+        masivas. Devuelve el número de filas creadas, actualizadas y
+        eliminadas.
+        """
+        barber_ids = self.validated_data['barbers']
+        template = {day['day_of_week']: day for day in self.validated_data['days']}
+
+        existing = {
+            (schedule.barber_id, schedule.day_of_week): schedule
+            for schedule in Schedule.objects.filter(barber_id__in=barber_ids)
+        }
+        to_create, to_update, to_delete = [], [], []
+        for barber_id in barber_ids:
+            for day_of_week, values in template.items():
+                schedule = existing.pop((barber_id, day_of_week), None)
+                if schedule is None:
+                    to_create.append(Schedule(barber_id=barber_id, **values))
+                elif any(getattr(schedule, field) != values[field] for field in WEEKLY_SCHEDULE_FIELDS):
+                    for field in WEEKLY_SCHEDULE_FIELDS:
+                        setattr(schedule, field, values[field])
+                    to_update.append(schedule)
+        if self.validated_data['replace']:
+            to_delete = [schedule.id for schedule in existing.values()]
+
+        with transaction.atomic():
+            if to_delete:
+                Schedule.objects.filter(id__in=to_delete).delete()
+            if to_update:
+                Schedule.objects.bulk_update(to_update, WEEKLY_SCHEDULE_FIELDS[1:])
+            if to_create:
+                Schedule.objects.bulk_create(to_create)
+            # bulk_update y bulk_create no envían señales
+            invalidate_days([(barber_id, None) for barber_id in barber_ids])
+            ResourceVersion.bump('schedules')
+
+        return {
+            'created': len(to_create),
+            'updated': len(to_update),
+            'deleted': len(to_delete),
+        }
+
+class ScheduleExceptionSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     barber_name = serializers.CharField(source='barber.get_full_name', read_only=True)
     exception_type_display = serializers.CharField(source='get_exception_type_display', read_only=True)
 
@@ -171,7 +327,7 @@ class ScheduleExceptionSerializer(serializers.ModelSerializer):
 
         return data
 
-class BarberSerializer(serializers.ModelSerializer):
+class BarberSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     schedules = ScheduleSerializer(many=True, read_only=True)
     full_name = serializers.CharField(source='get_full_name', read_only=True)
 
@@ -186,7 +342,7 @@ class BarberSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Este usuario no es un barbero")
         return data
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     duration_display = serializers.SerializerMethodField()
 
     class Meta:
@@ -232,13 +388,140 @@ class ServiceSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("La duración no puede exceder las 4 horas")
         return value 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class SlotValidationMixin:
+    """
+    Validaciones de un horario a reservar, compartidas por las citas y las
+    retenciones de horario
+    """
+
+    def validate_slot(self, barber, date, start_time, duration, agenda=None):
+        """
+        Validar que:
+        1. La fecha no sea en el pasado
+        2. El barbero tenga horario para ese día
+        3. El horario esté dentro del horario del barbero
+        4. No haya superposición con otras citas ni retenciones de otros clientes
+        5. No haya excepciones para esa fecha
+
+        Devuelve la hora de fin calculada a partir de la duración. Con un
+        ``BarberAgenda`` las verificaciones se hacen en memoria sin consultar.
+        """
+        # Validar fecha
+        if date < datetime.now().date():
+            raise serializers.ValidationError(
+                "No se pueden crear citas para fechas pasadas"
+            )
+
+        # Obtener el día de la semana (0 = Lunes, 6 = Domingo)
+        day_of_week = date.weekday()
+
+        # Verificar si el barbero tiene horario para ese día
+        if agenda is not None:
+            schedule = agenda.schedule_for(date)
+        else:
+            schedule = Schedule.objects.filter(
+                barber=barber,
+                day_of_week=day_of_week,
+                is_active=True
+            ).first()
+
+        if not schedule:
+            raise serializers.ValidationError(
+                f"El barbero no tiene horario para el día {date}"
+            )
+
+        # Verificar si hay excepciones para esa fecha
+        if agenda is not None:
+            exception_exists = agenda.is_closed(date)
+        else:
+            exception_exists = ScheduleException.objects.filter(
+                barber=barber,
+                date=date,
+                is_active=True
+            ).exists()
+
+        if exception_exists:
+            raise serializers.ValidationError(
+                "El barbero no está disponible en esta fecha"
+            )
+
+        # Verificar que la hora esté dentro del horario del barbero
+        if (start_time < schedule.start_time or
+            start_time >= schedule.end_time):
+            raise serializers.ValidationError(
+                "La hora de la cita está fuera del horario del barbero"
+            )
+
+        # Verificar si está en periodo de descanso
+        if schedule.break_start_time and schedule.break_end_time:
+            if (start_time >= schedule.break_start_time and
+                start_time < schedule.break_end_time):
+                raise serializers.ValidationError(
+                    "La hora de la cita está en el periodo de descanso del barbero"
+                )
+
+        # Calcular hora de fin basada en la duración del servicio
+        end_time = (
+            datetime.combine(datetime.min, start_time) +
+            duration
+        ).time()
+
+        # Verificar que la cita no se extienda más allá del horario
+        if end_time > schedule.end_time:
+            raise serializers.ValidationError(
+                "La duración del servicio excede el horario del barbero"
+            )
+
+        # Verificar superposición con otras citas
+        if agenda is not None:
+            overlapping = agenda.has_overlap(date, start_time, end_time)
+        else:
+            overlapping = self.has_overlap(barber, date, start_time, end_time)
+        if overlapping:
+            BOOKING_CONFLICTS.labels(stage='validate').inc()
+            raise serializers.ValidationError(
+                "Ya existe una cita en este horario"
+            )
+
+        return end_time
+
+    def has_overlap(self, barber, date, start_time, end_time):
+        """
+        Verificar si hay citas activas del barbero, o retenciones vigentes de
+        otros clientes, que se superponen con el rango
+        """
+        overlapping = Appointment.objects.filter(
+            barber=barber,
+            date=date,
+            status__in=['pending', 'confirmed'],
+        ).filter(
+            start_time__lt=end_time,
+            end_time__gt=start_time
+        ).exists()
+
+        if overlapping:
+            return True
+
+        return SlotHold.active().filter(
+            barber=barber,
+            date=date,
+            start_time__lt=end_time,
+            end_time__gt=start_time
+        ).exclude(
+            client=self.context['request'].user
+        ).exists()
+
+class AppointmentSerializer(TimedRepresentationMixin, SlotValidationMixin, serializers.ModelSerializer):
     client_name = serializers.CharField(source='client.get_full_name', read_only=True)
     barber_name = serializers.CharField(source='barber.get_full_name', read_only=True)
     service_name = serializers.CharField(source='service.name', read_only=True)
-    service_duration = serializers.DurationField(source='service.duration', read_only=True)
-    service_price = serializers.DecimalField(source='service.price', read_only=True, max_digits=10, decimal_places=2)
+    service_duration = serializers.DurationField(source='duration', read_only=True)
+    service_price = serializers.DecimalField(source='price', read_only=True, max_digits=10, decimal_places=2)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
+    hold = serializers.PrimaryKeyRelatedField(
+        queryset=SlotHold.objects.all(), write_only=True, required=False,
+        help_text='Retención de horario a convertir en cita'
+    )
 
     class Meta:
         model = Appointment
@@ -246,7 +529,7 @@ class AppointmentSerializer(serializers.ModelSerializer):
             'id', 'client', 'client_name', 'barber', 'barber_name',
             'service', 'service_name', 'service_duration', 'service_price',
             'date', 'start_time', 'end_time', 'status', 'status_display',
-            'notes', 'created_at', 'updated_at'
+            'notes', 'hold', 'created_at', 'updated_at'
         )
         read_only_fields = (
             'client_name', 'barber_name', 'service_name',
@@ -256,103 +539,253 @@ class AppointmentSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         """
-        Validar que:
-        1. La fecha no sea en el pasado
-        2. El barbero tenga horario para ese día
-        3. El horario esté dentro del horario del barbero
-        4. No haya superposición con otras citas
-        5. No haya excepciones para esa fecha
+        Validar el horario de las nuevas citas (ver ``validate_slot``) y, si
+        se indica, que la retención sea del cliente, esté vigente y
+        corresponda al mismo barbero, fecha y hora
         """
+        with BOOKING_LATENCY.labels(phase='validate').time():
+            return self._validate(data)
+
+    def _validate(self, data):
         if not self.instance:  # Solo para nuevas citas
-            # Validar fecha
-            if data['date'] < datetime.now().date():
-                raise serializers.ValidationError(
-                    "No se pueden crear citas para fechas pasadas"
-                )
+            hold = data.get('hold')
+            if hold is not None:
+                if (hold.client_id != self.context['request'].user.id or
+                    hold.expires_at <= timezone.now()):
+                    raise serializers.ValidationError(
+                        "La retención del horario no existe o ya venció"
+                    )
+                if (hold.barber_id != data['barber'].id or hold.date != data['date'] or
+                    hold.start_time != data['start_time']):
+                    raise serializers.ValidationError(
+                        "La retención no corresponde al barbero, fecha y hora de la cita"
+                    )
 
-            # Obtener el día de la semana (0 = Lunes, 6 = Domingo)
-            day_of_week = data['date'].weekday()
+            # Guardar la hora de fin calculada
+            self.context['end_time'] = self.validate_slot(
+                data['barber'], data['date'], data['start_time'], data['service'].duration
+            )
 
-            # Verificar si el barbero tiene horario para ese día
-            schedule = Schedule.objects.filter(
-                barber=data['barber'],
-                day_of_week=day_of_week,
-                is_active=True
-            ).first()
+        return data
 
-            if not schedule:
-                raise serializers.ValidationError(
-                    f"El barbero no tiene horario para el día {data['date']}"
-                )
+    def create(self, validated_data):
+        """
+        Crear una cita asignando automáticamente:
+        1. El cliente (usuario actual)
+        2. La hora de fin (basada en la duración del servicio)
+        3. El estado inicial (pending)
 
-            # Verificar si hay excepciones para esa fecha
-            exception_exists = ScheduleException.objects.filter(
-                barber=data['barber'],
-                date=data['date'],
-                is_active=True
-            ).exists()
+        Si viene de una retención, la retención se consume en la misma transacción.
+        """
+        with BOOKING_LATENCY.labels(phase='create').time():
+            return self._create(validated_data)
 
-            if exception_exists:
-                raise serializers.ValidationError(
-                    "El barbero no está disponible en esta fecha"
-                )
+    def _create(self, validated_data):
+        hold = validated_data.pop('hold', None)
+        validated_data['client'] = self.context['request'].user
+        validated_data['end_time'] = self.context['end_time']
+        validated_data['status'] = 'pending'
 
-            # Verificar que la hora esté dentro del horario del barbero
-            if (data['start_time'] < schedule.start_time or
-                data['start_time'] >= schedule.end_time):
+        # Serializar las reservas del mismo barbero y día: la superposición
+        # se vuelve a verificar con el bloqueo tomado, justo antes de insertar
+        barber, date = validated_data['barber'], validated_data['date']
+        BarberDayLock.prepare(barber.id, [date])
+        with transaction.atomic():
+            BarberDayLock.acquire(barber.id, [date])
+            if self.has_overlap(barber, date, validated_data['start_time'], validated_data['end_time']):
+                BOOKING_CONFLICTS.labels(stage='locked').inc()
                 raise serializers.ValidationError(
-                    "La hora de la cita está fuera del horario del barbero"
+                    "Ya existe una cita en este horario"
                 )
+            appointment = super().create(validated_data)
+            if hold is not None:
+                hold.delete()
+            return appointment
 
-            # Verificar si está en periodo de descanso
-            if schedule.break_start_time and schedule.break_end_time:
-                if (data['start_time'] >= schedule.break_start_time and
-                    data['start_time'] < schedule.break_end_time):
-                    raise serializers.ValidationError(
-                        "La hora de la cita está en el periodo de descanso del barbero"
-                    )
+class SlotHoldSerializer(TimedRepresentationMixin, SlotValidationMixin, serializers.ModelSerializer):
+    duration = serializers.IntegerField(
+        write_only=True, required=False, min_value=1, max_value=240,
+        help_text='Duración en minutos si no se indica el servicio'
+    )
 
-            # Calcular hora de fin basada en la duración del servicio
-            service_duration = data['service'].duration
-            end_time = (
-                datetime.combine(datetime.min, data['start_time']) +
-                service_duration
-            ).time()
+    class Meta:
+        model = SlotHold
+        fields = (
+            'id', 'barber', 'service', 'duration', 'date',
+            'start_time', 'end_time', 'expires_at', 'created_at'
+        )
+        read_only_fields = ('end_time', 'expires_at', 'created_at')
 
-            # Verificar que la cita no se extienda más allá del horario
-            if end_time > schedule.end_time:
-                raise serializers.ValidationError(
-                    "La duración del servicio excede el horario del barbero"
-                )
+    def validate(self, data):
+        """
+        Validar que se indique la duración (servicio o minutos) y que el
+        horario esté disponible
+        """
+        if data.get('service'):
+            duration = data['service'].duration
+        elif data.get('duration'):
+            duration = timedelta(minutes=data['duration'])
+        else:
+            raise serializers.ValidationError(
+                "Se requiere el servicio o la duración en minutos"
+            )
 
-            # Verificar superposición con otras citas
-            overlapping = Appointment.objects.filter(
-                barber=data['barber'],
-                date=data['date'],
-                status__in=['pending', 'confirmed'],
-            ).filter(
-                start_time__lt=end_time,
-                end_time__gt=data['start_time']
-            ).exists()
+        self.context['end_time'] = self.validate_slot(
+            data['barber'], data['date'], data['start_time'], duration
+        )
+        return data
 
-            if overlapping:
+    def create(self, validated_data):
+        """
+        Crear la retención para el cliente actual con vencimiento
+        SLOT_HOLD_TTL. Un cliente retiene un solo horario a la vez: las
+        retenciones anteriores se liberan.
+        """
+        validated_data.pop('duration', None)
+        client = self.context['request'].user
+        validated_data['client'] = client
+        validated_data['end_time'] = self.context['end_time']
+        validated_data['expires_at'] = timezone.now() + timedelta(seconds=settings.SLOT_HOLD_TTL)
+
+        barber, date = validated_data['barber'], validated_data['date']
+        BarberDayLock.prepare(barber.id, [date])
+        with transaction.atomic():
+            BarberDayLock.acquire(barber.id, [date])
+            if self.has_overlap(barber, date, validated_data['start_time'], validated_data['end_time']):
                 raise serializers.ValidationError(
                     "Ya existe una cita en este horario"
                 )
+            SlotHold.objects.filter(client=client).delete()
+            return super().create(validated_data)
 
-            # Guardar la hora de fin calculada
-            self.context['end_time'] = end_time
 
+class BookingSlotSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+
+class RecurrenceSerializer(serializers.Serializer):
+    start_date = serializers.DateField()
+    start_time = serializers.TimeField()
+    interval_days = serializers.IntegerField(
+        min_value=1, max_value=90, default=7,
+        help_text='Días entre ocurrencias (7 = semanal, 14 = cada dos semanas)'
+    )
+    count = serializers.IntegerField(min_value=1, required=False)
+    until = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if not data.get('count') and not data.get('until'):
+            raise serializers.ValidationError(
+                "Se requiere el número de ocurrencias (count) o la fecha final (until)"
+            )
+        if data.get('until') and data['until'] < data['start_date']:
+            raise serializers.ValidationError({
+                'until': "La fecha final no puede ser anterior a la fecha de inicio"
+            })
         return data
 
-    def create(self, validated_data):
+class BulkAppointmentSerializer(SlotValidationMixin, serializers.Serializer):
+    """
+    Reserva de varias citas del mismo barbero y servicio, a partir de una
+    lista de horarios o de una regla de recurrencia. Todas se validan contra
+    una sola carga de la agenda del barbero y se insertan con bulk_create.
+    """
+    barber = serializers.PrimaryKeyRelatedField(queryset=User.objects.filter(role='barber'))
+    service = serializers.PrimaryKeyRelatedField(queryset=Service.objects.filter(is_active=True))
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    slots = BookingSlotSerializer(many=True, required=False)
+    recurrence = RecurrenceSerializer(required=False)
+    all_or_none = serializers.BooleanField(
+        default=False,
+        help_text='No crear ninguna cita si alguna ocurrencia tiene conflicto'
+    )
+
+    def validate(self, data):
         """
-        Crear una cita asignando automáticamente:
-        1. El cliente (usuario actual)
-        2. La hora de fin (basada en la duración del servicio)
-        3. El estado inicial (pending)
+        Validar que se indique exactamente una forma de describir las citas y
+        expandir la recurrencia en una lista de (fecha, hora)
         """
-        validated_data['client'] = self.context['request'].user
-        validated_data['end_time'] = self.context['end_time']
-        validated_data['status'] = 'pending'
-        return super().create(validated_data) 
\ No newline at end of file
+        if bool(data.get('slots')) == bool(data.get('recurrence')):
+            raise serializers.ValidationError(
+                "Se debe indicar una lista de horarios (slots) o una recurrencia (recurrence)"
+            )
+
+        limit = settings.BULK_BOOKING_MAX_OCCURRENCES
+        if data.get('slots'):
+            occurrences = [(slot['date'], slot['start_time']) for slot in data['slots']]
+        else:
+            rule = data['recurrence']
+            occurrences = []
+            day = rule['start_date']
+            while len(occurrences) <= limit:
+                if rule.get('until') and day > rule['until']:
+                    break
+                if rule.get('count') and len(occurrences) >= rule['count']:
+                    break
+                occurrences.append((day, rule['start_time']))
+                day += timedelta(days=rule['interval_days'])
+
+        if len(occurrences) > limit:
+            raise serializers.ValidationError(
+                f"No se pueden reservar más de {limit} citas en una sola solicitud"
+            )
+        if len(set(occurrences)) != len(occurrences):
+            raise serializers.ValidationError("Hay horarios repetidos en la solicitud")
+
+        data['occurrences'] = sorted(occurrences)
+        return data
+
+    def book(self):
+        """
+        Validar cada ocurrencia con la agenda bloqueada del barbero e insertar
+        las válidas en una transacción. Devuelve (citas creadas, conflictos).
+        """
+        barber = self.validated_data['barber']
+        service = self.validated_data['service']
+        client = self.context['request'].user
+        occurrences = self.validated_data['occurrences']
+        dates = sorted({day for day, _ in occurrences})
+
+        BarberDayLock.prepare(barber.id, dates)
+        with transaction.atomic():
+            BarberDayLock.acquire(barber.id, dates)
+            agenda = BarberAgenda(barber.id, dates[0], dates[-1], client_id=client.id)
+
+            appointments, conflicts = [], []
+            for day, start_time in occurrences:
+                try:
+                    end_time = self.validate_slot(barber, day, start_time, service.duration, agenda=agenda)
+                except serializers.ValidationError as error:
+                    conflicts.append({
+                        'date': day,
+                        'start_time': start_time,
+                        'detail': error.detail[0],
+                    })
+                    continue
+                agenda.add(day, start_time, end_time)
+                appointments.append(Appointment(
+                    client=client, barber=barber, service=service,
+                    price=service.price, duration=service.duration,
+                    date=day, start_time=start_time, end_time=end_time,
+                    status='pending', notes=self.validated_data['notes']
+                ))
+
+            if conflicts and self.validated_data['all_or_none']:
+                return [], conflicts
+
+            Appointment.objects.bulk_create(appointments)
+            # bulk_create no envía post_save: invalidar el caché de los días
+            # reservados y sumarlos al resumen diario
+            invalidate_days({(barber.id, appointment.date) for appointment in appointments})
+            add_to_daily_stats(appointments)
+
+            if appointments and appointments[0].pk is None:
+                # Motores que no devuelven los IDs de bulk_create (MySQL)
+                slots = Q()
+                for appointment in appointments:
+                    slots |= Q(date=appointment.date, start_time=appointment.start_time)
+                appointments = list(Appointment.objects.filter(
+                    slots, barber=barber, status='pending'
+                ).select_related('client', 'barber', 'service').order_by('date', 'start_time'))
+
+        return appointments, conflicts
@@ -0,0 +1,141 @@
+"""
+Señales del módulo de citas.
+
+Invalida las entradas del caché de disponibilidad afectadas por cambios en
+citas, horarios, excepciones y retenciones de horario, y mantiene el
+resumen diario ``DailyBarberStats`` al crear, modificar o eliminar citas.
+También incrementa la versión (``ResourceVersion``) de servicios, barberos
+y horarios para las respuestas condicionales (ETag) del catálogo, y
+descarta del caché de autenticación los usuarios modificados.
+Las escrituras que no envían señales (``bulk_create``, ``update``) deben
+aplicar el resumen por su cuenta o repararse con ``rebuild_daily_stats``.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import slot_cache, user_cache
+from .models import (
+    User, Schedule, ScheduleException, Appointment, SlotHold, Service,
+    DailyBarberStats, ResourceVersion
+)
+
+
+def _affected_days(instance):
+    """
+    Pares (barbero, fecha) afectados: el estado actual y el leído de la base
+    """
+    days = {(instance.barber_id, instance.date)}
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded and 'barber_id' in loaded and 'date' in loaded:
+        days.add((loaded['barber_id'], loaded['date']))
+    return days
+
+
+def invalidate_days(targets):
+    """
+    Invalida los pares (barbero, fecha) de inmediato y otra vez al confirmar
+    la transacción, para que un cálculo concurrente con datos aún sin
+    confirmar no quede en caché. Una fecha None invalida todo el barbero.
+    También se usa en las escrituras masivas, que no envían señales.
+    """
+    def run():
+        for barber_id, date in targets:
+            slot_cache.invalidate(barber_id, date)
+
+    run()
+    transaction.on_commit(run)
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+@receiver([post_save, post_delete], sender=ScheduleException)
+@receiver([post_save, post_delete], sender=SlotHold)
+def invalidate_day_slots(sender, instance, **kwargs):
+    invalidate_days(_affected_days(instance))
+
+
+@receiver([post_save, post_delete], sender=Schedule)
+def invalidate_barber_slots(sender, instance, **kwargs):
+    barbers = {instance.barber_id}
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded and 'barber_id' in loaded:
+        barbers.add(loaded['barber_id'])
+    invalidate_days([(barber_id, None) for barber_id in barbers])
+
+
+def _merge(deltas, key, contribution):
+    day = deltas.setdefault(key, {})
+    for field, value in contribution.items():
+        day[field] = day.get(field, 0) + value
+
+
+def add_to_daily_stats(appointments):
+    """
+    Suma al resumen diario citas creadas sin señales (``bulk_create``)
+    """
+    deltas = {}
+    for appointment in appointments:
+        _merge(
+            deltas, (appointment.barber_id, appointment.date),
+            DailyBarberStats.contribution(appointment.status, appointment.price, appointment.duration)
+        )
+    DailyBarberStats.apply(deltas)
+
+
+def _stats_state(values):
+    return (values['barber_id'], values['date'], values['status'], values['price'], values['duration'])
+
+
+@receiver(post_save, sender=Appointment)
+def update_daily_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new = _stats_state(instance.__dict__)
+    deltas = {}
+    if not created:
+        loaded = getattr(instance, '_loaded_values', None)
+        if not loaded:
+            return
+        old = _stats_state(loaded)
+        if old == new:
+            return
+        # Se resta lo que la cita aportó (su precio y duración guardados),
+        # no los valores actuales del servicio
+        _merge(deltas, old[:2], DailyBarberStats.contribution(*old[2:], sign=-1))
+    _merge(deltas, new[:2], DailyBarberStats.contribution(*new[2:]))
+    DailyBarberStats.apply(deltas)
+
+
+@receiver(post_delete, sender=Appointment)
+def discount_daily_stats(sender, instance, **kwargs):
+    state = _stats_state(getattr(instance, '_loaded_values', None) or instance.__dict__)
+    # Al eliminar un barbero la cascada puede borrar su resumen antes que sus
+    # citas: no se recrea la fila para restarle
+    DailyBarberStats.apply({state[:2]: DailyBarberStats.contribution(*state[2:], sign=-1)}, create=False)
+
+
+@receiver([post_save, post_delete], sender=Service)
+def bump_services_version(sender, instance, **kwargs):
+    ResourceVersion.bump('services')
+
+
+@receiver([post_save, post_delete], sender=Schedule)
+def bump_schedules_version(sender, instance, **kwargs):
+    ResourceVersion.bump('schedules')
+
+
+@receiver([post_save, post_delete], sender=User)
+def bump_barbers_version(sender, instance, update_fields=None, **kwargs):
+    # El inicio de sesión solo actualiza last_login, que no se publica
+    if update_fields == frozenset({'last_login'}):
+        return
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    if instance.role == 'barber' or loaded.get('role') == 'barber':
+        ResourceVersion.bump('barbers')
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # También al confirmar, por si otra petición lo cacheó antes del commit
+    user_cache.invalidate(instance.pk)
+    transaction.on_commit(lambda: user_cache.invalidate(instance.pk))
@@ -1,3 +1,1861 @@
-from django.test import TestCase
+from datetime import date, time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+import csv
+import json
+import logging
+import os
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken as BaseRefreshToken
+
+from .availability import load_availability_data, compute_availability, format_minutes
+from .cache import SlotCache, ResponseCache, UserCache, slot_cache, response_cache, user_cache
+from .export import iter_export_rows
+from .models import User, Service, Schedule, ScheduleException, Appointment, SlotHold, DailyBarberStats
+from .tokens import RefreshToken, revoked_tokens
+from .seeding import ShopSeeder
+from .management.commands.simulate_rush import double_bookings
+from . import metrics, timing
+
+performance_logger = logging.getLogger('appointments.performance')
+performance_handlers = []
+
+
+def setUpModule():
+    # Las peticiones lentas (inicios de sesión, pruebas con hilos) no se
+    # imprimen; las pruebas que las verifican las capturan con assertLogs
+    performance_handlers[:] = performance_logger.handlers
+    performance_logger.handlers = [logging.NullHandler()]
+
+
+def tearDownModule():
+    performance_logger.handlers = performance_handlers[:]
+
+
+def next_weekday(day_of_week):
+    """
+    Próxima fecha (a partir de mañana) que cae en el día de la semana indicado
+    """
+    day = date.today() + timedelta(days=1)
+    while day.weekday() != day_of_week:
+        day += timedelta(days=1)
+    return day
+
+
+class BarbershopTestMixin:
+    """
+    Datos base compartidos por los tests: un barbero, un cliente y un servicio
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin', password='admin2024', role='admin',
+            is_staff=True, first_name='Ana', last_name='Admin'
+        )
+        cls.barber = User.objects.create_user(
+            username='carlos', password='barbero2024', role='barber',
+            first_name='Carlos', last_name='Pérez'
+        )
+        cls.client_user = User.objects.create_user(
+            username='pedro', password='cliente2024', role='client',
+            first_name='Pedro', last_name='Gómez'
+        )
+        cls.service = Service.objects.create(
+            name='Corte', description='Corte clásico',
+            price='20000.00', duration=timedelta(minutes=30)
+        )
+        cls.day = next_weekday(2)
+        cls.schedule = Schedule.objects.create(
+            barber=cls.barber, day_of_week=2,
+            start_time=time(9, 0), end_time=time(18, 0),
+            interval_minutes=30,
+            break_start_time=time(12, 0), break_end_time=time(13, 0)
+        )
+
+    def setUp(self):
+        slot_cache.clear()
+        response_cache.clear()
+        user_cache.clear()
+        revoked_tokens.clear()
+
+    def make_appointment(self, start, end, status='pending', day=None, **kwargs):
+        return Appointment.objects.create(
+            client=kwargs.pop('client', self.client_user),
+            barber=kwargs.pop('barber', self.barber),
+            service=kwargs.pop('service', self.service),
+            date=day or self.day,
+            start_time=start, end_time=end, status=status, **kwargs
+        )
+
+
+class ScheduleAvailableSlotsTests(BarbershopTestMixin, TestCase):
+
+    def test_slots_skip_break_and_active_appointments(self):
+        self.make_appointment(time(9, 30), time(10, 0))
+        self.make_appointment(time(10, 0), time(10, 45), status='confirmed')
+        self.make_appointment(time(15, 0), time(15, 30), status='cancelled')
+
+        slots = self.schedule.get_available_slots(self.day)
+
+        self.assertEqual(slots[:2], [time(9, 0), time(11, 0)])
+        self.assertNotIn(time(12, 0), slots)
+        self.assertNotIn(time(12, 30), slots)
+        self.assertIn(time(13, 0), slots)
+        self.assertIn(time(15, 0), slots)
+        self.assertEqual(slots[-1], time(17, 30))
+
+    def test_slot_before_break_may_run_into_it(self):
+        self.schedule.interval_minutes = 45
+        slots = self.schedule.get_available_slots(self.day, timedelta(minutes=60))
+        self.assertEqual(
+            slots,
+            [time(9, 0), time(9, 45), time(10, 30), time(11, 15),
+             time(13, 0), time(13, 45), time(14, 30), time(15, 15),
+             time(16, 0), time(16, 45)]
+        )
+
+    def test_active_exception_blocks_the_day(self):
+        ScheduleException.objects.create(barber=self.barber, date=self.day)
+        self.assertEqual(self.schedule.get_available_slots(self.day), [])
+
+    def test_query_count_does_not_depend_on_slot_count(self):
+        for minutes in (15, 60):
+            self.schedule.interval_minutes = minutes
+            with self.assertNumQueries(3):
+                self.schedule.get_available_slots(self.day)
+
+
+class AvailabilityEngineTests(BarbershopTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def test_engine_matches_get_available_slots(self):
+        self.make_appointment(time(9, 30), time(10, 0))
+        self.make_appointment(time(10, 0), time(10, 45), status='confirmed')
+        self.make_appointment(time(14, 10), time(14, 20))
+        self.make_appointment(time(15, 0), time(15, 30), status='cancelled')
+
+        for interval, minutes in [(30, 30), (45, 60), (15, 45), (20, 90)]:
+            self.schedule.interval_minutes = interval
+            self.schedule.save()
+            duration = timedelta(minutes=minutes)
+            data = load_availability_data([self.barber.id], self.day, self.day)
+            free = compute_availability([self.barber.id], [self.day], duration, data)
+            self.assertEqual(
+                format_minutes(free[self.barber.id][self.day]),
+                [slot.strftime('%H:%M') for slot in self.schedule.get_available_slots(self.day, duration)]
+            )
+
+    def test_endpoint_returns_every_barber_and_day(self):
+        self.make_appointment(time(9, 0), time(9, 30))
+        ScheduleException.objects.create(barber=self.barber, date=self.day + timedelta(days=7))
+
+        response = self.api.get('/api/availability/', {
+            'start_date': self.day.isoformat(),
+            'end_date': (self.day + timedelta(days=7)).isoformat(),
+            'service': self.service.id,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['duration'], 30)
+        days = response.data['barbers'][0]['days']
+        self.assertEqual(len(days), 8)
+        self.assertEqual(days[self.day.isoformat()][0], '09:30')
+        self.assertEqual(days[(self.day + timedelta(days=1)).isoformat()], [])
+        self.assertEqual(days[(self.day + timedelta(days=7)).isoformat()], [])
+
+    def test_endpoint_query_count_is_constant(self):
+        for index in range(5):
+            barber = User.objects.create_user(username=f'barber{index}', role='barber')
+            for day_of_week in range(7):
+                Schedule.objects.create(
+                    barber=barber, day_of_week=day_of_week,
+                    start_time=time(8, 0), end_time=time(20, 0), interval_minutes=15
+                )
+        with self.assertNumQueries(6):
+            response = self.api.get('/api/availability/', {
+                'start_date': self.day.isoformat(),
+                'end_date': (self.day + timedelta(days=13)).isoformat(),
+                'service': self.service.id,
+            })
+        self.assertEqual(len(response.data['barbers']), 6)
+
+    def test_endpoint_rejects_invalid_parameters(self):
+        response = self.api.get('/api/availability/', {'start_date': 'mañana', 'service': self.service.id})
+        self.assertEqual(response.status_code, 400)
+        response = self.api.get('/api/availability/', {'start_date': self.day.isoformat()})
+        self.assertEqual(response.status_code, 400)
+
+
+class SlotCacheTests(BarbershopTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+        self.params = {'start_date': self.day.isoformat(), 'service': self.service.id}
+
+    def test_lru_eviction_and_ttl(self):
+        cache = SlotCache(max_entries=2, timeout=60)
+        cache.set((1, self.day, 1800), ('09:00',))
+        cache.set((2, self.day, 1800), ('10:00',))
+        cache.get((1, self.day, 1800))
+        cache.set((3, self.day, 1800), ('11:00',))
+        self.assertIsNone(cache.get((2, self.day, 1800)))
+        self.assertEqual(cache.get((1, self.day, 1800)), ('09:00',))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        cache.timeout = 0
+        cache.set((4, self.day, 1800), ('12:00',))
+        self.assertIsNone(cache.get((4, self.day, 1800)))
+
+    def test_availability_reads_through_cache(self):
+        self.api.get('/api/availability/', self.params)
+        hits = slot_cache.stats()['hits']
+        with self.assertNumQueries(2):
+            response = self.api.get('/api/availability/', self.params)
+        self.assertEqual(response.data['barbers'][0]['days'][self.day.isoformat()][0], '09:00')
+        self.assertEqual(slot_cache.stats()['hits'], hits + 1)
+
+    def test_booking_invalidates_only_that_day(self):
+        other_day = self.day + timedelta(days=7)
+        self.api.get('/api/availability/', {**self.params, 'end_date': other_day.isoformat()})
+
+        self.make_appointment(time(9, 0), time(9, 30))
+
+        self.assertIsNone(slot_cache.get((self.barber.id, self.day, 1800)))
+        self.assertIsNotNone(slot_cache.get((self.barber.id, other_day, 1800)))
+        response = self.api.get('/api/availability/', self.params)
+        self.assertEqual(response.data['barbers'][0]['days'][self.day.isoformat()][0], '09:30')
+
+    def test_moving_appointment_invalidates_old_and_new_day(self):
+        other_day = self.day + timedelta(days=7)
+        appointment = self.make_appointment(time(9, 0), time(9, 30))
+        self.api.get('/api/availability/', {**self.params, 'end_date': other_day.isoformat()})
+
+        appointment = Appointment.objects.get(id=appointment.id)
+        appointment.date = other_day
+        appointment.save()
+
+        self.assertIsNone(slot_cache.get((self.barber.id, self.day, 1800)))
+        self.assertIsNone(slot_cache.get((self.barber.id, other_day, 1800)))
+
+    def test_schedule_change_invalidates_barber(self):
+        self.api.get('/api/schedules/', {'date': self.day.isoformat()})
+        self.assertIsNotNone(slot_cache.get((self.barber.id, self.day, 1800)))
+
+        self.schedule.start_time = time(10, 0)
+        self.schedule.save()
+
+        self.assertIsNone(slot_cache.get((self.barber.id, self.day, 1800)))
+        response = self.api.get('/api/schedules/', {'date': self.day.isoformat()})
+        self.assertEqual(response.data['results'][0]['available_slots'][0], '10:00')
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.assertEqual(self.api.get('/api/cache/stats/').status_code, 403)
+        self.api.force_authenticate(self.admin)
+        response = self.api.get('/api/cache/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hit_ratio', response.data['availability'])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTests(BarbershopTestMixin, TestCase):
+    """
+    Presupuesto de consultas por endpoint: el número de consultas no debe
+    crecer con la cantidad de filas listadas
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.password_user = User.objects.create_user(username='maria', password='cliente2024')
+        barbers = [cls.barber] + [
+            User.objects.create_user(username=f'barbero{index}', role='barber', first_name=f'B{index}')
+            for index in range(3)
+        ]
+        clients = [cls.client_user] + [
+            User.objects.create_user(username=f'cliente{index}', first_name=f'C{index}')
+            for index in range(3)
+        ]
+        services = [cls.service] + [
+            Service.objects.create(
+                name=f'Servicio {index}', description='', price='10000.00',
+                duration=timedelta(minutes=30)
+            )
+            for index in range(3)
+        ]
+        today = date.today()
+        for index in range(12):
+            Appointment.objects.create(
+                client=clients[index % 4], barber=barbers[index % 4], service=services[index % 4],
+                date=today + timedelta(days=index % 3), start_time=time(9 + index, 0),
+                end_time=time(9 + index, 30), status='pending' if index % 2 else 'confirmed'
+            )
+        for barber in barbers[1:]:
+            Schedule.objects.create(
+                barber=barber, day_of_week=2, start_time=time(9, 0), end_time=time(17, 0)
+            )
+            ScheduleException.objects.create(barber=barber, date=today + timedelta(days=3))
+        cls.appointment = Appointment.objects.filter(status='pending').first()
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def assertBudget(self, queries, method, url, data=None, status_code=200):
+        with self.assertNumQueries(queries):
+            response = getattr(self.api, method)(url, data, format='json')
+        self.assertEqual(response.status_code, status_code, response.data)
+        return response
+
+    def test_auth_endpoints(self):
+        self.api.force_authenticate(None)
+        # Login: usuario + registro del refresh token emitido (OutstandingToken)
+        tokens = self.assertBudget(2, 'post', '/api/auth/login/', {
+            'username': 'maria', 'password': 'cliente2024'
+        }).data
+        # Refresh: carga inicial de la lista negra + rotación (token emitido
+        # y alta en la lista negra en un savepoint); la comprobación de
+        # revocación no consulta la tabla
+        self.assertBudget(5, 'post', '/api/auth/login/refresh/', {'refresh': tokens['refresh']})
+        self.assertBudget(2, 'post', '/api/auth/register/', {
+            'username': 'nuevo', 'password': 'cliente2024'
+        }, status_code=201)
+
+        self.api.force_authenticate(self.client_user)
+        self.assertBudget(0, 'get', '/api/auth/profile/')
+        self.assertBudget(1, 'put', '/api/auth/profile/update/', {'first_name': 'Pedro José'})
+
+    def test_availability_endpoints(self):
+        self.assertBudget(6, 'get', '/api/availability/', {
+            'start_date': self.day.isoformat(),
+            'end_date': (self.day + timedelta(days=13)).isoformat(),
+            'service': self.service.id,
+        })
+        self.assertBudget(0, 'get', '/api/cache/stats/')
+
+    def test_service_endpoints(self):
+        # Incluye la lectura de la versión del recurso (ETag)
+        self.assertBudget(3, 'get', '/api/services/')
+        self.assertBudget(2, 'get', f'/api/services/{self.service.id}/')
+        self.assertBudget(3, 'patch', f'/api/services/{self.service.id}/toggle_active/')
+
+    def test_barber_list_endpoints(self):
+        self.assertBudget(4, 'get', '/api/barbers/')
+        response = self.assertBudget(6, 'get', '/api/barbers/', {'date': self.day.isoformat()})
+        self.assertBudget(3, 'get', '/api/barbers/', {'date': self.day.isoformat()})
+
+        nested = {
+            schedule['id']: schedule['available_slots']
+            for barber in response.data['results'] for schedule in barber['schedules']
+        }
+        for schedule in Schedule.objects.all():
+            self.assertEqual(
+                nested[schedule.id],
+                [slot.strftime('%H:%M') for slot in schedule.get_available_slots(self.day)]
+            )
+
+    def test_schedule_list_with_date(self):
+        self.assertBudget(5, 'get', '/api/schedules/', {'date': self.day.isoformat(), 'duration': 45})
+        self.assertBudget(5, 'get', f'/api/barbers/{self.barber.id}/schedules/', {
+            'date': (self.day + timedelta(days=7)).isoformat()
+        })
+
+    def test_barber_detail_endpoints(self):
+        self.assertBudget(3, 'get', f'/api/barbers/{self.barber.id}/')
+        self.assertBudget(2, 'get', f'/api/barbers/{self.barber.id}/schedules/')
+        self.assertBudget(5, 'put', f'/api/barbers/{self.barber.id}/schedule/', {
+            'schedule_id': self.schedule.id, 'interval_minutes': 20
+        })
+
+    def test_schedule_endpoints(self):
+        self.assertBudget(3, 'get', '/api/schedules/')
+        self.assertBudget(2, 'get', f'/api/schedules/{self.schedule.id}/')
+        self.assertBudget(3, 'get', '/api/schedules/', {'barber': self.barber.id})
+
+    def test_schedule_exception_endpoints(self):
+        # Paginación por cursor: sin COUNT(*)
+        self.assertBudget(1, 'get', '/api/schedule-exceptions/')
+        self.assertBudget(1, 'get', '/api/schedule-exceptions/upcoming/')
+
+    def test_appointment_list_endpoints(self):
+        self.assertBudget(1, 'get', '/api/appointments/')
+        self.assertBudget(1, 'get', '/api/appointments/upcoming/')
+        self.assertBudget(1, 'get', '/api/appointments/today/')
+        self.assertBudget(1, 'get', f'/api/appointments/{self.appointment.id}/')
+
+        self.api.force_authenticate(self.barber)
+        self.assertBudget(1, 'get', '/api/appointments/')
+        self.assertBudget(1, 'get', '/api/appointments/upcoming/')
+
+    def test_appointment_write_endpoints(self):
+        self.api.force_authenticate(self.client_user)
+        # Incluye la fila guardia, el bloqueo, el SAVEPOINT de la transacción
+        # anidada y el resumen diario (primera cita del día: UPDATE, INSERT y UPDATE)
+        self.assertBudget(17, 'post', '/api/appointments/', {
+            'client': self.client_user.id, 'barber': self.barber.id, 'service': self.service.id,
+            'date': self.day.isoformat(), 'start_time': '09:00'
+        }, status_code=201)
+
+        self.api.force_authenticate(self.admin)
+        # Cita, SAVEPOINT y RELEASE de la transacción, bloqueo de la cita
+        # (en SQLite, UPDATE y relectura) y UPDATE del resumen diario
+        self.assertBudget(7, 'patch', f'/api/appointments/{self.appointment.id}/change_status/', {
+            'status': 'confirmed'
+        })
+        self.assertBudget(3, 'delete', f'/api/appointments/{self.appointment.id}/', status_code=204)
+
+
+class ExplainBookingQueriesCommandTests(TestCase):
+
+    def test_reports_plans_and_discards_data(self):
+        out = StringIO()
+        call_command('explain_booking_queries', barbers=2, clients=3, days=7, repeat=2, stdout=out)
+        self.assertIn('appt_barber_date_idx', out.getvalue())
+        self.assertFalse(Appointment.objects.exists())
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """
+    Muchas reservas simultáneas del mismo slot: exactamente una debe ganar.
+
+    Necesita una base de pruebas que acepte varias conexiones (MySQL o
+    SQLite en archivo con DATABASES['default']['TEST']['NAME']).
+    """
+    threads = 200
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('SQLite en memoria no admite conexiones concurrentes')
+        slot_cache.clear()
+        self.barber = User.objects.create_user(username='carlos', role='barber')
+        self.other_barber = User.objects.create_user(username='juan', role='barber')
+        self.clients = [
+            User.objects.create_user(username=f'cliente{index}') for index in range(self.threads)
+        ]
+        self.service = Service.objects.create(
+            name='Corte', description='', price='20000.00', duration=timedelta(minutes=30)
+        )
+        self.day = next_weekday(5)
+        for barber in (self.barber, self.other_barber):
+            Schedule.objects.create(
+                barber=barber, day_of_week=5, start_time=time(9, 0), end_time=time(18, 0)
+            )
+
+    def book_concurrently(self, requests):
+        barrier = threading.Barrier(len(requests))
+        results = [None] * len(requests)
+
+        def book(index, client, barber, start_time):
+            api = APIClient()
+            api.force_authenticate(client)
+            try:
+                barrier.wait()
+                response = api.post('/api/appointments/', {
+                    'client': client.id, 'barber': barber.id, 'service': self.service.id,
+                    'date': self.day.isoformat(), 'start_time': start_time,
+                }, format='json')
+                results[index] = response.status_code
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=book, args=(index, *request))
+            for index, request in enumerate(requests)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return results
+
+    def test_exactly_one_booking_wins_the_same_slot(self):
+        results = self.book_concurrently([
+            (client, self.barber, '10:00') for client in self.clients
+        ])
+
+        self.assertEqual(results.count(201), 1)
+        self.assertEqual(results.count(400), self.threads - 1)
+        self.assertEqual(Appointment.objects.filter(barber=self.barber, date=self.day).count(), 1)
+
+    def test_different_barbers_and_slots_all_succeed(self):
+        results = self.book_concurrently([
+            (self.clients[0], self.barber, '10:00'),
+            (self.clients[1], self.other_barber, '10:00'),
+            (self.clients[2], self.barber, '11:00'),
+        ])
+        self.assertEqual(results, [201, 201, 201])
+
+
+class ConcurrentStatusChangeTests(TransactionTestCase):
+    """
+    Cambios de estado simultáneos de la misma cita: cada uno se valida contra
+    el estado bloqueado y el resumen diario coincide con las citas.
+
+    Igual que ``ConcurrentBookingTests``, necesita una base de pruebas que
+    acepte varias conexiones.
+    """
+    threads = 20
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('SQLite en memoria no admite conexiones concurrentes')
+        slot_cache.clear()
+        self.admin = User.objects.create_user(username='admin', role='admin', is_staff=True)
+        barber = User.objects.create_user(username='carlos', role='barber')
+        client = User.objects.create_user(username='pedro')
+        service = Service.objects.create(
+            name='Corte', description='', price='20000.00', duration=timedelta(minutes=30)
+        )
+        self.day = next_weekday(5)
+        self.appointments = [
+            Appointment.objects.create(
+                client=client, barber=barber, service=service, date=self.day,
+                start_time=start, end_time=end
+            )
+            for start, end in ((time(10, 0), time(10, 30)), (time(11, 0), time(11, 30)))
+        ]
+
+    def change_concurrently(self, requests):
+        barrier = threading.Barrier(len(requests))
+        results = [None] * len(requests)
+
+        def change(index, appointment, new_status):
+            api = APIClient()
+            api.force_authenticate(self.admin)
+            try:
+                barrier.wait()
+                response = api.patch(
+                    f'/api/appointments/{appointment.id}/change_status/', {'status': new_status}, format='json'
+                )
+                results[index] = response.status_code
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=change, args=(index, *request))
+            for index, request in enumerate(requests)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return results
+
+    def test_only_one_transition_from_the_same_status_wins(self):
+        appointment = self.appointments[0]
+        results = self.change_concurrently([(appointment, 'cancelled')] * self.threads)
+
+        self.assertEqual(results.count(200), 1)
+        self.assertEqual(results.count(400), self.threads - 1)
+        stats = DailyBarberStats.objects.get(barber=appointment.barber_id, date=self.day)
+        self.assertEqual((stats.bookings, stats.pending, stats.cancellations), (2, 1, 1))
+
+    def test_rollup_matches_appointments_after_concurrent_transitions(self):
+        requests = [
+            (appointment, new_status)
+            for appointment in self.appointments
+            for new_status in ('confirmed', 'cancelled', 'completed')
+        ] * 3
+        results = self.change_concurrently(requests)
+
+        self.assertNotIn(500, results)
+        fresh = {
+            (row.barber_id, row.date): tuple(getattr(row, field) for field in DailyBarberStats.COUNTERS)
+            for row in DailyBarberStats.aggregate_appointments(Appointment.objects.all())
+        }
+        stored = {
+            (row.barber_id, row.date): tuple(getattr(row, field) for field in DailyBarberStats.COUNTERS)
+            for row in DailyBarberStats.objects.all()
+        }
+        self.assertEqual(stored, fresh)
+
+
+class SlotHoldTests(BarbershopTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_client = User.objects.create_user(username='maria', role='client')
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def hold(self, start_time='10:00', **data):
+        return self.api.post('/api/appointments/hold/', {
+            'barber': self.barber.id, 'service': self.service.id,
+            'date': self.day.isoformat(), 'start_time': start_time, **data
+        }, format='json')
+
+    def book(self, start_time='10:00', **data):
+        return self.api.post('/api/appointments/', {
+            'client': self.client_user.id, 'barber': self.barber.id, 'service': self.service.id,
+            'date': self.day.isoformat(), 'start_time': start_time, **data
+        }, format='json')
+
+    def test_hold_blocks_slot_for_other_clients(self):
+        response = self.hold()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['end_time'], '10:30:00')
+
+        self.assertNotIn(time(10, 0), self.schedule.get_available_slots(self.day))
+        availability = self.api.get('/api/availability/', {
+            'start_date': self.day.isoformat(), 'service': self.service.id
+        })
+        self.assertNotIn('10:00', availability.data['barbers'][0]['days'][self.day.isoformat()])
+
+        self.api.force_authenticate(self.other_client)
+        self.assertEqual(self.hold().status_code, 400)
+        self.assertEqual(self.book().status_code, 400)
+
+    def test_hold_converts_into_appointment(self):
+        hold_id = self.hold().data['id']
+
+        response = self.book(hold=hold_id)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(SlotHold.objects.exists())
+        self.assertEqual(Appointment.objects.get().start_time, time(10, 0))
+
+    def test_hold_of_another_client_cannot_be_converted(self):
+        hold_id = self.hold().data['id']
+        self.api.force_authenticate(self.other_client)
+        self.assertEqual(self.book(hold=hold_id).status_code, 400)
+
+    def test_expired_hold_is_ignored(self):
+        self.hold(duration=45)
+        SlotHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        slot_cache.clear()
+
+        self.assertIn(time(10, 0), self.schedule.get_available_slots(self.day))
+        self.api.force_authenticate(self.other_client)
+        self.assertEqual(self.book().status_code, 201)
+
+    def test_new_hold_releases_previous_one(self):
+        self.hold('10:00')
+        self.hold('11:00')
+        self.assertEqual(list(SlotHold.objects.values_list('start_time', flat=True)), [time(11, 0)])
+
+    def test_purge_removes_only_expired_holds(self):
+        self.hold()
+        SlotHold.objects.create(
+            barber=self.barber, client=self.other_client, date=self.day,
+            start_time=time(11, 0), end_time=time(11, 30),
+            expires_at=timezone.now() - timedelta(hours=1)
+        )
+        call_command('purge_expired_holds', stdout=StringIO())
+        self.assertEqual(SlotHold.objects.count(), 1)
+
+
+class BulkBookingTests(BarbershopTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def bulk(self, **data):
+        return self.api.post('/api/appointments/bulk/', {
+            'barber': self.barber.id, 'service': self.service.id, **data
+        }, format='json')
+
+    def test_recurrence_books_every_other_week(self):
+        response = self.bulk(recurrence={
+            'start_date': self.day.isoformat(), 'start_time': '10:00',
+            'interval_days': 14, 'count': 6
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['conflicts'], [])
+        self.assertEqual(
+            list(Appointment.objects.order_by('date').values_list('date', flat=True)),
+            [self.day + timedelta(days=14 * index) for index in range(6)]
+        )
+        self.assertTrue(all(item['id'] for item in response.data['created']))
+
+    def test_conflicts_are_reported_per_occurrence(self):
+        self.make_appointment(time(10, 0), time(10, 30), day=self.day + timedelta(days=7))
+        ScheduleException.objects.create(barber=self.barber, date=self.day + timedelta(days=14))
+
+        response = self.bulk(recurrence={
+            'start_date': self.day.isoformat(), 'start_time': '10:00', 'until': (self.day + timedelta(days=21)).isoformat()
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['created']), 2)
+        self.assertEqual(
+            [(conflict['date'], conflict['detail']) for conflict in response.data['conflicts']],
+            [(self.day + timedelta(days=7), 'Ya existe una cita en este horario'),
+             (self.day + timedelta(days=14), 'El barbero no está disponible en esta fecha')]
+        )
+
+    def test_explicit_slots_are_checked_against_each_other(self):
+        response = self.bulk(slots=[
+            {'date': self.day.isoformat(), 'start_time': '10:00'},
+            {'date': self.day.isoformat(), 'start_time': '10:15'},
+            {'date': self.day.isoformat(), 'start_time': '12:00'},
+        ])
+
+        self.assertEqual(len(response.data['created']), 1)
+        self.assertEqual(len(response.data['conflicts']), 2)
+
+    def test_all_or_none_creates_nothing_on_conflict(self):
+        self.make_appointment(time(10, 0), time(10, 30), day=self.day + timedelta(days=7))
+        response = self.bulk(all_or_none=True, recurrence={
+            'start_date': self.day.isoformat(), 'start_time': '10:00', 'count': 3
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_query_count_does_not_depend_on_occurrences(self):
+        for count in (2, 12):
+            Appointment.objects.all().delete()
+            with self.assertNumQueries(13):
+                response = self.bulk(recurrence={
+                    'start_date': self.day.isoformat(), 'start_time': '15:00', 'count': count
+                })
+            self.assertEqual(len(response.data['created']), count)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.bulk().status_code, 400)
+        self.assertEqual(self.bulk(recurrence={
+            'start_date': self.day.isoformat(), 'start_time': '10:00'
+        }).status_code, 400)
+        self.assertEqual(self.bulk(recurrence={
+            'start_date': self.day.isoformat(), 'start_time': '10:00', 'count': 53
+        }).status_code, 400)
+        response = self.bulk(recurrence={
+            'start_date': self.day.isoformat(), 'start_time': '10:00',
+            'until': (self.day - timedelta(days=1)).isoformat()
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('until', response.data['recurrence'])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class WeeklyScheduleTests(BarbershopTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        self.second_barber = User.objects.create_user(
+            username='luis', password='barbero2024', role='barber'
+        )
+
+    def put_week(self, barbers, days, **data):
+        return self.api.put('/api/barbers/weekly-schedule/', {
+            'barbers': barbers, 'days': days, **data
+        }, format='json')
+
+    def week(self, *days, **values):
+        return [
+            {'day_of_week': day, 'start_time': '09:00', 'end_time': '17:00', **values}
+            for day in days
+        ]
+
+    def test_template_is_diffed_against_existing_rows(self):
+        response = self.put_week(
+            [self.barber.id, self.second_barber.id],
+            self.week(0, 1, 2) + [{'day_of_week': 3, 'start_time': '09:00', 'end_time': '18:00',
+                                   'break_start_time': '12:00', 'break_end_time': '13:00'}]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['deleted']), (7, 1, 0))
+        self.assertEqual(len(response.data['schedules']), 8)
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.end_time, time(17, 0))
+        self.assertIsNone(self.schedule.break_start_time)
+
+        response = self.put_week([self.barber.id], self.week(0, 1, 2))
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['deleted']), (0, 0, 1))
+        self.assertEqual(Schedule.objects.filter(barber=self.second_barber).count(), 4)
+
+    def test_replace_false_keeps_missing_days(self):
+        response = self.put_week([self.barber.id], self.week(4), replace=False)
+        self.assertEqual((response.data['created'], response.data['deleted']), (1, 0))
+        self.assertEqual(Schedule.objects.filter(barber=self.barber).count(), 2)
+
+    def test_only_deletions_add_queries_per_row(self):
+        for count in (1, 10):
+            barbers = [
+                User.objects.create_user(username=f'b{count}-{index}', password='x', role='barber').id
+                for index in range(count)
+            ]
+            self.put_week(barbers, self.week(0, 1, 2, 3, 4))
+            # Altas y cambios son masivos; delete() envía post_delete por
+            # cada baja, que incrementa la versión de los horarios
+            with self.assertNumQueries(10 + count):
+                response = self.put_week(barbers, self.week(0, 1, 2, 3, 5, interval_minutes=45))
+            self.assertEqual(
+                (response.data['created'], response.data['updated'], response.data['deleted']),
+                (count, 4 * count, count)
+            )
+
+    def test_cached_slots_are_invalidated(self):
+        self.api.get(f'/api/barbers/{self.barber.id}/schedules/', {'date': self.day.isoformat()})
+        self.put_week([self.barber.id], self.week(2, interval_minutes=60))
+        response = self.api.get(f'/api/barbers/{self.barber.id}/schedules/', {'date': self.day.isoformat()})
+        self.assertEqual(response.data[0]['available_slots'][1], '10:00')
+
+    def test_invalid_templates(self):
+        self.assertEqual(self.put_week([self.barber.id], self.week(1, 1)).status_code, 400)
+        self.assertEqual(self.put_week([self.client_user.id], self.week(1)).status_code, 400)
+        self.assertEqual(self.put_week([self.barber.id], [
+            {'day_of_week': 1, 'start_time': '18:00', 'end_time': '09:00'}
+        ]).status_code, 400)
+        self.assertEqual(Schedule.objects.count(), 1)
+
+        self.api.force_authenticate(self.client_user)
+        self.assertEqual(self.put_week([self.barber.id], self.week(1)).status_code, 403)
+
+
+class KeysetPaginationTests(BarbershopTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Varias citas comparten fecha y hora para ejercitar el desempate por id
+        cls.appointments = [
+            Appointment.objects.create(
+                client=cls.client_user, barber=cls.barber, service=cls.service,
+                date=timezone.localdate() + timedelta(days=index // 4),
+                start_time=time(9 + index % 2, 0), end_time=time(9 + index % 2, 30)
+            )
+            for index in range(25)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def walk(self, url, link='next'):
+        ids, pages = [], 0
+        while url:
+            response = self.api.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data[link]
+            pages += 1
+        return ids, pages
+
+    def test_list_pages_cover_every_row_in_order(self):
+        expected = list(
+            Appointment.objects.order_by('-date', '-start_time', '-id').values_list('id', flat=True)
+        )
+        ids, pages = self.walk('/api/appointments/')
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_previous_link_walks_back(self):
+        first = self.api.get('/api/appointments/', {'page_size': 7})
+        second = self.api.get(first.data['next'])
+        self.assertIsNone(first.data['previous'])
+
+        back = self.api.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNone(back.data['previous'])
+        self.assertIsNotNone(back.data['next'])
+
+    def test_deep_pages_cost_one_query(self):
+        response = self.api.get('/api/appointments/', {'page_size': 2})
+        for _ in range(8):
+            response = self.api.get(response.data['next'])
+        with self.assertNumQueries(1):
+            self.api.get(response.data['next'])
+
+    def test_upcoming_is_chronological_and_paginated(self):
+        ids, pages = self.walk('/api/appointments/upcoming/?page_size=10')
+        expected = list(
+            Appointment.objects.order_by('date', 'start_time', 'id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+        response = self.api.get('/api/appointments/today/')
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_invalid_cursor(self):
+        response = self.api.get('/api/appointments/', {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class AppointmentExportTests(BarbershopTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_barber = User.objects.create_user(
+            username='luis', password='barbero2024', role='barber', first_name='Luis'
+        )
+        for index in range(7):
+            Appointment.objects.create(
+                client=cls.client_user, barber=cls.barber if index % 2 else cls.other_barber,
+                service=cls.service, date=cls.day + timedelta(days=index // 3),
+                start_time=time(9, 0), end_time=time(9, 30), notes=f'nota, "{index}"'
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def export(self, **params):
+        response = self.api.get('/api/appointments/export/', params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        response, content = self.export(fmt='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('citas.csv', response['Content-Disposition'])
+
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(rows[0][:3], ['id', 'client', 'client_name'])
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(rows[1][2], 'Pedro Gómez')
+        self.assertEqual(rows[1][rows[0].index('notes')], 'nota, "0"')
+        self.assertEqual(rows[1][rows[0].index('date')], self.day.isoformat())
+
+    def test_ndjson_export_is_batched_by_key(self):
+        # 7 filas en lotes de 3: 3 + 3 + 1
+        with self.assertNumQueries(3):
+            rows = list(iter_export_rows(Appointment.objects.all(), batch_size=3))
+        self.assertEqual([row[0] for row in rows], list(
+            Appointment.objects.order_by('date', 'start_time', 'id').values_list('id', flat=True)
+        ))
+
+        response, content = self.export(fmt='ndjson', start_date=(self.day + timedelta(days=1)).isoformat())
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[0]['service_price'], '20000.00')
+        self.assertEqual(records[0]['start_time'], '09:00:00')
+
+    def test_export_scope(self):
+        self.api.force_authenticate(self.barber)
+        _, content = self.export(fmt='ndjson')
+        self.assertEqual(len(content.splitlines()), 3)
+
+        self.api.force_authenticate(self.client_user)
+        self.assertEqual(self.api.get('/api/appointments/export/').status_code, 403)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.api.get('/api/appointments/export/', {'fmt': 'xml'}).status_code, 400)
+        self.assertEqual(self.api.get('/api/appointments/export/', {'start_date': '2024-13-01'}).status_code, 400)
+
+
+class ReportTests(BarbershopTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.beard = Service.objects.create(
+            name='Barba', description='Arreglo de barba',
+            price='10000.00', duration=timedelta(minutes=15)
+        )
+        cls.past = cls.day - timedelta(days=7)
+        for start, status, service in [
+            (time(9, 0), 'completed', cls.service),
+            (time(10, 0), 'completed', cls.beard),
+            (time(11, 0), 'cancelled', cls.service),
+            (time(14, 0), 'confirmed', cls.service),
+        ]:
+            Appointment.objects.create(
+                client=cls.client_user, barber=cls.barber, service=service, date=cls.past,
+                start_time=start, end_time=time(start.hour, 30), status=status
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        self.params = {'start_date': self.past.isoformat(), 'end_date': self.day.isoformat()}
+
+    def test_revenue_by_barber_service_and_day(self):
+        response = self.api.get('/api/reports/revenue/', self.params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_revenue'], Decimal('30000.00'))
+        row = response.data['results'][0]
+        self.assertEqual((row['barber'], row['label']), (self.barber.id, 'Carlos Pérez'))
+        self.assertEqual((row['expected_revenue'], row['completed'], row['share']), (Decimal('20000.00'), 2, 1.0))
+
+        response = self.api.get('/api/reports/revenue/', {**self.params, 'group_by': 'service'})
+        self.assertEqual(
+            [(row['label'], row['revenue'], row['share']) for row in response.data['results']],
+            [('Corte', Decimal('20000.00'), 0.6667), ('Barba', Decimal('10000.00'), 0.3333)]
+        )
+
+        response = self.api.get('/api/reports/revenue/', {**self.params, 'group_by': 'day'})
+        self.assertEqual([row['date'] for row in response.data['results']], [self.past])
+
+    def test_status_ratios(self):
+        response = self.api.get('/api/reports/status/', self.params)
+        row = response.data['results'][0]
+        self.assertEqual((row['total'], row['completed'], row['cancelled'], row['confirmed']), (4, 2, 1, 1))
+        self.assertEqual((row['completion_rate'], row['cancellation_rate']), (0.6667, 0.25))
+
+    def test_utilization_subtracts_breaks_and_exceptions(self):
+        params = {'start_date': self.past.isoformat(), 'end_date': (self.day + timedelta(days=6)).isoformat()}
+        # Dos miércoles de 8 horas laborales (9-18 menos el descanso de 12-13)
+        response = self.api.get('/api/reports/utilization/', params)
+        row = response.data['results'][0]
+        self.assertEqual((row['scheduled_minutes'], row['booked_minutes']), (960, 75))
+        self.assertEqual(row['utilization'], round(75 / 960, 4))
+
+        ScheduleException.objects.create(barber=self.barber, date=self.day)
+        response = self.api.get('/api/reports/utilization/', params)
+        self.assertEqual(response.data['scheduled_minutes'], 480)
+        self.assertEqual(response.data['utilization'], round(75 / 480, 4))
+
+    def test_query_count_does_not_depend_on_rows(self):
+        with self.assertNumQueries(1):
+            self.api.get('/api/reports/revenue/', self.params)
+        # Barberos, horarios, excepciones y minutos reservados
+        with self.assertNumQueries(4):
+            self.api.get('/api/reports/utilization/', self.params)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.api.get('/api/reports/revenue/', {'group_by': 'mes'}).status_code, 400)
+        self.assertEqual(self.api.get('/api/reports/status/', {'start_date': '2024-01-01', 'end_date': '2025-06-01'}).status_code, 400)
+        self.assertEqual(self.api.get('/api/reports/utilization/', {'barber': 'x'}).status_code, 400)
+
+        self.api.force_authenticate(self.barber)
+        self.assertEqual(self.api.get('/api/reports/revenue/').status_code, 403)
+
+
+class DailyBarberStatsTests(BarbershopTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+
+    def stats(self, day=None):
+        return DailyBarberStats.objects.get(barber=self.barber, date=day or self.day)
+
+    def assertMatchesAppointments(self):
+        fresh = {
+            (row.barber_id, row.date): tuple(getattr(row, field) for field in DailyBarberStats.COUNTERS)
+            for row in DailyBarberStats.aggregate_appointments(Appointment.objects.all())
+        }
+        stored = {
+            (row.barber_id, row.date): tuple(getattr(row, field) for field in DailyBarberStats.COUNTERS)
+            for row in DailyBarberStats.objects.filter(bookings__gt=0)
+        }
+        self.assertEqual(stored, fresh)
+
+    def test_counters_follow_create_status_changes_and_delete(self):
+        self.api.force_authenticate(self.client_user)
+        response = self.api.post('/api/appointments/', {
+            'client': self.client_user.id, 'barber': self.barber.id, 'service': self.service.id,
+            'date': self.day.isoformat(), 'start_time': '10:00'
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        appointment_id = response.data['id']
+        other = self.make_appointment(time(11, 0), time(11, 30))
+        stats = self.stats()
+        self.assertEqual((stats.bookings, stats.pending, stats.booked_minutes), (2, 2, 60))
+        self.assertEqual(stats.expected_revenue, Decimal('40000.00'))
+
+        self.api.force_authenticate(self.admin)
+        for new_status in ('confirmed', 'completed'):
+            self.api.patch(f'/api/appointments/{appointment_id}/change_status/', {'status': new_status}, format='json')
+        self.api.patch(f'/api/appointments/{other.id}/change_status/', {'status': 'cancelled'}, format='json')
+        stats = self.stats()
+        self.assertEqual(
+            (stats.bookings, stats.pending, stats.confirmed, stats.completions, stats.cancellations),
+            (2, 0, 0, 1, 1)
+        )
+        self.assertEqual((stats.revenue, stats.expected_revenue, stats.booked_minutes), (Decimal('20000.00'), 0, 30))
+
+        self.api.delete(f'/api/appointments/{other.id}/')
+        self.assertEqual((self.stats().bookings, self.stats().cancellations), (1, 0))
+        self.assertMatchesAppointments()
+
+    def test_moving_an_appointment_moves_its_counters(self):
+        appointment = self.make_appointment(time(10, 0), time(10, 30))
+        appointment = Appointment.objects.get(id=appointment.id)
+        appointment.date = self.day + timedelta(days=7)
+        appointment.save()
+        self.assertEqual(self.stats().bookings, 0)
+        self.assertEqual(self.stats(self.day + timedelta(days=7)).bookings, 1)
+        self.assertMatchesAppointments()
+
+    def test_bulk_booking_updates_rollup(self):
+        self.api.force_authenticate(self.client_user)
+        self.api.post('/api/appointments/bulk/', {
+            'barber': self.barber.id, 'service': self.service.id,
+            'slots': [
+                {'date': self.day.isoformat(), 'start_time': '10:00'},
+                {'date': self.day.isoformat(), 'start_time': '11:00'},
+                {'date': (self.day + timedelta(days=7)).isoformat(), 'start_time': '10:00'},
+            ]
+        }, format='json')
+        self.assertEqual(self.stats().bookings, 2)
+        self.assertMatchesAppointments()
+
+    def test_rebuild_command_repairs_drift(self):
+        self.make_appointment(time(10, 0), time(10, 30))
+        self.make_appointment(time(11, 0), time(11, 30), day=self.day + timedelta(days=7))
+        # update() no envía señales: el resumen queda desfasado
+        Appointment.objects.filter(start_time=time(10, 0)).update(status='completed')
+
+        out = StringIO()
+        call_command('rebuild_daily_stats', dry_run=True, stdout=out)
+        self.assertIn('1 días desfasados por corregir', out.getvalue())
+        self.assertEqual(self.stats().completions, 0)
+
+        call_command('rebuild_daily_stats', chunk_days=1, stdout=out)
+        self.assertEqual(self.stats().completions, 1)
+        self.assertMatchesAppointments()
+
+    def test_service_price_change_keeps_booked_price(self):
+        appointment = self.make_appointment(time(10, 0), time(10, 30))
+        Service.objects.filter(id=self.service.id).update(price='30000.00')
+
+        self.api.force_authenticate(self.admin)
+        for new_status in ('confirmed', 'completed'):
+            response = self.api.patch(
+                f'/api/appointments/{appointment.id}/change_status/', {'status': new_status}, format='json'
+            )
+            self.assertEqual(response.status_code, 200)
+        stats = self.stats()
+        self.assertEqual((stats.revenue, stats.expected_revenue), (Decimal('20000.00'), 0))
+
+        out = StringIO()
+        call_command('rebuild_daily_stats', dry_run=True, stdout=out)
+        self.assertIn('0 días desfasados', out.getvalue())
+        self.assertMatchesAppointments()
+
+    def test_api_export_and_reports_agree_after_price_change(self):
+        appointment = self.make_appointment(time(10, 0), time(10, 30), status='completed')
+        self.service.price, self.service.duration = Decimal('30000.00'), timedelta(minutes=60)
+        self.service.save()
+
+        self.api.force_authenticate(self.admin)
+        detail = self.api.get(f'/api/appointments/{appointment.id}/').data
+        self.assertEqual((detail['service_price'], detail['service_duration']), ('20000.00', '00:30:00'))
+        listed = self.api.get('/api/appointments/').data['results'][0]
+        self.assertEqual(listed['service_price'], '20000.00')
+
+        response = self.api.get('/api/appointments/export/', {'fmt': 'ndjson'})
+        exported = json.loads(b''.join(response.streaming_content).splitlines()[0])
+        self.assertEqual(Decimal(str(exported['service_price'])), Decimal('20000.00'))
+
+        response = self.api.get('/api/reports/revenue/', {
+            'start_date': self.day.isoformat(), 'end_date': self.day.isoformat()
+        })
+        self.assertEqual(response.data['total_revenue'], Decimal('20000.00'))
+
+    def test_service_duration_change_keeps_booked_minutes(self):
+        appointment = self.make_appointment(time(10, 0), time(10, 30))
+        Service.objects.filter(id=self.service.id).update(duration=timedelta(minutes=60))
+
+        self.api.force_authenticate(self.admin)
+        response = self.api.patch(
+            f'/api/appointments/{appointment.id}/change_status/', {'status': 'cancelled'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.stats().booked_minutes, self.stats().cancellations), (0, 1))
+        self.assertMatchesAppointments()
+
+    def test_deleting_a_barber_drops_its_rollup(self):
+        barber = User.objects.create_user(username='luis', password='barbero2024', role='barber')
+        self.make_appointment(time(10, 0), time(10, 30), barber=barber)
+        self.make_appointment(time(11, 0), time(11, 30), barber=barber, status='completed')
+        self.make_appointment(time(10, 0), time(10, 30))
+
+        self.api.force_authenticate(self.admin)
+        self.assertEqual(self.api.delete(f'/api/barbers/{barber.id}/').status_code, 204)
+        self.assertFalse(DailyBarberStats.objects.filter(barber_id=barber.id).exists())
+        self.assertEqual(self.stats().bookings, 1)
+        self.assertMatchesAppointments()
+
+
+class ConditionalGetTests(BarbershopTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def revalidate(self, url, response, **params):
+        return self.api.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_catalog_answers_304_with_one_query(self):
+        for url in ('/api/services/', '/api/barbers/', '/api/schedules/',
+                    f'/api/services/{self.service.id}/'):
+            response = self.api.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['ETag'].startswith('W/"'))
+            self.assertIn('Last-Modified', response)
+            with self.assertNumQueries(1):
+                cached = self.revalidate(url, response)
+            self.assertEqual(cached.status_code, 304)
+            self.assertEqual(cached['ETag'], response['ETag'])
+
+        response = self.api.get('/api/services/')
+        cached = self.api.get('/api/services/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_writes_in_the_same_second_change_the_etag_but_not_the_clock(self):
+        self.api.force_authenticate(self.admin)
+        first = self.api.get('/api/services/')
+        for _ in range(3):
+            self.api.patch(f'/api/services/{self.service.id}/toggle_active/')
+
+        response = self.api.get('/api/services/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        # Una ráfaga de escrituras no adelanta Last-Modified al momento de
+        # la respuesta (la cabecera Date la agrega el servidor)
+        self.assertLessEqual(parse_http_date(response['Last-Modified']), timezone.now().timestamp())
+
+    def test_writes_change_the_etag(self):
+        services = self.api.get('/api/services/')
+        barbers = self.api.get('/api/barbers/')
+        schedules = self.api.get('/api/schedules/')
+
+        self.api.force_authenticate(self.admin)
+        self.api.patch(f'/api/services/{self.service.id}/toggle_active/')
+        self.api.put('/api/barbers/weekly-schedule/', {
+            'barbers': [self.barber.id],
+            'days': [{'day_of_week': 2, 'start_time': '10:00', 'end_time': '18:00'}],
+        }, format='json')
+
+        self.api.force_authenticate(self.client_user)
+        self.assertEqual(self.revalidate('/api/services/', services).status_code, 200)
+        self.assertEqual(self.revalidate('/api/barbers/', barbers).status_code, 200)
+        self.assertEqual(self.revalidate('/api/schedules/', schedules).status_code, 200)
+
+        barbers = self.api.get('/api/barbers/')
+        self.barber.first_name = 'Carlos Andrés'
+        self.barber.save()
+        self.assertEqual(self.revalidate('/api/barbers/', barbers).status_code, 200)
+
+        barbers = self.api.get('/api/barbers/')
+        self.client_user.last_login = timezone.now()
+        self.client_user.save(update_fields=['last_login'])
+        self.assertEqual(self.revalidate('/api/barbers/', barbers).status_code, 304)
+
+    def test_etag_depends_on_user_scope(self):
+        client_etag = self.api.get('/api/services/')['ETag']
+        self.api.force_authenticate(self.admin)
+        response = self.api.get('/api/services/', HTTP_IF_NONE_MATCH=client_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], client_etag)
+
+    def test_slots_by_date_are_not_conditional(self):
+        response = self.api.get('/api/schedules/', {'date': self.day.isoformat()})
+        self.assertNotIn('ETag', response)
+
+
+class ResponseCacheTests(BarbershopTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def test_repeated_reads_skip_queryset_and_serializer(self):
+        hits = response_cache.hits
+        first = self.api.get('/api/barbers/')
+        # Solo la lectura de versiones
+        with self.assertNumQueries(1):
+            second = self.api.get('/api/barbers/')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(response_cache.hits - hits, 1)
+
+        with self.assertNumQueries(4):
+            self.api.get('/api/barbers/', {'page': 1})
+
+    def test_writes_invalidate_cached_responses(self):
+        self.api.get('/api/schedules/')
+        self.schedule.end_time = time(17, 0)
+        self.schedule.save()
+        response = self.api.get('/api/schedules/')
+        self.assertEqual(response.data['results'][0]['end_time'], '17:00:00')
+
+        Service.objects.create(name='Tinte', description='Color', price='50000.00', duration=timedelta(hours=1))
+        self.assertEqual(self.api.get('/api/services/').data['count'], 2)
+
+    def test_entries_are_scoped_by_role(self):
+        Service.objects.create(
+            name='Tinte', description='Color', price='50000.00',
+            duration=timedelta(hours=1), is_active=False
+        )
+        self.api.force_authenticate(self.admin)
+        self.assertEqual(self.api.get('/api/services/').data['count'], 2)
+        self.api.force_authenticate(self.client_user)
+        self.assertEqual(self.api.get('/api/services/').data['count'], 1)
+
+    def test_shared_file_backend_is_visible_to_other_workers(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'responses': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+        }):
+            self.api.get('/api/services/')
+            other_worker = ResponseCache()
+            keys = [name for name in os.listdir(location) if name.endswith('.djcache')]
+            self.assertEqual(len(keys), 1)
+            self.assertIn('FileBasedCache', other_worker.stats()['backend'])
+
+    def test_stats_endpoint(self):
+        self.api.force_authenticate(self.admin)
+        response = self.api.get('/api/cache/stats/')
+        self.assertIn('hit_ratio', response.data['responses'])
+        self.assertIn('LocMemCache', response.data['responses']['backend'])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CachedJWTAuthenticationTests(BarbershopTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        tokens = self.api.post('/api/auth/login/', {
+            'username': 'pedro', 'password': 'cliente2024'
+        }, format='json').data
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+    def test_user_is_loaded_once_per_ttl(self):
+        with self.assertNumQueries(1):
+            self.api.get('/api/auth/profile/')
+        with self.assertNumQueries(0):
+            response = self.api.get('/api/auth/profile/')
+        self.assertEqual(response.data['username'], 'pedro')
+
+    def test_profile_update_is_visible_on_next_request(self):
+        self.api.get('/api/auth/profile/')
+        self.api.put('/api/auth/profile/update/', {'first_name': 'Pedro José'}, format='json')
+        self.assertEqual(self.api.get('/api/auth/profile/').data['first_name'], 'Pedro José')
+
+    def test_deactivation_and_role_changes_invalidate(self):
+        self.api.get('/api/auth/profile/')
+        user = User.objects.get(id=self.client_user.id)
+        user.role = 'barber'
+        user.save()
+        self.assertEqual(self.api.get('/api/auth/profile/').data['role'], 'barber')
+
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.api.get('/api/auth/profile/').status_code, 401)
+
+    def test_writes_without_signals_apply_when_the_entry_expires(self):
+        self.api.get('/api/auth/profile/')
+        User.objects.filter(id=self.client_user.id).update(is_active=False)
+        self.assertEqual(self.api.get('/api/auth/profile/').status_code, 200)
+
+        # Vencer la entrada
+        values, _, version = user_cache._entries[self.client_user.id]
+        user_cache._entries[self.client_user.id] = (values, 0, version)
+        self.assertEqual(self.api.get('/api/auth/profile/').status_code, 401)
+
+    def test_invalidation_from_another_process_applies_on_next_request(self):
+        self.api.get('/api/auth/profile/')
+        User.objects.filter(id=self.client_user.id).update(is_active=False)
+        self.assertEqual(self.api.get('/api/auth/profile/').status_code, 200)
+
+        # Otro worker guarda el usuario: su propio UserCache cambia la
+        # versión en el caché compartido y este proceso descarta la entrada
+        UserCache(version_cache=user_cache.version_cache).invalidate(self.client_user.id)
+        self.assertIn(self.client_user.id, user_cache._entries)
+        self.assertEqual(self.api.get('/api/auth/profile/').status_code, 401)
+
+    def test_async_views_read_the_version_with_the_async_cache_api(self):
+        # La lectura síncrona del caché bloquearía el bucle de eventos (y
+        # con el backend 'db' fallaría con SynchronousOnlyOperation)
+        with mock.patch.object(UserCache, 'version', side_effect=AssertionError('lectura síncrona')):
+            self.assertEqual(self.api.get('/api/async/appointments/today/').status_code, 200)
+            hits = user_cache.hits
+            self.assertEqual(self.api.get('/api/async/appointments/today/').status_code, 200)
+            self.assertEqual(user_cache.hits, hits + 1)
+
+            User.objects.filter(id=self.client_user.id).update(is_active=False)
+            UserCache(version_cache=user_cache.version_cache).invalidate(self.client_user.id)
+            self.assertEqual(self.api.get('/api/async/appointments/today/').status_code, 401)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RefreshTokenRotationTests(BarbershopTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.refresh = self.api.post('/api/auth/login/', {
+            'username': 'pedro', 'password': 'cliente2024'
+        }, format='json').data['refresh']
+
+    def post_refresh(self, token):
+        return self.api.post('/api/auth/login/refresh/', {'refresh': token}, format='json')
+
+    def test_rotation_blacklists_the_used_token(self):
+        response = self.post_refresh(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], self.refresh)
+        self.assertEqual(
+            BlacklistedToken.objects.get().token.jti, RefreshToken(self.refresh, verify=False)['jti']
+        )
+
+        self.assertEqual(self.post_refresh(self.refresh).status_code, 401)
+        self.assertEqual(self.post_refresh(response.data['refresh']).status_code, 200)
+
+    def test_revocation_check_does_not_query_the_table(self):
+        rotated = self.post_refresh(self.refresh).data['refresh']
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.post_refresh(self.refresh).status_code, 401)
+            self.assertEqual(self.post_refresh(rotated).status_code, 200)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'SELECT 1 AS "a"' in query['sql'] and 'blacklistedtoken' in query['sql']
+        ])
+        self.assertEqual(revoked_tokens.stats()['rejections'], 1)
+
+    def test_tokens_revoked_elsewhere_are_rejected(self):
+        revoked_tokens.sync(full=True)
+        # Otro proceso rota el token y este aún no ha sincronizado: la
+        # comprobación en memoria lo acepta, pero la rotación lo rechaza
+        BaseRefreshToken(self.refresh).blacklist()
+        self.assertEqual(self.post_refresh(self.refresh).status_code, 401)
+
+        # Tras sincronizar se rechaza sin consultar la base de datos
+        other = self.api.post('/api/auth/login/', {
+            'username': 'pedro', 'password': 'cliente2024'
+        }, format='json').data['refresh']
+        BaseRefreshToken(other).blacklist()
+        revoked_tokens.sync()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post_refresh(other).status_code, 401)
+
+    def test_purge_expired_tokens(self):
+        self.post_refresh(self.refresh)
+        OutstandingToken.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        fresh = self.api.post('/api/auth/login/', {
+            'username': 'pedro', 'password': 'cliente2024'
+        }, format='json').data['refresh']
+
+        out = StringIO()
+        call_command('purge_expired_tokens', batch_size=1, stdout=out)
+        self.assertIn('1 tokens vencidos eliminados (1 en lista negra)', out.getvalue())
+        self.assertEqual(BlacklistedToken.objects.count(), 0)
+        self.assertEqual(OutstandingToken.objects.get().jti, RefreshToken(fresh)['jti'])
+
+
+class AsyncViewTests(BarbershopTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        today = timezone.localdate()
+        for index in range(3):
+            self.make_appointment(time(9 + index, 0), time(9 + index, 30), day=today)
+            self.make_appointment(time(9 + index, 0), time(9 + index, 30), day=today + timedelta(days=index + 1))
+        self.api = self.authenticated(self.client_user)
+
+    def authenticated(self, user):
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return api
+
+    def test_availability_matches_sync_view(self):
+        params = {
+            'start_date': self.day.isoformat(),
+            'end_date': (self.day + timedelta(days=7)).isoformat(),
+            'service': self.service.id,
+        }
+        response = self.api.get('/api/async/availability/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.api.get('/api/availability/', params).json())
+        self.assertEqual(len(response.json()['barbers'][0]['days'][self.day.isoformat()]), 16)
+
+    def test_availability_errors(self):
+        response = self.api.get('/api/async/availability/', {'start_date': 'x', 'service': self.service.id})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('YYYY-MM-DD', response.json()['detail'])
+        response = self.api.get('/api/async/availability/', {'start_date': self.day.isoformat(), 'service': 999})
+        self.assertEqual(response.status_code, 404)
+
+    def test_appointment_lists_match_sync_views(self):
+        for period, expected in (('upcoming', 6), ('today', 3)):
+            response = self.api.get(f'/api/async/appointments/{period}/', {'page_size': 4})
+            sync = self.api.get(f'/api/appointments/{period}/', {'page_size': 4}).json()
+            self.assertEqual(response.json()['results'], sync['results'])
+            self.assertEqual(bool(response.json()['next']), expected > 4)
+
+            following = self.api.get(response.json()['next']).json() if response.json()['next'] else None
+            if following:
+                self.assertEqual(len(following['results']), expected - 4)
+                self.assertIn('/api/async/', following['previous'])
+
+        # Los clientes solo ven sus citas
+        other = User.objects.create_user(username='otro', password='x', role='client')
+        self.assertEqual(self.authenticated(other).get('/api/async/appointments/today/').json()['results'], [])
+
+    def test_service_list_matches_sync_view_and_supports_conditional_get(self):
+        Service.objects.create(name='Tinte', description='', price='50000.00', duration=timedelta(hours=1), is_active=False)
+        response = self.api.get('/api/async/services/')
+        sync = self.api.get('/api/services/').json()
+        self.assertEqual(response.json()['results'], sync['results'])
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(self.authenticated(self.admin).get('/api/async/services/').json()['count'], 2)
+
+        with self.assertNumQueries(1):
+            cached = self.api.get('/api/async/services/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.api.get('/api/async/services/').json(), response.json())
+        self.assertEqual(self.api.get('/api/async/services/', {'page': 5}).status_code, 404)
+
+    def test_requires_authentication(self):
+        response = APIClient().get('/api/async/services/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION='Bearer invalido')
+        self.assertEqual(api.get('/api/async/appointments/today/').status_code, 401)
+        self.assertEqual(self.api.post('/api/async/services/').status_code, 405)
+
+
+class PerformanceMiddlewareTests(BarbershopTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.make_appointment(time(9, 0), time(9, 30))
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.client_user)}')
+
+    def server_timing(self, response):
+        metrics = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get('/api/appointments/')
+        metrics = self.server_timing(response)
+        self.assertEqual(list(metrics), ['sql', 'auth', 'serialize', 'view', 'render', 'total'])
+        self.assertEqual(metrics['sql']['desc'], f'"{len(queries)} queries"')
+        self.assertGreater(float(metrics['serialize']['dur']), 0)
+        self.assertLessEqual(float(metrics['view']['dur']), float(metrics['total']['dur']))
+
+    def test_async_views_are_measured(self):
+        response = self.api.get('/api/async/appointments/upcoming/')
+        metrics = self.server_timing(response)
+        self.assertEqual(metrics['sql']['desc'], '"2 queries"')
+        self.assertNotIn('render', metrics)
+
+    def test_slow_requests_are_logged_with_repeated_queries(self):
+        with override_settings(PERFORMANCE_MIDDLEWARE={'SLOW_REQUEST_MS': 0, 'TOP_QUERIES': 5, 'HEADER': False}):
+            api = APIClient()
+            api.force_authenticate(self.admin)
+            with self.assertLogs('appointments.performance', 'WARNING') as logs:
+                response = api.get('/api/services/')
+        self.assertNotIn('Server-Timing', response)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['path'], '/api/services/')
+        self.assertEqual(line['status'], 200)
+        self.assertIn('total_ms', line)
+
+    def test_repeated_statements_are_ranked(self):
+        timings, token = timing.start()
+        try:
+            for _ in range(3):
+                Service.objects.filter(id=self.service.id).first()
+            User.objects.count()
+        finally:
+            timing.finish(token)
+        (sql, count), = timings.repeated(5)
+        self.assertEqual(count, 3)
+        self.assertIn('appointments_service', sql)
+        self.assertEqual(timings.queries, 4)
+
+
+class MetricsTests(BarbershopTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        metrics.registry.clear()
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.client_user)}')
+
+    def scrape(self, **headers):
+        client = APIClient()
+        if not headers:
+            client.force_authenticate(self.admin)
+        response = client.get('/api/metrics', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def sample(self, text, series):
+        for line in text.splitlines():
+            if line.startswith(series + ' '):
+                return float(line.rsplit(' ', 1)[1])
+        return None
+
+    def book(self, start_time):
+        return self.api.post('/api/appointments/', {
+            'client': self.client_user.id, 'barber': self.barber.id, 'service': self.service.id,
+            'date': self.day.isoformat(), 'start_time': start_time,
+        }, format='json')
+
+    def test_booking_latency_and_conflicts(self):
+        self.assertEqual(self.book('10:00').status_code, 201)
+        self.assertEqual(self.book('10:00').status_code, 400)
+        text = self.scrape()
+        self.assertEqual(self.sample(text, 'barbershop_booking_duration_seconds_count{phase="validate"}'), 2)
+        self.assertEqual(self.sample(text, 'barbershop_booking_duration_seconds_count{phase="create"}'), 1)
+        self.assertEqual(self.sample(text, 'barbershop_booking_conflicts_total{stage="validate"}'), 1)
+        self.assertEqual(
+            self.sample(text, 'barbershop_request_duration_seconds_count'
+                              '{view="AppointmentViewSet",action="create",method="POST"}'), 2
+        )
+        self.assertIn('# TYPE barbershop_booking_conflicts counter', text)
+        self.assertIn(
+            'barbershop_booking_duration_seconds_bucket{phase="create",le="+Inf"} 1', text
+        )
+
+    def test_status_transitions_and_login(self):
+        appointment = self.make_appointment(time(9, 0), time(9, 30))
+        admin = APIClient()
+        admin.force_authenticate(self.admin)
+        admin.patch(f'/api/appointments/{appointment.id}/change_status/', {'status': 'confirmed'}, format='json')
+        admin.patch(f'/api/appointments/{appointment.id}/change_status/', {'status': 'pending'}, format='json')
+        APIClient().post('/api/auth/login/', {'username': 'pedro', 'password': 'cliente2024'}, format='json')
+        APIClient().post('/api/auth/login/', {'username': 'pedro', 'password': 'incorrecta'}, format='json')
+        text = self.scrape()
+        self.assertEqual(self.sample(
+            text, 'barbershop_appointment_status_transitions_total{from_status="pending",to_status="confirmed"}'
+        ), 1)
+        self.assertNotIn('to_status="pending"', text)
+        self.assertEqual(self.sample(text, 'barbershop_login_duration_seconds_count{outcome="success"}'), 1)
+        self.assertEqual(self.sample(text, 'barbershop_login_duration_seconds_count{outcome="failure"}'), 1)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.REQUEST_QUERIES.labels('Vista"rara', 'list')
+        for value in (0, 2, 2, 100):
+            histogram.observe(value)
+        text = metrics.render_metrics()
+        series = 'barbershop_request_db_queries_bucket{view="Vista\\"rara",action="list",le="%s"}'
+        self.assertEqual(self.sample(text, series % '1'), 1)
+        self.assertEqual(self.sample(text, series % '2'), 3)
+        self.assertEqual(self.sample(text, series % '89'), 3)
+        self.assertEqual(self.sample(text, series % '+Inf'), 4)
+        self.assertEqual(self.sample(text, 'barbershop_request_db_queries_sum{view="Vista\\"rara",action="list"}'), 104)
+
+    def test_threads_are_aggregated(self):
+        counter = metrics.BOOKING_CONFLICTS.labels(stage='locked')
+
+        def work():
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc()
+        self.assertEqual(self.sample(metrics.render_metrics(), 'barbershop_booking_conflicts_total{stage="locked"}'), 8001)
+
+    def test_multiprocess_files_are_merged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, '99999.json'), 'w') as other:
+                json.dump([['barbershop_booking_conflicts', ['locked'], 3]], other)
+            metrics.BOOKING_CONFLICTS.labels(stage='locked').inc(2)
+            with override_settings(METRICS={'MULTIPROCESS_DIR': directory, 'FLUSH_INTERVAL': 5, 'TOKEN': None}):
+                text = self.scrape()
+            self.assertIn(f'{os.getpid()}.json', os.listdir(directory))
+        self.assertEqual(self.sample(text, 'barbershop_booking_conflicts_total{stage="locked"}'), 5)
+
+    def test_concurrent_flushes_and_scrapes_share_the_file(self):
+        metrics.BOOKING_CONFLICTS.labels(stage='locked').inc(2)
+        errors = []
+
+        def work(action):
+            try:
+                for _ in range(50):
+                    action()
+            except Exception as error:
+                errors.append(error)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS={'MULTIPROCESS_DIR': directory, 'FLUSH_INTERVAL': 5, 'TOKEN': None}):
+                threads = [
+                    threading.Thread(target=work, args=(action,))
+                    for action in (metrics.registry.flush, metrics.registry.collect_all) * 4
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        self.assertEqual(errors, [])
+
+    def test_retired_workers_are_folded_into_the_archive(self):
+        key = ('barbershop_booking_conflicts', ('locked',))
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'archive.json'), 'w') as archive:
+                json.dump([['barbershop_booking_conflicts', ['locked'], 3]], archive)
+            # Un registro propio: retire deja de escribir en este proceso
+            worker = metrics.Registry()
+            worker.add_series(worker.shard(), key, 2)
+            with override_settings(METRICS={'MULTIPROCESS_DIR': directory, 'FLUSH_INTERVAL': 5, 'TOKEN': None}):
+                worker.flush()
+                worker.retire()
+                worker.flush()
+                self.assertEqual(worker._read(os.path.join(directory, 'archive.json')), {key: 5})
+                self.assertNotIn(f'{os.getpid()}.json', os.listdir(directory))
+
+    def test_token_is_required_when_configured(self):
+        with override_settings(METRICS={'MULTIPROCESS_DIR': None, 'FLUSH_INTERVAL': 5, 'TOKEN': 'secreto'}):
+            self.assertEqual(APIClient().get('/api/metrics').status_code, 401)
+            self.scrape(HTTP_AUTHORIZATION='Bearer secreto')
+
+    def test_admin_only_without_token(self):
+        self.assertEqual(APIClient().get('/api/metrics').status_code, 401)
+        self.assertEqual(self.api.get('/api/metrics').status_code, 403)
+        self.scrape()
+
+    def test_availability_engine_is_timed(self):
+        response = self.api.get('/api/availability/', {
+            'service': self.service.id, 'start_date': self.day.isoformat(), 'end_date': self.day.isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        text = self.scrape()
+        self.assertEqual(self.sample(text, 'barbershop_slot_computation_seconds_count{engine="numpy"}'), 1)
+
+
+class BenchmarkCommandTests(TestCase):
+
+    def run_benchmark(self, **options):
+        out = StringIO()
+        call_command('benchmark', rows='5', iterations=2, warmup=0, stdout=out, **options)
+        return out.getvalue()
+
+    def test_saves_results_and_discards_data(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'base.json')
+            self.run_benchmark(save=path)
+            with open(path) as source:
+                results = json.load(source)
+        self.assertEqual(set(results['benchmarks']), {
+            'slots.get_available_slots[density=0]', 'slots.get_available_slots[density=50]',
+            'slots.get_available_slots[density=100]', 'booking.validate[free]', 'booking.validate[conflict]',
+            'render.services[rows=5]', 'render.appointments[rows=5]', 'status.change_status',
+        })
+        self.assertEqual(results['benchmarks']['render.appointments[rows=5]']['queries'], 0)
+        self.assertFalse(Appointment.objects.exists())
+        self.assertFalse(DailyBarberStats.objects.exists())
+
+    def test_regressions_against_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'base.json')
+            with open(path, 'w') as output:
+                json.dump({'benchmarks': {
+                    'render.services[rows=5]': {'median_ms': 0.000001, 'queries': 0},
+                    'status.change_status': {'median_ms': 10 ** 6, 'queries': 99},
+                }}, output)
+            out = self.run_benchmark(baseline=path, filter='s')
+            self.assertIn('regresión', out.splitlines()[-2])
+            self.assertIn('mejora', out.splitlines()[-1])
+            with self.assertRaises(CommandError):
+                self.run_benchmark(baseline=path, filter='render.services', fail_on_regression=True)
+
+
+class SeedShopCommandTests(TestCase):
+
+    def test_seeds_consistent_calendar(self):
+        out = StringIO()
+        call_command('seed_shop', barbers=3, clients=10, days_back=20, days_ahead=10, seed=7, stdout=out)
+        self.assertIn('citas', out.getvalue())
+        barber = User.objects.get(username='seed_barber0')
+        self.assertTrue(barber.check_password('barbershop2024'))
+        self.assertEqual(Schedule.objects.filter(barber=barber).count(), 6)
+
+        appointments = list(Appointment.objects.order_by('barber_id', 'date', 'start_time'))
+        self.assertTrue(appointments)
+        for previous, current in zip(appointments, appointments[1:]):
+            if (previous.barber_id, previous.date) == (current.barber_id, current.date):
+                self.assertLessEqual(previous.end_time, current.start_time)
+        today = timezone.localdate()
+        self.assertFalse(Appointment.objects.filter(date__lt=today, status='pending').exists())
+        days_off = set(ScheduleException.objects.values_list('barber_id', 'date'))
+        self.assertFalse(days_off & {(item.barber_id, item.date) for item in appointments})
+        first, last = appointments[0].date, today + timedelta(days=10)
+        self.assertEqual(DailyBarberStats.rebuild(first, last, dry_run=True), 0)
+
+    def test_prefix_in_use(self):
+        call_command('seed_shop', barbers=1, clients=1, days_back=1, days_ahead=0, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('seed_shop', barbers=1, clients=1, stdout=StringIO())
+
+
+
+@override_settings(PERFORMANCE_MIDDLEWARE={'SLOW_REQUEST_MS': 10 ** 6, 'TOP_QUERIES': 5, 'HEADER': True})
+class SimulateRushCommandTests(LiveServerTestCase):
+    """
+    Necesita una base de pruebas que acepte varias conexiones, como
+    ``ConcurrentBookingTests``
+    """
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('SQLite en memoria no admite conexiones concurrentes')
+        slot_cache.clear()
+        response_cache.clear()
+        user_cache.clear()
+        revoked_tokens.clear()
+        ShopSeeder(barbers=2, clients=6, days_back=0, days_ahead=0, password='rush2024', seed=1).run()
+
+    def test_reports_endpoints_without_double_bookings(self):
+        day = next_weekday(5) + timedelta(days=7)
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rush.json')
+            call_command(
+                'simulate_rush', url=f'{self.live_server_url}/api', clients=6, barbers=2, password='rush2024',
+                date=day, ramp_up=0, hot_slots=1, barber_interval=0.05, seed=3, json_path=path, stdout=out
+            )
+            with open(path) as source:
+                results = json.load(source)
+        self.assertIn('Sin reservas dobles', out.getvalue())
+        self.assertEqual(results['endpoints']['login']['requests'], 8)
+        self.assertGreater(results['events']['booked'], 0)
+        self.assertEqual(Appointment.objects.filter(date=day).count(), results['events']['booked'])
+        self.assertEqual(
+            Appointment.objects.filter(date=day, status='confirmed').count(), results['events']['confirmed']
+        )
+        self.assertIn('p95_ms', results['endpoints']['book'])
+
+
+class DoubleBookingDetectionTests(BarbershopTestMixin, TestCase):
+
+    def test_overlapping_active_appointments_are_reported(self):
+        first = self.make_appointment(time(9, 0), time(10, 0))
+        second = self.make_appointment(time(9, 30), time(10, 0))
+        self.make_appointment(time(10, 0), time(10, 30))
+        self.make_appointment(time(9, 0), time(9, 30), status='cancelled')
+        self.assertEqual(double_bookings([self.barber.id], self.day), [(first.id, second.id)])
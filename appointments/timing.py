@@ -0,0 +1,109 @@
+"""
+Tiempos por petición: consultas SQL, autenticación y serialización.
+
+``PerformanceMiddleware`` abre un ``RequestTimings`` por petición en una
+``ContextVar``, así que también lo ven las consultas del ORM asíncrono, que
+corren en otros hilos con una copia del contexto. Las consultas se cuentan
+con un ``execute_wrapper`` que se instala en cada conexión al abrirse y no
+depende de ``DEBUG``; fuera de una petición solo cuesta leer la variable.
+"""
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Acumuladores de una petición. ``durations`` guarda segundos por
+    nombre (``auth``, ``serialize``) y ``statements`` cuántas veces se
+    ejecutó cada sentencia SQL (sin parámetros)
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.queries = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+        self.marks = {}
+        self.view = None  # (vista, acción) resuelta en process_view
+        self._depth = {}
+
+    def mark(self, name):
+        self.marks[name] = time.perf_counter()
+
+    def repeated(self, limit):
+        """
+        Sentencias ejecutadas más de una vez, de la más repetida a la menos
+        """
+        return [(sql, count) for sql, count in self.statements.most_common(limit) if count > 1]
+
+
+def start():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+class measure:
+    """
+    Suma al acumulador ``name`` de la petición en curso el tiempo del bloque.
+    Los bloques anidados del mismo nombre (p. ej. serializadores anidados)
+    se cuentan una sola vez.
+    """
+    __slots__ = ('name', 'timings', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.timings = timings = _current.get()
+        if timings is not None:
+            depth = timings._depth.get(self.name, 0)
+            timings._depth[self.name] = depth + 1
+            self.started = time.perf_counter() if depth == 0 else None
+
+    def __exit__(self, *exc_info):
+        timings = self.timings
+        if timings is None:
+            return
+        timings._depth[self.name] -= 1
+        if self.started is not None:
+            timings.durations[self.name] = (
+                timings.durations.get(self.name, 0.0) + time.perf_counter() - self.started
+            )
+
+
+def record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.sql_time += time.perf_counter() - started
+        timings.queries += 1
+        timings.statements[sql] += 1
+
+
+def instrument(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def instrument_new_connection(sender, connection, **kwargs):
+    instrument(connection)
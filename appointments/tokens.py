@@ -0,0 +1,154 @@
+"""
+Lista negra de refresh tokens en memoria.
+
+Con ``ROTATE_REFRESH_TOKENS`` y ``BLACKLIST_AFTER_ROTATION`` cada refresh
+agrega el token usado a ``BlacklistedToken``. simplejwt comprueba además,
+antes de aceptar un token, que su JTI no esté en esa tabla; ``RefreshToken``
+hace esa comprobación contra ``revoked_tokens``, un conjunto de JTIs del
+proceso que se sincroniza con la base de datos cada
+``TOKEN_BLACKLIST_SYNC['INTERVAL']`` segundos (solo las filas nuevas) y se
+recarga completo cada ``TOKEN_BLACKLIST_SYNC['FULL_RELOAD']`` segundos.
+
+Un token revocado en otro proceso puede pasar esa comprobación durante el
+intervalo de sincronización, pero no puede reutilizarse: al rotarlo,
+``blacklist()`` encuentra la fila existente y el refresh se rechaza (ver
+``RotatingTokenRefreshSerializer``).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+
+class RevokedTokens:
+    """
+    JTIs en lista negra con su expiración (epoch). Las entradas vencidas se
+    descartan al sincronizar: un token vencido ya lo rechaza su ``exp``.
+    """
+
+    def __init__(self, interval=10, full_reload=300):
+        self.interval = interval
+        self.full_reload = full_reload
+        self._jtis = {}
+        self._last_id = 0
+        self._synced_at = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.checks = 0
+        self.rejections = 0
+        self.syncs = 0
+        self.full_syncs = 0
+
+    def contains(self, jti):
+        self.sync_if_due()
+        with self._lock:
+            self.checks += 1
+            found = jti in self._jtis
+            if found:
+                self.rejections += 1
+            return found
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._jtis[jti] = expires_at
+
+    def sync_if_due(self):
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < self.interval:
+            return
+        # Un solo hilo sincroniza; los demás usan el conjunto actual
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self.sync(full=self._loaded_at is None or now - self._loaded_at >= self.full_reload)
+        finally:
+            self._sync_lock.release()
+
+    def sync(self, full=False):
+        """
+        Lee de ``BlacklistedToken`` las filas vigentes: todas, o solo las
+        posteriores a la última leída
+        """
+        queryset = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        if not full:
+            queryset = queryset.filter(id__gt=self._last_id)
+        rows = list(queryset.order_by('id').values_list('id', 'token__jti', 'token__expires_at'))
+
+        now = time.time()
+        with self._lock:
+            if full:
+                self._jtis = {}
+            self._jtis.update((jti, expires_at.timestamp()) for row_id, jti, expires_at in rows)
+            self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+            if rows:
+                self._last_id = max(self._last_id, rows[-1][0])
+            self._synced_at = time.monotonic()
+            self.syncs += 1
+            if full:
+                self._loaded_at = self._synced_at
+                self.full_syncs += 1
+
+    def clear(self):
+        with self._lock:
+            self._jtis = {}
+            self._last_id = 0
+            self._synced_at = None
+            self._loaded_at = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._jtis),
+                'interval': self.interval,
+                'full_reload': self.full_reload,
+                'checks': self.checks,
+                'rejections': self.rejections,
+                'syncs': self.syncs,
+                'full_syncs': self.full_syncs,
+            }
+
+
+revoked_tokens = RevokedTokens(**{
+    key.lower(): value
+    for key, value in getattr(settings, 'TOKEN_BLACKLIST_SYNC', {}).items()
+})
+
+
+class RefreshToken(BaseRefreshToken):
+    """
+    Refresh token que consulta la lista negra en ``revoked_tokens`` en lugar
+    de la tabla
+    """
+
+    def check_blacklist(self):
+        if revoked_tokens.contains(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        """
+        Igual que en simplejwt, pero la fila de la lista negra se inserta
+        sin consultarla antes: si ya existía, la restricción única lo
+        indica (``created`` falso) también con refresh concurrentes
+        """
+        jti = self.payload[api_settings.JTI_CLAIM]
+        exp = self.payload['exp']
+        token, _created = OutstandingToken.objects.get_or_create(
+            jti=jti,
+            defaults={'token': str(self), 'expires_at': datetime_from_epoch(exp)},
+        )
+        try:
+            with transaction.atomic():
+                blacklisted, created = BlacklistedToken.objects.create(token=token), True
+        except IntegrityError:
+            blacklisted, created = BlacklistedToken.objects.get(token=token), False
+        revoked_tokens.add(jti, exp)
+        return blacklisted, created
@@ -1,7 +1,6 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenRefreshView
-from . import views
+from . import views, async_views
 
 app_name = 'appointments'
 
@@ -16,13 +15,39 @@ router.register(r'appointments', views.AppointmentViewSet, basename='appointment
 urlpatterns = [
     # Autenticación
     path('auth/login/', views.CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('auth/login/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/login/refresh/', views.CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('auth/register/', views.RegisterView.as_view(), name='register'),
     
     # Perfil de usuario
     path('auth/profile/', views.get_user_profile, name='user_profile'),
     path('auth/profile/update/', views.update_user_profile, name='update_profile'),
 
+    # Disponibilidad de todos los barberos en un rango de fechas
+    path('availability/', views.availability, name='availability'),
+    path('cache/stats/', views.cache_stats, name='cache_stats'),
+
+    # Métricas para Prometheus (con o sin barra final)
+    re_path(r'^metrics/?$', views.MetricsView.as_view(), name='metrics'),
+
+    # Reportes (solo administradores)
+    path('reports/revenue/', views.revenue_report_view, name='report_revenue'),
+    path('reports/status/', views.status_report_view, name='report_status'),
+    path('reports/utilization/', views.utilization_report_view, name='report_utilization'),
+
+    # Lecturas asíncronas (ORM asíncrono, pensadas para ASGI)
+    path('async/availability/', async_views.AsyncAvailabilityView.as_view(), name='async_availability'),
+    path(
+        'async/appointments/upcoming/',
+        async_views.AsyncAppointmentListView.as_view(period='upcoming'),
+        name='async_appointments_upcoming'
+    ),
+    path(
+        'async/appointments/today/',
+        async_views.AsyncAppointmentListView.as_view(period='today'),
+        name='async_appointments_today'
+    ),
+    path('async/services/', async_views.AsyncServiceListView.as_view(), name='async_services'),
+
     # Incluir URLs del router
     path('', include(router.urls)),
 ] 
\ No newline at end of file
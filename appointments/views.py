@@ -2,23 +2,55 @@ from rest_framework import status, generics, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from django.conf import settings
+from django.db import transaction
 from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
 from django.utils import timezone
 from datetime import datetime, timedelta
+from urllib.parse import urlencode
+import hashlib
+import hmac
+import time
 from .serializers import (
-    UserSerializer, CustomTokenObtainPairSerializer,
+    UserSerializer, CustomTokenObtainPairSerializer, RotatingTokenRefreshSerializer,
     BarberSerializer, ScheduleSerializer, ServiceSerializer,
-    ScheduleExceptionSerializer, AppointmentSerializer
+    ScheduleExceptionSerializer, AppointmentSerializer, SlotHoldSerializer,
+    BulkAppointmentSerializer, WeeklyScheduleSerializer
 )
-from .models import Schedule, Service, ScheduleException, Appointment
+from .models import Schedule, Service, ScheduleException, Appointment, ResourceVersion
+from .availability import date_range, cached_availability, DaySlotData
+from .cache import slot_cache, user_cache, response_cache
+from .tokens import revoked_tokens
+from .pagination import KeysetPagination
+from .export import EXPORT_FORMATS, STREAMERS, iter_export_rows
+from .reports import REPORT_GROUPS, revenue_report, status_report, utilization_report
+from .metrics import LOGIN_LATENCY, STATUS_TRANSITIONS, metrics_config, render_metrics
 
 User = get_user_model()
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
+    def post(self, request, *args, **kwargs):
+        started = time.perf_counter()
+        outcome = 'failure'
+        try:
+            response = super().post(request, *args, **kwargs)
+            if response.status_code < 400:
+                outcome = 'success'
+            return response
+        finally:
+            LOGIN_LATENCY.labels(outcome=outcome).observe(time.perf_counter() - started)
+
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = RotatingTokenRefreshSerializer
+
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
@@ -39,15 +71,359 @@ def update_user_profile(request):
         return Response(serializer.data)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class BarberViewSet(viewsets.ModelViewSet):
+def availability_params(query_params):
+    """
+    Parámetros de la consulta de disponibilidad. Devuelve
+    ((start_date, end_date, service_id, barber_ids), None) o
+    (None, mensaje de error); ``barber_ids`` es None si no se filtra.
+    """
+    try:
+        start_date = datetime.strptime(query_params['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(
+            query_params.get('end_date', query_params['start_date']), '%Y-%m-%d'
+        ).date()
+    except (KeyError, ValueError):
+        return None, "Se requieren fechas válidas en formato YYYY-MM-DD (start_date, end_date)"
+
+    if end_date < start_date:
+        return None, "La fecha final debe ser posterior a la fecha inicial"
+    if (end_date - start_date).days >= settings.AVAILABILITY_MAX_DAYS:
+        return None, f"El rango máximo es de {settings.AVAILABILITY_MAX_DAYS} días"
+
+    service_id = query_params.get('service')
+    if not service_id or not service_id.isdigit():
+        return None, "Se requiere el ID del servicio"
+
+    barber_ids = None
+    barbers_param = query_params.get('barbers')
+    if barbers_param:
+        try:
+            barber_ids = [int(value) for value in barbers_param.split(',') if value]
+        except ValueError:
+            return None, "Los IDs de barberos deben ser números separados por comas"
+    return (start_date, end_date, service_id, barber_ids), None
+
+def availability_barbers(barber_ids):
+    """
+    Barberos activos a consultar (todos si ``barber_ids`` es None)
+    """
+    barbers = User.objects.filter(role='barber', is_active=True).order_by('id')
+    if barber_ids is not None:
+        barbers = barbers.filter(id__in=barber_ids)
+    return barbers.only('id', 'first_name', 'last_name')
+
+def availability_payload(service, start_date, end_date, barbers, dates, free):
+    return {
+        'service': service.id,
+        'duration': int(service.duration.total_seconds() // 60),
+        'start_date': start_date,
+        'end_date': end_date,
+        'barbers': [
+            {
+                'barber': barber.id,
+                'barber_name': barber.get_full_name(),
+                'days': {
+                    day.isoformat(): free[barber.id][day]
+                    for day in dates
+                },
+            }
+            for barber in barbers
+        ],
+    }
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def availability(request):
+    """
+    Horarios libres de varios barberos en un rango de fechas.
+
+    Parámetros:
+    - start_date, end_date: rango de fechas (YYYY-MM-DD); end_date es opcional
+    - service: ID del servicio, define la duración de la cita
+    - barbers: IDs de barberos separados por comas (opcional, por defecto todos)
+    """
+    params, error = availability_params(request.query_params)
+    if error:
+        return Response({"detail": error}, status=status.HTTP_400_BAD_REQUEST)
+    start_date, end_date, service_id, barber_ids = params
+
+    service = get_object_or_404(Service, id=service_id, is_active=True)
+    barbers = list(availability_barbers(barber_ids))
+    dates = date_range(start_date, end_date)
+    free = cached_availability([barber.id for barber in barbers], dates, service.duration)
+    return Response(availability_payload(service, start_date, end_date, barbers, dates, free))
+
+def _report_range(request):
+    """
+    Rango de fechas de un reporte (por defecto los últimos 30 días).
+    Devuelve (start_date, end_date, None) o (None, None, Response de error).
+    """
+    today = timezone.localdate()
+    try:
+        end_date = datetime.strptime(
+            request.query_params.get('end_date', today.isoformat()), '%Y-%m-%d'
+        ).date()
+        start_date = datetime.strptime(
+            request.query_params.get('start_date', (end_date - timedelta(days=29)).isoformat()), '%Y-%m-%d'
+        ).date()
+    except ValueError:
+        return None, None, Response(
+            {"detail": "Formato de fecha inválido. Use YYYY-MM-DD"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if end_date < start_date:
+        return None, None, Response(
+            {"detail": "La fecha final debe ser posterior a la fecha inicial"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if (end_date - start_date).days >= settings.REPORT_MAX_DAYS:
+        return None, None, Response(
+            {"detail": f"El rango máximo es de {settings.REPORT_MAX_DAYS} días"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return start_date, end_date, None
+
+def _grouped_report(request, report):
+    start_date, end_date, error = _report_range(request)
+    if error:
+        return error
+    group_by = request.query_params.get('group_by', 'barber')
+    if group_by not in REPORT_GROUPS:
+        return Response(
+            {"detail": f"group_by debe ser uno de: {', '.join(REPORT_GROUPS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    barber_id = request.query_params.get('barber')
+    if barber_id and not barber_id.isdigit():
+        return Response({"detail": "ID de barbero inválido"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'start_date': start_date,
+        'end_date': end_date,
+        'group_by': group_by,
+        **report(start_date, end_date, group_by, barber_id),
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def revenue_report_view(request):
+    """
+    Ingresos por barbero, servicio o día (``group_by``)
+    """
+    return _grouped_report(request, revenue_report)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def status_report_view(request):
+    """
+    Citas por estado y tasas de finalización y cancelación
+    """
+    return _grouped_report(request, status_report)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def utilization_report_view(request):
+    """
+    Ocupación de la silla: minutos reservados / minutos de horario laboral
+    """
+    start_date, end_date, error = _report_range(request)
+    if error:
+        return error
+    barbers = User.objects.filter(role='barber').order_by('id')
+    barber_id = request.query_params.get('barber')
+    if barber_id:
+        if not barber_id.isdigit():
+            return Response({"detail": "ID de barbero inválido"}, status=status.HTTP_400_BAD_REQUEST)
+        barbers = barbers.filter(id=barber_id)
+    barbers = list(barbers.only('id', 'first_name', 'last_name'))
+    return Response({
+        'start_date': start_date,
+        'end_date': end_date,
+        **utilization_report(barbers, start_date, end_date),
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    """
+    Estadísticas de los cachés del proceso (aciertos, fallos, tamaño)
+    """
+    return Response({
+        'availability': slot_cache.stats(),
+        'responses': response_cache.stats(),
+        'users': user_cache.stats(),
+        'revoked_tokens': revoked_tokens.stats(),
+    })
+
+class MetricsView(APIView):
+    """
+    Métricas en formato de texto de Prometheus. Si ``METRICS['TOKEN']``
+    está definido se exige ``Authorization: Bearer <token>``; si no, solo
+    los administradores pueden leerlas
+    """
+
+    def get_authenticators(self):
+        # El token de métricas no es un JWT: se compara en get()
+        if metrics_config()['TOKEN']:
+            return []
+        return super().get_authenticators()
+
+    def get_permissions(self):
+        if metrics_config()['TOKEN']:
+            return [AllowAny()]
+        return [IsAdminUser()]
+
+    def get(self, request):
+        token = metrics_config()['TOKEN']
+        if token and not hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', '').encode(), f'Bearer {token}'.encode()
+        ):
+            response = Response({"detail": "Token de métricas inválido"}, status=status.HTTP_401_UNAUTHORIZED)
+            response['WWW-Authenticate'] = 'Bearer realm="metrics"'
+            return response
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+class DaySlotDataMixin:
+    """
+    Cuando el listado pide ``?date=``, precarga en bloque las excepciones y
+    citas de ese día para todos los barberos de la página, compartidas por
+    los ``available_slots`` de cada horario serializado.
+    """
+    slot_barber_field = 'barber_id'
+
+    def get_slot_context(self, barber_ids):
+        context = self.get_serializer_context()
+        date_param = self.request.query_params.get('date')
+        if date_param:
+            try:
+                date = datetime.strptime(date_param, '%Y-%m-%d').date()
+            except ValueError:
+                return context
+            context['day_data'] = DaySlotData(barber_ids, date)
+        return context
+
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and args:
+            kwargs.setdefault('context', self.get_slot_context(
+                {getattr(obj, self.slot_barber_field) for obj in args[0]}
+            ))
+        return super().get_serializer(*args, **kwargs)
+
+def catalog_validators(versions, user, format):
+    """
+    ETag (versiones, alcance del usuario y formato) y fecha de la última
+    modificación de una respuesta del catálogo
+    """
+    if user.is_staff:
+        scope = 'staff'
+    elif user.role == 'barber':
+        scope = f'barber{user.id}'
+    else:
+        scope = user.role
+    tag = '-'.join(f'{name}.{version}' for name, (version, _) in versions.items())
+    etag = f'W/"{tag}-{scope}-{format}"'
+    modified = [updated_at for _, updated_at in versions.values() if updated_at]
+    if not modified:
+        return etag, None
+    # En segundos enteros y nunca posterior a la cabecera Date de la
+    # respuesta (RFC 9110, 8.8.2.1)
+    return etag, min(int(max(modified).timestamp()), int(time.time()))
+
+def add_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ['Authorization'])
+    return response
+
+def response_cache_key(prefix, request, etag):
+    """
+    Clave de ``response_cache``: el ETag más la ruta y los parámetros de la
+    consulta
+    """
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    # El host forma parte de la clave: los enlaces de paginación son absolutos
+    digest = hashlib.md5(f'{request.get_host()}{request.path}?{query}'.encode()).hexdigest()
+    return f'{prefix}:{etag}:{digest}'
+
+class ConditionalGetMixin:
+    """
+    ETag y Last-Modified en el listado y el detalle a partir de las
+    versiones de ``ResourceVersion`` de los recursos que muestra la vista.
+    Si el cliente ya tiene la versión vigente se responde 304 sin consultar
+    ni serializar. No se aplica con ``?date=``, porque los slots disponibles
+    dependen de las citas. Last-Modified tiene precisión de segundos; el
+    ETag es el validador de referencia, que cambia con cada versión.
+    """
+    version_resources = ()
+
+    def get_validators(self):
+        return catalog_validators(
+            ResourceVersion.current(self.version_resources),
+            self.request.user,
+            self.request.accepted_renderer.format
+        )
+
+    def conditional(self, request, handler, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or 'date' in request.query_params:
+            return handler(request, *args, **kwargs)
+        etag, last_modified = self.get_validators()
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.fresh_response(request, handler, etag, *args, **kwargs)
+        return add_validators(response, etag, last_modified)
+
+    def fresh_response(self, request, handler, etag, *args, **kwargs):
+        return handler(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, super().retrieve, *args, **kwargs)
+
+class ResponseCacheMixin(ConditionalGetMixin):
+    """
+    Guarda en ``response_cache`` los datos del listado y el detalle. La
+    clave combina el ETag (versiones de los recursos, alcance del usuario
+    y formato) con la ruta y los parámetros de la consulta, de modo que
+    una escritura del catálogo cambia la clave en lugar de borrar entradas.
+    """
+
+    def get_cache_key(self, request, etag):
+        return response_cache_key(f'{self.basename}:{self.action}', request, etag)
+
+    def fresh_response(self, request, handler, etag, *args, **kwargs):
+        key = self.get_cache_key(request, etag)
+        data = response_cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response_cache.set(key, response.data)
+        return response
+
+class BarberViewSet(ResponseCacheMixin, DaySlotDataMixin, viewsets.ModelViewSet):
     """
     ViewSet para la gestión de barberos.
     Proporciona operaciones CRUD y endpoints adicionales para gestión de horarios.
     """
     queryset = User.objects.filter(role='barber')
+    slot_barber_field = 'id'
+    version_resources = ('barbers', 'schedules')
     serializer_class = BarberSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        """
+        Precargar los horarios anidados en el listado y el detalle
+        """
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.prefetch_related('schedules')
+        return queryset
+
     def perform_create(self, serializer):
         """
         Asegurar que los nuevos usuarios creados aquí sean barberos
@@ -60,10 +436,30 @@ class BarberViewSet(viewsets.ModelViewSet):
         - Lista y detalle: cualquier usuario autenticado
         - Crear, actualizar, eliminar: solo administradores
         """
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'weekly_schedule']:
             self.permission_classes = [IsAdminUser]
         return super().get_permissions()
 
+    @action(detail=False, methods=['put'], url_path='weekly-schedule')
+    def weekly_schedule(self, request):
+        """
+        Aplicar una plantilla semanal de horarios a uno o varios barberos
+        """
+        serializer = WeeklyScheduleSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        summary = serializer.apply()
+        schedules = Schedule.objects.filter(
+            barber_id__in=serializer.validated_data['barbers']
+        ).select_related('barber').order_by('barber_id', 'day_of_week')
+        return Response({
+            **summary,
+            'schedules': ScheduleSerializer(
+                schedules, many=True, context=self.get_serializer_context()
+            ).data
+        })
+
     @action(detail=True, methods=['get', 'post'])
     def schedules(self, request, pk=None):
         """
@@ -73,12 +469,15 @@ class BarberViewSet(viewsets.ModelViewSet):
         barber = self.get_object()
         
         if request.method == 'GET':
-            schedules = Schedule.objects.filter(barber=barber)
-            serializer = ScheduleSerializer(schedules, many=True)
+            schedules = Schedule.objects.filter(barber=barber).select_related('barber')
+            serializer = ScheduleSerializer(schedules, many=True, context=self.get_slot_context([barber.id]))
             return Response(serializer.data)
         
         elif request.method == 'POST':
-            serializer = ScheduleSerializer(data={**request.data, 'barber': barber.id})
+            serializer = ScheduleSerializer(
+                data={**request.data, 'barber': barber.id},
+                context=self.get_serializer_context()
+            )
             if serializer.is_valid():
                 serializer.save()
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -99,10 +498,13 @@ class BarberViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        schedule = get_object_or_404(Schedule, id=schedule_id, barber=barber)
+        schedule = get_object_or_404(Schedule.objects.select_related('barber'), id=schedule_id, barber=barber)
         
         if request.method == 'PUT':
-            serializer = ScheduleSerializer(schedule, data=request.data, partial=True)
+            serializer = ScheduleSerializer(
+                schedule, data=request.data, partial=True,
+                context=self.get_serializer_context()
+            )
             if serializer.is_valid():
                 serializer.save()
                 return Response(serializer.data)
@@ -112,7 +514,12 @@ class BarberViewSet(viewsets.ModelViewSet):
             schedule.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-class ServiceViewSet(viewsets.ModelViewSet):
+def visible_services(user):
+    if user.is_staff:
+        return Service.objects.all()
+    return Service.objects.filter(is_active=True)
+
+class ServiceViewSet(ResponseCacheMixin, viewsets.ModelViewSet):
     """
     ViewSet para la gestión de servicios.
     Proporciona operaciones CRUD para los servicios de la barbería.
@@ -120,15 +527,14 @@ class ServiceViewSet(viewsets.ModelViewSet):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
     permission_classes = [IsAuthenticated]
+    version_resources = ('services',)
 
     def get_queryset(self):
         """
         Filtrar servicios activos para usuarios normales,
         mostrar todos los servicios para administradores
         """
-        if self.request.user.is_staff:
-            return Service.objects.all()
-        return Service.objects.filter(is_active=True)
+        return visible_services(self.request.user)
 
     def get_permissions(self):
         """
@@ -151,12 +557,13 @@ class ServiceViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(service)
         return Response(serializer.data)
 
-class ScheduleViewSet(viewsets.ModelViewSet):
+class ScheduleViewSet(ResponseCacheMixin, DaySlotDataMixin, viewsets.ModelViewSet):
     """
     ViewSet para la gestión de horarios.
     """
     serializer_class = ScheduleSerializer
     permission_classes = [IsAuthenticated]
+    version_resources = ('schedules', 'barbers')
 
     def get_queryset(self):
         """
@@ -165,7 +572,7 @@ class ScheduleViewSet(viewsets.ModelViewSet):
         - Barberos ven solo sus horarios
         - Clientes ven solo horarios activos
         """
-        queryset = Schedule.objects.all()
+        queryset = Schedule.objects.select_related('barber')
         
         if self.request.user.is_staff:
             return queryset
@@ -209,6 +616,12 @@ class ScheduleExceptionViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ScheduleExceptionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_keyset_ordering(self):
+        if self.action == 'upcoming':
+            return ('date', 'id')
+        return ('-date', '-id')
 
     def get_queryset(self):
         """
@@ -217,7 +630,7 @@ class ScheduleExceptionViewSet(viewsets.ModelViewSet):
         - Barberos ven solo sus excepciones
         - Clientes ven solo excepciones activas y futuras
         """
-        queryset = ScheduleException.objects.all()
+        queryset = ScheduleException.objects.select_related('barber')
         
         if self.request.user.is_staff:
             return queryset
@@ -226,7 +639,7 @@ class ScheduleExceptionViewSet(viewsets.ModelViewSet):
         else:
             return queryset.filter(
                 is_active=True,
-                date__gte=timezone.now().date()
+                date__gte=timezone.localdate()
             )
 
     def get_permissions(self):
@@ -263,7 +676,7 @@ class ScheduleExceptionViewSet(viewsets.ModelViewSet):
         """
         Obtener excepciones próximas (próximos 30 días)
         """
-        start_date = timezone.now().date()
+        start_date = timezone.localdate()
         end_date = start_date + timedelta(days=30)
         
         exceptions = self.get_queryset().filter(
@@ -271,8 +684,35 @@ class ScheduleExceptionViewSet(viewsets.ModelViewSet):
             is_active=True
         )
         
-        serializer = self.get_serializer(exceptions, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(exceptions)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+def visible_appointments(user):
+    """
+    Citas que puede ver el usuario:
+    - Administradores ven todas las citas
+    - Barberos ven sus citas
+    - Clientes ven sus propias citas
+    """
+    queryset = Appointment.objects.select_related('client', 'barber', 'service')
+    if user.is_staff:
+        return queryset
+    elif user.role == 'barber':
+        return queryset.filter(barber=user)
+    return queryset.filter(client=user)
+
+def active_appointments(queryset, period):
+    """
+    Citas pendientes o confirmadas del día (``'today'``) o de los próximos
+    30 días (``'upcoming'``)
+    """
+    today = timezone.localdate()
+    if period == 'today':
+        queryset = queryset.filter(date=today)
+    else:
+        queryset = queryset.filter(date__range=[today, today + timedelta(days=30)])
+    return queryset.filter(status__in=['pending', 'confirmed'])
 
 class AppointmentViewSet(viewsets.ModelViewSet):
     """
@@ -280,22 +720,22 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     """
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """
-        Filtrar citas según el rol del usuario:
-        - Administradores ven todas las citas
-        - Barberos ven sus citas
-        - Clientes ven sus propias citas
+        Filtrar citas según el rol del usuario (ver ``visible_appointments``)
         """
-        queryset = Appointment.objects.all()
-        
-        if self.request.user.is_staff:
-            return queryset
-        elif self.request.user.role == 'barber':
-            return queryset.filter(barber=self.request.user)
-        else:
-            return queryset.filter(client=self.request.user)
+        return visible_appointments(self.request.user)
+
+    def get_keyset_ordering(self):
+        """
+        Las próximas citas y las del día van en orden cronológico; el
+        historial, de la más reciente a la más antigua
+        """
+        if self.action in ['upcoming', 'today']:
+            return ('date', 'start_time', 'id')
+        return ('-date', '-start_time', '-id')
 
     def get_permissions(self):
         """
@@ -308,6 +748,15 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             self.permission_classes = [IsAuthenticated]
         return super().get_permissions()
 
+    def perform_update(self, serializer):
+        """
+        Guardar la cita y su aporte al resumen diario en la misma transacción,
+        sobre la fila releída con bloqueo
+        """
+        with transaction.atomic():
+            serializer.instance = Appointment.lock(serializer.instance.pk, self.get_queryset())
+            serializer.save()
+
     def check_object_permissions(self, request, obj):
         """
         Verificar permisos específicos para cada acción
@@ -354,44 +803,113 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             'completed': []
         }
         
-        if new_status not in valid_transitions[appointment.status]:
+        # La transición se valida contra la fila bloqueada: el resumen diario
+        # se actualiza en la misma transacción (post_save) restando ese estado
+        with transaction.atomic():
+            appointment = Appointment.lock(appointment.pk, self.get_queryset())
+            previous_status = appointment.status
+            if new_status not in valid_transitions[previous_status]:
+                return Response(
+                    {"detail": f"No se puede cambiar de {previous_status} a {new_status}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            appointment.status = new_status
+            appointment.save()
+        STATUS_TRANSITIONS.labels(from_status=previous_status, to_status=new_status).inc()
+        serializer = self.get_serializer(appointment)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def hold(self, request):
+        """
+        Retener un horario durante SLOT_HOLD_TTL segundos mientras el cliente
+        confirma la cita. La retención se convierte en cita enviando su ID
+        en el campo ``hold`` al crear la cita.
+        """
+        serializer = SlotHoldSerializer(data=request.data, context=self.get_serializer_context())
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Reservar varias citas de una vez (lista de horarios o recurrencia).
+        Las ocurrencias válidas se crean juntas y las que tienen conflicto se
+        informan una por una.
+        """
+        serializer = BulkAppointmentSerializer(data=request.data, context=self.get_serializer_context())
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        appointments, conflicts = serializer.book()
+        return Response(
+            {
+                'created': self.get_serializer(appointments, many=True).data,
+                'conflicts': conflicts,
+            },
+            status=status.HTTP_201_CREATED if appointments else status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Exportar citas en CSV o NDJSON (``?fmt=csv|ndjson``) como respuesta
+        en streaming. Admite ``start_date``, ``end_date`` y ``status``.
+        Disponible para administradores y barberos, con el mismo alcance
+        que el listado.
+        """
+        if not (request.user.is_staff or request.user.role == 'barber'):
+            self.permission_denied(request, message="No tienes permiso para exportar citas")
+
+        fmt = request.query_params.get('fmt', 'csv')
+        if fmt not in EXPORT_FORMATS:
             return Response(
-                {"detail": f"No se puede cambiar de {appointment.status} a {new_status}"},
+                {"detail": "Formato no válido. Use csv o ndjson"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-            
-        appointment.status = new_status
-        appointment.save()
-        serializer = self.get_serializer(appointment)
-        return Response(serializer.data)
+
+        queryset = self.get_queryset()
+        try:
+            start_date = request.query_params.get('start_date')
+            end_date = request.query_params.get('end_date')
+            if start_date:
+                queryset = queryset.filter(date__gte=datetime.strptime(start_date, '%Y-%m-%d').date())
+            if end_date:
+                queryset = queryset.filter(date__lte=datetime.strptime(end_date, '%Y-%m-%d').date())
+        except ValueError:
+            return Response(
+                {"detail": "Formato de fecha inválido. Use YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        status_param = request.query_params.get('status')
+        if status_param:
+            queryset = queryset.filter(status=status_param)
+
+        response = StreamingHttpResponse(
+            STREAMERS[fmt](iter_export_rows(queryset)),
+            content_type=EXPORT_FORMATS[fmt]
+        )
+        response['Content-Disposition'] = f'attachment; filename="citas.{fmt}"'
+        return response
 
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
         """
         Obtener las próximas citas (próximos 30 días)
         """
-        start_date = timezone.now().date()
-        end_date = start_date + timedelta(days=30)
-        
-        appointments = self.get_queryset().filter(
-            date__range=[start_date, end_date],
-            status__in=['pending', 'confirmed']
-        )
-        
-        serializer = self.get_serializer(appointments, many=True)
-        return Response(serializer.data)
+        appointments = active_appointments(self.get_queryset(), 'upcoming')
+        page = self.paginate_queryset(appointments)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def today(self, request):
         """
         Obtener las citas del día
         """
-        today = timezone.now().date()
-        
-        appointments = self.get_queryset().filter(
-            date=today,
-            status__in=['pending', 'confirmed']
-        )
-        
-        serializer = self.get_serializer(appointments, many=True)
-        return Response(serializer.data)
+        appointments = active_appointments(self.get_queryset(), 'today')
+        page = self.paginate_queryset(appointments)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
@@ -18,16 +18,32 @@ from datetime import timedelta
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_list(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-v@ev@bwr^6pckh(^4sz$04(^tl4)-qtk5w%4)7#@^8mz6+_ld4'
+SECRET_KEY = os.environ.get(
+    'SECRET_KEY', 'django-insecure-v@ev@bwr^6pckh(^4sz$04(^tl4)-qtk5w%4)7#@^8mz6+_ld4'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = env_bool('DEBUG', True)
 
-ALLOWED_HOSTS = ['*']
+ALLOWED_HOSTS = env_list('ALLOWED_HOSTS', ['*'])
 
 
 # Application definition
@@ -41,12 +57,14 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     # Third party apps
     'rest_framework',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     # Local apps
     'appointments.apps.AppointmentsConfig',
 ]
 
 MIDDLEWARE = [
+    'appointments.middleware.PerformanceMiddleware',  # Primero: mide la petición completa
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware
@@ -90,14 +108,19 @@ WSGI_APPLICATION = 'barbershop.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Las conexiones se cierran al final de cada petición salvo que
+# DB_CONN_MAX_AGE indique cuántos segundos reutilizarlas (ver
+# barbershop/settings_production.py)
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'barbershop_db',
-        'USER': 'newuser',
-        'PASSWORD': '+newuser+',
-        'HOST': 'db',  # Cambiado de 'localhost' a 'db' para Docker
-        'PORT': '3306',
+        'ENGINE': os.environ.get('DB_ENGINE', 'django.db.backends.mysql'),
+        'NAME': os.environ.get('DB_NAME', 'barbershop_db'),
+        'USER': os.environ.get('DB_USER', 'newuser'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', '+newuser+'),
+        'HOST': os.environ.get('DB_HOST', 'db'),  # Cambiado de 'localhost' a 'db' para Docker
+        'PORT': os.environ.get('DB_PORT', '3306'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': env_bool('DB_CONN_HEALTH_CHECKS', False),
     }
 }
 
@@ -152,7 +175,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'appointments.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -169,5 +192,133 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Lista negra de refresh tokens en memoria de cada proceso: filas nuevas
+# cada INTERVAL segundos y recarga completa cada FULL_RELOAD segundos
+TOKEN_BLACKLIST_SYNC = {
+    'INTERVAL': 10,
+    'FULL_RELOAD': 300,
+}
+
+# Cachés. 'responses' guarda los listados y detalles del catálogo
+# (servicios, barberos, horarios). Por defecto vive en la memoria de cada
+# proceso; para compartirlo entre workers usar RESPONSE_CACHE_BACKEND=file
+# o RESPONSE_CACHE_BACKEND=db (este último requiere
+# `python manage.py createcachetable`).
+RESPONSE_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'barbershop-responses',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', os.path.join(BASE_DIR, '.cache', 'responses')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'response_cache',
+    },
+}
+
+# Versión de cada usuario, compartida por los workers: al guardar un usuario
+# se incrementa y los demás procesos descartan su copia en caché. Se lee en
+# cada petición autenticada, así que con varios procesos debe ser un backend
+# compartido en memoria ('redis', el de settings_production). 'file' y 'db'
+# también son compartidos, pero cuestan una lectura de disco o una consulta
+# por petición y anulan casi todo el ahorro del caché de usuarios
+AUTH_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'barbershop-auth',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('AUTH_CACHE_LOCATION', os.path.join(BASE_DIR, '.cache', 'auth')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'response_cache',
+        'KEY_PREFIX': 'auth',
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('AUTH_CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+        'OPTIONS': {},  # RedisCache no admite MAX_ENTRIES
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        **RESPONSE_CACHE_BACKENDS[os.environ.get('RESPONSE_CACHE_BACKEND', 'locmem')],
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'auth': {
+        **AUTH_CACHE_BACKENDS[os.environ.get('AUTH_CACHE_BACKEND', 'locmem')],
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
 # Custom user model
 AUTH_USER_MODEL = 'appointments.User'
+
+# Disponibilidad: rango máximo de días por consulta en /api/availability/
+AVAILABILITY_MAX_DAYS = 31
+
+# Rango máximo (en días) de los reportes
+REPORT_MAX_DAYS = 366
+
+# Caché en memoria de slots disponibles por (barbero, fecha, duración)
+AVAILABILITY_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 300,  # segundos
+}
+
+# Caché en memoria de los usuarios autenticados por JWT (por ID). Cada
+# acierto se compara con la versión del usuario en CACHES[VERSION_CACHE]
+AUTH_USER_CACHE = {
+    'MAX_ENTRIES': 5000,
+    'TIMEOUT': 30,  # segundos
+    'VERSION_CACHE': 'auth',
+}
+
+# Métricas por petición (cabecera Server-Timing) y registro de las
+# peticiones lentas en el logger 'appointments.performance'
+PERFORMANCE_MIDDLEWARE = {
+    'SLOW_REQUEST_MS': 500,
+    'TOP_QUERIES': 5,  # sentencias SQL repetidas incluidas en el registro
+    'HEADER': True,
+}
+
+# Métricas de Prometheus en /api/metrics. Con varios procesos (gunicorn)
+# cada worker escribe su acumulado en MULTIPROCESS_DIR cada FLUSH_INTERVAL
+# segundos y el endpoint suma los de todos
+METRICS = {
+    'MULTIPROCESS_DIR': os.environ.get('METRICS_MULTIPROC_DIR') or None,
+    'FLUSH_INTERVAL': 5,
+    'TOKEN': os.environ.get('METRICS_TOKEN') or None,  # exige Authorization: Bearer <token>; sin él, solo admins
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'appointments.performance': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Segundos que dura una retención de horario (POST /api/appointments/hold/)
+SLOT_HOLD_TTL = 120
+
+# Máximo de citas en una reserva recurrente o masiva (POST /api/appointments/bulk/)
+BULK_BOOKING_MAX_OCCURRENCES = 52
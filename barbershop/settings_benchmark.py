@@ -0,0 +1,21 @@
+"""
+Perfil para ``manage.py benchmark`` sin MySQL: parte de ``settings.py`` con
+una base SQLite en memoria (el comando aplica las migraciones al iniciar) y
+``DEBUG`` apagado, para que Django no guarde cada consulta en memoria.
+
+    DJANGO_SETTINGS_MODULE=barbershop.settings_benchmark python manage.py benchmark
+
+``DB_NAME`` permite usar un archivo SQLite en lugar de la memoria.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NAME', ':memory:'),
+    }
+}
@@ -0,0 +1,64 @@
+"""
+Perfil de producción: parte de ``settings.py`` y cambia los valores por
+defecto que solo sirven en desarrollo. Todo se puede ajustar con variables
+de entorno.
+
+    DJANGO_SETTINGS_MODULE=barbershop.settings_production
+
+- ``DEBUG`` apagado: con DEBUG, Django guarda en memoria cada consulta SQL
+  de cada petición.
+- Conexiones persistentes (``DB_CONN_MAX_AGE``, 60 s por defecto) con
+  verificación antes de reutilizarlas (``DB_CONN_HEALTH_CHECKS``), en lugar
+  de abrir una conexión a MySQL por petición. Cada hilo de cada worker
+  mantiene la suya: workers x hilos debe quedar por debajo de
+  ``max_connections`` de MySQL.
+- ``SECRET_KEY`` obligatoria y hosts y orígenes CORS explícitos.
+- Solo respuestas JSON (sin la API navegable de DRF).
+- Versiones de usuario (``CACHES['auth']``) en Redis por defecto
+  (``AUTH_CACHE_BACKEND``, URL en ``AUTH_CACHE_LOCATION``), compartidas por
+  todos los workers para que una desactivación se vea en todos de
+  inmediato. Se leen en cada petición autenticada: ``file`` o ``db``
+  funcionan, pero agregan una lectura de disco o una consulta por petición.
+- Slots en caché por 5 s (``AVAILABILITY_CACHE_TIMEOUT``) en lugar de 300:
+  las señales solo invalidan el caché del worker que escribe, y los demás
+  mostrarían horarios ya tomados hasta que venza la entrada.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import (
+    AUTH_CACHE_BACKENDS, AVAILABILITY_CACHE, CACHES, DATABASES, REST_FRAMEWORK, env_bool, env_list
+)
+
+DEBUG = env_bool('DEBUG', False)
+
+SECRET_KEY = os.environ.get('SECRET_KEY', '')
+if not SECRET_KEY or SECRET_KEY.startswith('django-insecure-'):
+    raise ImproperlyConfigured('Definir SECRET_KEY para el perfil de producción')
+
+ALLOWED_HOSTS = env_list('ALLOWED_HOSTS', ['localhost', '127.0.0.1'])
+
+CORS_ALLOW_ALL_ORIGINS = env_bool('CORS_ALLOW_ALL_ORIGINS', False)
+CORS_ALLOWED_ORIGINS = env_list('CORS_ALLOWED_ORIGINS', [])
+
+DATABASES['default'].update({
+    'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+    'CONN_HEALTH_CHECKS': env_bool('DB_CONN_HEALTH_CHECKS', True),
+})
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': ('rest_framework.renderers.JSONRenderer',),
+}
+
+CACHES['auth'] = {
+    **CACHES['auth'],
+    **AUTH_CACHE_BACKENDS[os.environ.get('AUTH_CACHE_BACKEND', 'redis')],
+}
+
+AVAILABILITY_CACHE = {
+    **AVAILABILITY_CACHE,
+    'TIMEOUT': int(os.environ.get('AVAILABILITY_CACHE_TIMEOUT', 5)),
+}
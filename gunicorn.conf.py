@@ -0,0 +1,59 @@
+"""
+Configuración de gunicorn para el perfil de producción.
+
+    gunicorn barbershop.wsgi:application -c gunicorn.conf.py
+    SERVER_INTERFACE=asgi gunicorn barbershop.asgi:application -c gunicorn.conf.py
+
+WSGI usa workers ``gthread``: (2 x CPU) + 1 procesos con 4 hilos cada uno,
+así cada proceso sigue atendiendo mientras otros hilos esperan a MySQL.
+ASGI usa un worker de uvicorn por CPU: el bucle de eventos de cada worker
+solapa las esperas de las vistas asíncronas (``/api/async/``). Los valores
+se pueden cambiar con WEB_CONCURRENCY, GUNICORN_THREADS, GUNICORN_BIND y
+GUNICORN_TIMEOUT.
+
+Cada worker guarda sus métricas en METRICS_MULTIPROC_DIR para que
+``/api/metrics`` muestre la suma de todos. Al salir, el worker suma las
+suyas al archivo común y borra el propio; el directorio se vacía al
+arrancar el master.
+"""
+import multiprocessing
+import os
+import shutil
+
+cpu_count = multiprocessing.cpu_count()
+asgi = os.environ.get('SERVER_INTERFACE', 'wsgi') == 'asgi'
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'barbershop.settings_production')
+if asgi:
+    # Bajo ASGI el ORM corre en hilos de sync_to_async que no se reutilizan
+    # entre peticiones: las conexiones persistentes quedarían abiertas
+    os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+
+os.environ.setdefault('METRICS_MULTIPROC_DIR', '/tmp/barbershop-metrics')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', cpu_count if asgi else cpu_count * 2 + 1))
+worker_class = 'uvicorn.workers.UvicornWorker' if asgi else 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 1 if asgi else 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Reciclar workers de a poco para acotar el crecimiento de memoria
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    shutil.rmtree(os.environ['METRICS_MULTIPROC_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['METRICS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def worker_exit(server, worker):
+    # Sumar lo acumulado al archivo común: con max_requests cada worker
+    # reciclado dejaría su propio archivo, y cada scrape los lee todos
+    from appointments.metrics import registry
+    registry.retire()